@@ -0,0 +1,158 @@
+# أثر النوايا (intents) وذاكرة الأعضاء على حمل البوابة: نفس النشاط في السيرفرات يُمرَّر إلى محلل أحداث discord.py
+# بإعدادات البوت القديمة (النوايا الافتراضية + message_content + members والأوامر بالبادئة) وبإعدادات main.py الحالية.
+# ديسكورد لا يرسل إلا أحداث النوايا المفعّلة، فيُصفّى النشاط بها قبل التمرير كما يفعل الخادم. كل إعداد في عملية
+# منفصلة حتى تُقاس ذاكرته المقيمة وحده. لا يتصل بديسكورد ولا بقاعدة البيانات.
+# الاستخدام: python -m benchmarks.gateway --guilds 20 --members 5000 --activity 200000
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import time
+
+# (الحدث، النية التي تجعل ديسكورد يرسله، نسبته من النشاط)
+ACTIVITY = [
+    ("MESSAGE_CREATE", "guild_messages", 0.50),
+    ("TYPING_START", "guild_typing", 0.30),
+    ("MESSAGE_REACTION_ADD", "guild_reactions", 0.15),
+    ("GUILD_MEMBER_UPDATE", "members", 0.049),
+    ("GUILD_ROLE_UPDATE", "guilds", 0.001),
+]
+CHANNELS_PER_GUILD = 10
+CHUNK_SIZE = 1000
+
+def user(user_id):
+    return {"id": str(user_id), "username": f"user{user_id}", "discriminator": "0", "global_name": None, "avatar": None}
+
+def member(user_id):
+    return {"user": user(user_id), "roles": [], "joined_at": "2024-01-01T00:00:00+00:00", "deaf": False, "mute": False, "flags": 0}
+
+def guild_create(guild_id, members):
+    return {
+        "id": str(guild_id), "name": f"guild {guild_id}", "owner_id": "1", "member_count": members, "large": True,
+        "roles": [{"id": str(guild_id), "name": "@everyone", "permissions": "0", "position": 0, "color": 0,
+                   "hoist": False, "managed": False, "mentionable": False}],
+        "channels": [{"id": str(guild_id * 100 + c), "type": 0, "name": f"c{c}", "position": c, "permission_overwrites": []}
+                     for c in range(CHANNELS_PER_GUILD)],
+        "members": [], "emojis": [], "stickers": [], "features": [], "threads": [], "voice_states": [], "presences": [],
+        "stage_instances": [], "guild_scheduled_events": [],
+    }
+
+def activity_payload(event, guild_id, user_id, sequence):
+    channel_id = str(guild_id * 100 + sequence % CHANNELS_PER_GUILD)
+    if event == "MESSAGE_CREATE":
+        return {"id": str(10**15 + sequence), "channel_id": channel_id, "guild_id": str(guild_id), "author": user(user_id),
+                "member": member(user_id), "content": f"رسالة عادية رقم {sequence}", "timestamp": "2024-01-01T00:00:00+00:00",
+                "edited_timestamp": None, "tts": False, "mention_everyone": False, "mentions": [], "mention_roles": [],
+                "attachments": [], "embeds": [], "pinned": False, "type": 0}
+    if event == "TYPING_START":
+        return {"channel_id": channel_id, "guild_id": str(guild_id), "user_id": str(user_id), "timestamp": 1700000000,
+                "member": member(user_id)}
+    if event == "MESSAGE_REACTION_ADD":
+        return {"user_id": str(user_id), "channel_id": channel_id, "message_id": str(10**15 + sequence // 2),
+                "guild_id": str(guild_id), "member": member(user_id), "emoji": {"id": None, "name": "👍"}}
+    if event == "GUILD_MEMBER_UPDATE":
+        return {**member(user_id), "guild_id": str(guild_id)}
+    return {"guild_id": str(guild_id), "role": {"id": str(guild_id), "name": "@everyone", "permissions": str(sequence % 2),
+                                                "position": 0, "color": 0, "hoist": False, "managed": False, "mentionable": False}}
+
+class FakeGateway:
+    """يجيب طلبات أعضاء السيرفرات (REQUEST_GUILD_MEMBERS) عند الإقلاع بدفعات GUILD_MEMBERS_CHUNK كما تفعل البوابة"""
+
+    def __init__(self, state, members):
+        self.state = state
+        self.members = members
+
+    async def request_chunks(self, guild_id, query=None, *, limit, user_ids=None, presences=False, nonce=None):
+        chunks = -(-self.members // CHUNK_SIZE)
+        for index in range(chunks):
+            start = index * CHUNK_SIZE
+            self.state.parse_guild_members_chunk({
+                "guild_id": str(guild_id), "nonce": nonce, "chunk_index": index, "chunk_count": chunks,
+                "members": [member(guild_id * 10**6 + m) for m in range(start, min(start + CHUNK_SIZE, self.members))],
+            })
+
+def baseline_bot():
+    """إعدادات البوت قبل أوامر التطبيق: كما كانت في main.py"""
+    import discord
+    from discord.ext import commands
+    intents = discord.Intents.default()
+    intents.message_content = True
+    intents.members = True
+    bot = commands.Bot(command_prefix="!", intents=intents)
+    for name in ("bank", "finmin", "adminpanel"):
+        bot.command(name=name)(_noop)
+    return bot
+
+async def _noop(ctx):
+    pass
+
+def run(config, guilds, members, activity, results):
+    os.environ.setdefault("METRICS_PORT", "0")
+    from metrics import resident_memory
+    if config == "before":
+        bot = baseline_bot()
+    else:
+        import main
+        bot = main.bot
+    enabled = {name for name, value in bot.intents if value}
+    started_memory = resident_memory()
+
+    async def feed():
+        # ما يفعله login() قبل الاتصال بالبوابة، دون setup_hook
+        await bot._async_setup_hook()
+        state = bot._connection
+        bot.ws = FakeGateway(state, members)
+        random.seed(1)
+        for guild_id in range(1, guilds + 1):
+            state.parse_guild_create(guild_create(guild_id, members))
+        # مع نية الأعضاء يطلب البوت كل أعضاء السيرفرات الكبيرة عند الإقلاع (chunk_guilds_at_startup)
+        while not all(guild.chunked for guild in bot.guilds) and state._chunk_guilds:
+            await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        setup_memory = resident_memory()
+
+        events, weights = zip(*((event, weight) for event, _, weight in ACTIVITY))
+        intent_of = {event: intent for event, intent, _ in ACTIVITY}
+        delivered = 0
+        cpu_started = time.process_time()
+        for sequence, event in enumerate(random.choices(events, weights, k=activity)):
+            if intent_of[event] not in enabled:
+                continue
+            delivered += 1
+            guild_id = random.randint(1, guilds)
+            bot.dispatch("socket_event_type", event)
+            state.parsers[event](activity_payload(event, guild_id, guild_id * 10**6 + random.randrange(members), sequence))
+            if delivered % 100 == 0:
+                # تشغيل مستمعي الأحداث (on_message ومعالجة الأوامر) التي جدولها المحلل
+                await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        cpu = time.process_time() - cpu_started
+        cached_members = sum(len(guild._members) for guild in bot.guilds)
+        return delivered, cpu, setup_memory, cached_members, len(state._messages or ())
+
+    delivered, cpu, setup_memory, cached_members, cached_messages = asyncio.run(feed())
+    results.put((config, delivered, cpu, started_memory, setup_memory, resident_memory(), cached_members, cached_messages))
+
+def main():
+    parser = argparse.ArgumentParser(description="Gateway intents and member cache benchmark")
+    parser.add_argument("--guilds", type=int, default=20)
+    parser.add_argument("--members", type=int, default=5000, help="أعضاء كل سيرفر")
+    parser.add_argument("--activity", type=int, default=200000, help="عدد أحداث النشاط في كل السيرفرات")
+    args = parser.parse_args()
+
+    print(f"{'config':>7} {'delivered':>10} {'cpu':>8} {'events/s':>9} {'cpu per 1k activity':>20} "
+          f"{'rss after login':>16} {'rss after stream':>17} {'members':>8} {'messages':>9}")
+    context = multiprocessing.get_context("spawn")
+    for config in ("before", "after"):
+        results = context.Queue()
+        process = context.Process(target=run, args=(config, args.guilds, args.members, args.activity, results))
+        process.start()
+        _, delivered, cpu, base, setup, final, members, messages = results.get(timeout=600)
+        process.join()
+        rate = delivered / cpu if cpu else 0
+        print(f"{config:>7} {delivered:>10} {cpu:>7.2f}s {rate:>9.0f} {cpu * 1000 / args.activity * 1000:>18.1f}ms "
+              f"{(setup - base) / 1024 / 1024:>14.1f}MB {(final - base) / 1024 / 1024:>15.1f}MB {members:>8} {messages:>9}")
+
+if __name__ == '__main__':
+    main()
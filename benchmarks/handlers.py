@@ -0,0 +1,265 @@
+# اختبار حمل للأزرار والنوافذ والمهام الحقيقية في main.py بتفاعلات ديسكورد وهمية
+# على مخطط مؤقت في قاعدة PostgreSQL محلية (أو ملف SQLite مؤقت مع --backend sqlite)، مع قياس الإنتاجية
+# وp50/p99 وعدد رحلات قاعدة البيانات لكل عملية.
+# الاستخدام: python -m benchmarks.handlers --dsn postgresql://localhost/bank_bench --accounts 10000 --requests 2000 --concurrency 50
+#            python -m benchmarks.handlers --backend sqlite --accounts 10000 --requests 2000 --concurrency 50
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import discord
+import psycopg2
+
+import metrics
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.name = self.display_name = f"user{user_id}"
+        self.mention = f"<@{user_id}>"
+        self.roles = []
+        self.guild_permissions = discord.Permissions(administrator=True)
+
+class FakeResponse:
+    """يسجل الردود بدل إرسالها إلى ديسكورد"""
+
+    def __init__(self):
+        self.messages = []
+        self.first_response_at = None
+
+    def is_done(self):
+        return self.first_response_at is not None
+
+    def _respond(self, content=None, **kwargs):
+        if self.first_response_at is None:
+            self.first_response_at = time.perf_counter()
+        self.messages.append(content if content is not None else kwargs.get("embed"))
+
+    async def send_message(self, content=None, **kwargs):
+        self._respond(content, **kwargs)
+
+    async def edit_message(self, content=None, **kwargs):
+        self._respond(content, **kwargs)
+
+    async def send_modal(self, modal):
+        self._respond(modal)
+
+    async def defer(self, **kwargs):
+        self._respond(None)
+
+class FakeFollowup:
+    def __init__(self, response):
+        self.response = response
+
+    async def send(self, content=None, **kwargs):
+        self.response.messages.append(content if content is not None else kwargs.get("embed"))
+
+class FakeInteraction(discord.Interaction):
+    """تفاعل بلا اتصال بديسكورد؛ يرث من discord.Interaction حتى تتعرف عليه طبقة القياس"""
+
+    def __init__(self, user_id):
+        self.user = FakeUser(user_id)
+        self._fake_response = FakeResponse()
+        self._fake_followup = FakeFollowup(self._fake_response)
+        self._fake_created_at = discord.utils.utcnow()
+
+    @property
+    def response(self):
+        return self._fake_response
+
+    @property
+    def followup(self):
+        return self._fake_followup
+
+    @property
+    def created_at(self):
+        return self._fake_created_at
+
+def fill_modal(modal, *values):
+    for item, value in zip(modal.children, values):
+        item._value = str(value)
+    return modal
+
+def failed(interaction):
+    return any(isinstance(message, str) and message.startswith("❌") for message in interaction.response.messages)
+
+def seed(dsn, schema, accounts, now):
+    """حسابات غنية لعمليات الأعضاء، وحسابات منفصلة برواتب مستحقة واستثمارات منتهية للمهام الدورية"""
+    conn = psycopg2.connect(dsn, options=f"-c search_path={schema}")
+    with conn.cursor() as cursor:
+        cursor.execute("INSERT INTO users (user_id, balance) SELECT g, 1000000000.00 FROM generate_series(1, %s) g", (accounts,))
+        cursor.execute("INSERT INTO salaries (user_id, last_paid) SELECT g, %s FROM generate_series(1, %s) g", (now, accounts))
+        cursor.execute("""
+            INSERT INTO users (user_id, balance) SELECT g, 1500.00 FROM generate_series(%(start)s, %(end)s) g;
+            INSERT INTO salaries (user_id, last_paid) SELECT g, %(due)s FROM generate_series(%(start)s, %(end)s) g;
+            INSERT INTO investments (user_id, amount, start_date, end_date, return_rate, status)
+            SELECT g, 100.00, %(due)s, %(matured)s, 0.05, 'active' FROM generate_series(%(start)s, %(end)s) g;
+        """, {"start": accounts + 1, "end": 2 * accounts, "due": now - timedelta(hours=4), "matured": now - timedelta(minutes=1)})
+        cursor.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+
+def seed_sqlite(cursor, accounts, now):
+    """نفس بيانات seed عبر دوال الوصول للبيانات على واجهة SQLite"""
+    rich = range(1, accounts + 1)
+    due = range(accounts + 1, 2 * accounts + 1)
+    cursor.executemany("INSERT INTO users (user_id, balance) VALUES (%s, 1000000000.00)", [(g,) for g in rich])
+    cursor.executemany("INSERT INTO salaries (user_id, last_paid) VALUES (%s, %s)", [(g, now) for g in rich])
+    cursor.executemany("INSERT INTO users (user_id, balance) VALUES (%s, 1500.00)", [(g,) for g in due])
+    cursor.executemany("INSERT INTO salaries (user_id, last_paid) VALUES (%s, %s)", [(g, now - timedelta(hours=4)) for g in due])
+    cursor.executemany("""
+        INSERT INTO investments (user_id, amount, start_date, end_date, return_rate, status) VALUES (%s, 100.00, %s, %s, 0.05, 'active')
+    """, [(g, now - timedelta(hours=4), now - timedelta(minutes=1)) for g in due])
+    cursor.execute("ANALYZE")
+
+async def drive(name, operation, requests, concurrency, round_trips):
+    """تشغيل operation(i) requests مرة بتوازي concurrency، ويطبع سطر النتائج"""
+    count_before, trips_before = metrics.db_round_trips.summary(operation=round_trips, kind="interaction")
+    latencies = []
+    failures = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            interaction = await operation(i)
+            latencies.append(time.perf_counter() - started)
+            if interaction is not None and failed(interaction):
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    count_after, trips_after = metrics.db_round_trips.summary(operation=round_trips, kind="interaction")
+    latencies.sort()
+    trips = (trips_after - trips_before) / (count_after - count_before) if count_after > count_before else 0
+    print(f"{name:>14} {requests:>8} {requests / elapsed:>9.0f}/s {latencies[len(latencies) // 2] * 1000:>8.1f}ms "
+          f"{latencies[int(len(latencies) * 0.99)] * 1000:>8.1f}ms {trips:>10.1f} {failures:>8}")
+
+async def run(args):
+    import main
+    from cache import account_cache
+
+    accounts = args.accounts
+    await main.card_catalog.load()
+    member_view = main.MemberMenuView()
+
+    def button(view, custom_id):
+        return next(item for item in view.children if getattr(item, "custom_id", None) == custom_id)
+
+    open_account = button(member_view, "open_account")
+    check_balance = button(member_view, "check_balance")
+    new_ids = iter(range(10 * accounts, 11 * accounts + args.requests))
+
+    async def do_open(i):
+        interaction = FakeInteraction(next(new_ids))
+        await open_account.callback(interaction)
+        return interaction
+
+    async def do_balance(i):
+        interaction = FakeInteraction(random.randint(1, accounts))
+        await check_balance.callback(interaction)
+        return interaction
+
+    async def do_transfer(i):
+        sender, recipient = random.sample(range(1, accounts + 1), 2)
+        interaction = FakeInteraction(sender)
+        await fill_modal(main.TransferModal(), recipient, 10).on_submit(interaction)
+        return interaction
+
+    async def do_invest(i):
+        interaction = FakeInteraction(random.randint(1, accounts))
+        await fill_modal(main.InvestModal(), 100, 7).on_submit(interaction)
+        return interaction
+
+    async def do_buy_card(i):
+        interaction = FakeInteraction(random.randint(1, accounts))
+        await fill_modal(main.BuyCardModal(random.choice(("silver", "gold", "platinum"))), "تأكيد").on_submit(interaction)
+        return interaction
+
+    print(f"{'operation':>14} {'requests':>8} {'throughput':>11} {'p50':>10} {'p99':>10} {'db trips':>10} {'failures':>8}")
+    for name, operation, round_trips in (
+        ("open account", do_open, "MemberMenuView.open_account_button"),
+        ("balance", do_balance, "MemberMenuView.check_balance_button"),
+        ("transfer", do_transfer, "TransferModal.on_submit"),
+        ("invest", do_invest, "InvestModal.on_submit"),
+        ("buy card", do_buy_card, "BuyCardModal.on_submit"),
+    ):
+        if name == "balance" and args.cold_cache:
+            account_cache.invalidate_all()
+        await drive(name, operation, args.requests, args.concurrency, round_trips)
+
+    # المهام الدورية: تشغيلة واحدة لكل منها على accounts مستحقًا
+    print(f"\n{'task':>14} {'rows':>8} {'elapsed':>10} {'rows/s':>10} {'db trips':>10}")
+    for name, task in (("payroll", main.salary_task), ("settlement", main.process_investments)):
+        _, trips_before = metrics.db_round_trips.summary(operation=task.coro.__qualname__, kind="task")
+        started = time.perf_counter()
+        await task()
+        elapsed = time.perf_counter() - started
+        _, trips_after = metrics.db_round_trips.summary(operation=task.coro.__qualname__, kind="task")
+        print(f"{name:>14} {accounts:>8} {elapsed * 1000:>8.1f}ms {accounts / elapsed:>8.0f}/s {trips_after - trips_before:>10.0f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Handler load test")
+    parser.add_argument("--backend", choices=("postgresql", "sqlite"), default="postgresql")
+    parser.add_argument("--dsn", default=os.getenv("BENCH_DATABASE_URL") or os.getenv("DATABASE_URL"))
+    parser.add_argument("--accounts", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=2000, help="عدد الطلبات لكل عملية")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--cold-cache", action="store_true", help="تفريغ ذاكرة الحسابات قبل قياس الرصيد")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    # يجب ضبط الاتصال قبل استيراد main، لأن الإعدادات تُقرأ عند الاستيراد والواجهة تُنشأ عند أول استخدام
+    os.environ["DATABASE_BACKEND"] = args.backend
+    os.environ["METRICS_PORT"] = "0"
+    if args.backend == "sqlite":
+        run_sqlite(args)
+    else:
+        run_postgres(args)
+
+def run_sqlite(args):
+    directory = tempfile.mkdtemp(prefix="bench_handlers_")
+    os.environ["SQLITE_PATH"] = os.path.join(directory, "bank.sqlite3")
+    from database import migrate, run_db_sync, close_db
+
+    try:
+        run_db_sync(migrate)
+        run_db_sync(seed_sqlite, args.accounts, datetime.now())
+        asyncio.run(run(args))
+    finally:
+        close_db()
+        shutil.rmtree(directory)
+
+def run_postgres(args):
+    schema = f"bench_handlers_{os.getpid()}"
+    os.environ["DATABASE_URL"] = args.dsn
+    os.environ["PGOPTIONS"] = f"-c search_path={schema}"
+    from database import migrate, close_db
+
+    conn = psycopg2.connect(args.dsn)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"CREATE SCHEMA {schema}")
+            cursor.execute(f"SET search_path TO {schema}")
+            migrate(cursor)
+        conn.commit()
+        seed(args.dsn, schema, args.accounts, datetime.now())
+        asyncio.run(run(args))
+    finally:
+        close_db()
+        conn.rollback()
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        conn.commit()
+        conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+# تشغيل عدة نسخ من البوت (عمليات منفصلة) على مخطط مؤقت واحد في نفس الوقت: انتخاب القائدة، وتقاسم دفعات
+# الرواتب وتسوية الاستثمارات بـ SKIP LOCKED، ثم التحقق من أن أحدًا لم يُدفع له مرتين، ومن وصول إشعارات
+# تغيّر الحسابات من نسخة إلى ذاكرة الأخرى.
+# الاستخدام: python -m benchmarks.instances --dsn postgresql://localhost/bank_bench --accounts 50000 --instances 1 2 4
+import argparse
+import asyncio
+import multiprocessing
+import os
+import time
+from datetime import datetime, timedelta
+
+import psycopg2
+
+def instance(dsn, schema, name, start, results):
+    """نسخة واحدة: تنتظر إشارة البدء ثم تشغل مهمتي الرواتب والتسوية الحقيقيتين من main.py مرة واحدة"""
+    os.environ["DATABASE_URL"] = dsn
+    os.environ["PGOPTIONS"] = f"-c search_path={schema}"
+    os.environ["INSTANCE_NAME"] = name
+    os.environ["METRICS_PORT"] = "0"
+    import main
+    from cache import account_cache
+    from cluster import coordinator
+    from database import close_db
+
+    async def run():
+        await coordinator.start()
+        leader = await coordinator.try_lead()
+        # حساب مشترك في ذاكرة كل نسخة، تعدله النسخة الأولى بعد انتهاء المهام
+        await account_cache.get_account(1)
+        start.wait()
+        started = time.perf_counter()
+        await main.salary_task()
+        payroll = time.perf_counter() - started
+        started = time.perf_counter()
+        await main.settle_matured_investments(datetime.now())
+        settlement = time.perf_counter() - started
+        await asyncio.sleep(0.5)
+        if name.endswith("-0"):
+            await main.run_db(main.queries.admin_give, 1, 10, 0)
+        await asyncio.sleep(0.5)
+        stale = account_cache.get(1) is not None and not name.endswith("-0")
+        coordinator.close()
+        return leader, payroll, settlement, stale
+
+    try:
+        results.put((name, *asyncio.run(run())))
+    finally:
+        close_db()
+
+def seed(conn, accounts, now):
+    with conn.cursor() as cursor:
+        cursor.execute("TRUNCATE users, salaries, transactions, investments RESTART IDENTITY CASCADE")
+        cursor.execute("INSERT INTO users (user_id, balance) SELECT g, 1500.00 FROM generate_series(1, %s) g", (accounts,))
+        cursor.execute("INSERT INTO salaries (user_id, last_paid) SELECT g, %s FROM generate_series(1, %s) g", (now - timedelta(hours=4), accounts))
+        cursor.execute("""
+            INSERT INTO investments (user_id, amount, start_date, end_date, return_rate, status)
+            SELECT g, 100.00, %s, %s, 0.05, 'active' FROM generate_series(1, %s) g
+        """, (now - timedelta(days=1), now - timedelta(minutes=1), accounts))
+        cursor.execute("ANALYZE")
+    conn.commit()
+
+def verify(conn, accounts):
+    """(مدفوع مرتين، غير مدفوع، استثمار مسوى مرتين، غير مسوى)"""
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT COUNT(*) FILTER (WHERE paid > 1), %s - COUNT(*) FROM (
+                SELECT user_id, COUNT(*) AS paid FROM transactions WHERE type = 'salary' GROUP BY user_id
+            ) s
+        """, (accounts,))
+        double_paid, unpaid = cursor.fetchone()
+        cursor.execute("""
+            SELECT COUNT(*) FILTER (WHERE settled > 1), %s - COUNT(*) FROM (
+                SELECT description, COUNT(*) AS settled FROM transactions WHERE type = 'investment_return' GROUP BY description
+            ) s
+        """, (accounts,))
+        double_settled, unsettled = cursor.fetchone()
+    conn.rollback()
+    return double_paid, unpaid, double_settled, unsettled
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-instance background job benchmark")
+    parser.add_argument("--dsn", default=os.getenv("BENCH_DATABASE_URL") or os.getenv("DATABASE_URL"))
+    parser.add_argument("--accounts", type=int, default=50000)
+    parser.add_argument("--instances", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    schema = f"bench_instances_{os.getpid()}"
+    os.environ["DATABASE_URL"] = args.dsn
+    from database import migrate
+
+    conn = psycopg2.connect(args.dsn)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"CREATE SCHEMA {schema}")
+            cursor.execute(f"SET search_path TO {schema}")
+            migrate(cursor)
+        conn.commit()
+
+        print(f"{'instances':>9} {'leaders':>8} {'payroll':>9} {'settlement':>11} {'double paid':>12} {'unpaid':>7} "
+              f"{'double settled':>15} {'unsettled':>10} {'stale caches':>13}")
+        context = multiprocessing.get_context("spawn")
+        for count in args.instances:
+            seed(conn, args.accounts, datetime.now())
+            start, results = context.Event(), context.Queue()
+            processes = [context.Process(target=instance, args=(args.dsn, schema, f"bench-{os.getpid()}-{i}", start, results))
+                         for i in range(count)]
+            for process in processes:
+                process.start()
+            # كل النسخ جاهزة (استوردت main واتصلت) قبل البدء معًا
+            time.sleep(5 + count)
+            start.set()
+            rows = [results.get(timeout=300) for _ in processes]
+            for process in processes:
+                process.join()
+            leaders = sum(row[1] for row in rows)
+            payroll = max(row[2] for row in rows)
+            settlement = max(row[3] for row in rows)
+            stale = sum(row[4] for row in rows)
+            print(f"{count:>9} {leaders:>8} {payroll * 1000:>7.0f}ms {settlement * 1000:>9.0f}ms "
+                  + " ".join(f"{value:>{width}}" for value, width in zip(verify(conn, args.accounts), (12, 7, 15, 10)))
+                  + f" {stale:>13}")
+    finally:
+        conn.rollback()
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        conn.commit()
+        conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# زمن نقل قاعدة قديمة كبيرة بمخطط bank_data.db (REAL) إلى مخطط مؤقت في PostgreSQL عبر import_legacy
+# الاستخدام: python -m benchmarks.legacy_import --dsn postgresql://localhost/bank_bench --accounts 100000 --transactions 2000000
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import psycopg2
+
+from import_legacy import import_legacy
+
+TYPES = ("deposit", "withdraw", "transfer_send", "transfer_receive", "salary", "investment_start", "investment_return", "card_purchase")
+
+def build_legacy(path, accounts, transactions, start):
+    """نسخة من مخطط bank_data.db المرفق مملوءة ببيانات عشوائية، بمبالغ REAL فيها أخطاء تمثيل الفاصلة العائمة"""
+    template = sqlite3.connect("bank_data.db")
+    target = sqlite3.connect(path)
+    template.backup(target)
+    template.close()
+    span = int((datetime.now() - start).total_seconds())
+
+    def moment():
+        return (start + timedelta(seconds=random.randrange(span))).strftime("%Y-%m-%d %H:%M:%S")
+
+    target.executemany("INSERT INTO users (user_id, balance, card_type) VALUES (?, ?, 'basic')",
+                       ((g, 1500.00 + 0.1 * random.randrange(100000) + 0.2) for g in range(1, accounts + 1)))
+    target.executemany("INSERT INTO salaries (user_id, last_paid) VALUES (?, ?)", ((g, moment()) for g in range(1, accounts + 1)))
+    target.executemany("INSERT INTO ministries (name, balance) VALUES (?, ?)", ((f"وزارة {g}", 1000.10 * g) for g in range(1, 21)))
+    target.executemany("""
+        INSERT INTO investments (user_id, amount, start_date, end_date, return_rate, status) VALUES (?, ?, ?, ?, 0.05, 'completed')
+    """, ((random.randint(1, accounts), 100.0 + 0.01 * random.randrange(10000), moment(), moment()) for _ in range(accounts)))
+    target.executemany("INSERT INTO transactions (user_id, type, amount, timestamp, description) VALUES (?, ?, ?, ?, ?)",
+                       ((random.randint(1, accounts), random.choice(TYPES), 0.01 * random.randrange(1, 1000000), moment(), "حركة\tتجريبية")
+                        for _ in range(transactions)))
+    target.commit()
+    target.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Legacy SQLite import benchmark")
+    parser.add_argument("--dsn", default=os.getenv("BENCH_DATABASE_URL") or os.getenv("DATABASE_URL"))
+    parser.add_argument("--accounts", type=int, default=100000)
+    parser.add_argument("--transactions", type=int, default=2000000)
+    parser.add_argument("--months", type=int, default=12, help="مدى تواريخ السجل القديم")
+    parser.add_argument("--batch-size", type=int, default=100000)
+    args = parser.parse_args()
+    random.seed(1)
+
+    directory = tempfile.mkdtemp(prefix="bench_legacy_import_")
+    path = os.path.join(directory, "bank_data.db")
+    started = time.perf_counter()
+    build_legacy(path, args.accounts, args.transactions, datetime.now() - timedelta(days=30 * args.months))
+    print(f"Built legacy database ({os.path.getsize(path) / 1024 / 1024:.0f} MB) in {time.perf_counter() - started:.1f}s")
+
+    schema = f"bench_legacy_import_{os.getpid()}"
+    admin = psycopg2.connect(args.dsn)
+    admin.autocommit = True
+    with admin.cursor() as cursor:
+        cursor.execute(f"CREATE SCHEMA {schema}")
+    conn = psycopg2.connect(args.dsn, options=f"-c search_path={schema}")
+    try:
+        started = time.perf_counter()
+        imports = import_legacy(path, conn, args.batch_size)
+        elapsed = time.perf_counter() - started
+        rows = sum(job.rows for job in imports)
+        print(f"Imported and verified {rows} rows in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s)")
+    finally:
+        conn.close()
+        with admin.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        admin.close()
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# قياس زمن دفع الرواتب على قاعدة بيانات PostgreSQL محلية مؤقتة
+# الاستخدام: python -m benchmarks.payroll --dsn postgresql://localhost/bank_bench --sizes 10000,100000,1000000
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+
+import psycopg2
+
+from database import migrate
+import queries
+
+SALARY_AMOUNT = 500.00
+INTERVAL = timedelta(hours=3)
+
+def legacy_pay_due_salaries(cursor, salary_amount, interval, now):
+    """التنفيذ السابق: ثلاث عبارات لكل مستخدم مستحق"""
+    cursor.execute("SELECT user_id, last_paid FROM salaries")
+    paid = []
+    for user_id, last_paid in cursor.fetchall():
+        if now - last_paid >= interval:
+            cursor.execute("UPDATE users SET balance = balance + %s WHERE user_id = %s", (salary_amount, user_id))
+            cursor.execute("UPDATE salaries SET last_paid = %s WHERE user_id = %s", (now, user_id))
+            cursor.execute("INSERT INTO transactions (user_id, type, amount, description) VALUES (%s, %s, %s, %s)",
+                           (user_id, "salary", salary_amount, "راتب دوري"))
+            paid.append(user_id)
+    return paid
+
+def seed(conn, size, now):
+    """إنشاء حسابات مستحقة الراتب بالكامل"""
+    with conn.cursor() as cursor:
+        cursor.execute("TRUNCATE users, salaries, transactions, investments RESTART IDENTITY CASCADE")
+        cursor.execute("INSERT INTO users (user_id, balance) SELECT g, 1500.00 FROM generate_series(1, %s) g", (size,))
+        cursor.execute("INSERT INTO salaries (user_id, last_paid) SELECT g, %s FROM generate_series(1, %s) g", (now - INTERVAL, size))
+        cursor.execute("ANALYZE")
+    conn.commit()
+
+def run(conn, fn, size):
+    now = datetime.now()
+    seed(conn, size, now)
+    started = time.perf_counter()
+    with conn.cursor() as cursor:
+        paid = fn(cursor, SALARY_AMOUNT, INTERVAL, now)
+    conn.commit()
+    elapsed = time.perf_counter() - started
+    assert len(paid) == size, f"expected {size} payments, got {len(paid)}"
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Payroll benchmark")
+    parser.add_argument("--dsn", default=os.getenv("BENCH_DATABASE_URL") or os.getenv("DATABASE_URL"))
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--legacy-max", type=int, default=100000, help="أكبر حجم يُقاس عليه التنفيذ السابق (بطيء جدًا)")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(args.dsn)
+    schema = f"bench_payroll_{os.getpid()}"
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"CREATE SCHEMA {schema}")
+            cursor.execute(f"SET search_path TO {schema}")
+            migrate(cursor)
+        conn.commit()
+
+        print(f"{'accounts':>10} {'set-based':>12} {'legacy':>12}")
+        for size in (int(s) for s in args.sizes.split(",")):
+            set_based = run(conn, queries.pay_due_salaries, size)
+            legacy = f"{run(conn, legacy_pay_due_salaries, size):>11.2f}s" if size <= args.legacy_max else f"{'skipped':>12}"
+            print(f"{size:>10} {set_based:>11.2f}s {legacy}")
+    finally:
+        conn.rollback()
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        conn.commit()
+        conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+# محاكاة جدولة الرواتب بساعة افتراضية: المسح الجماعي كل 3 ساعات مقابل دفعات صغيرة كل دقيقة
+# الاستخدام: python -m benchmarks.salary_schedule --dsn postgresql://localhost/bank_bench --accounts 100000 --hours 12
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+
+import psycopg2
+
+from database import migrate
+import queries
+
+SALARY_AMOUNT = 500.00
+INTERVAL = timedelta(hours=3)
+
+def legacy_pay_due_salaries(cursor, salary_amount, interval, now, limit=None):
+    """التنفيذ السابق: كل المستحقين في عبارة واحدة، ويبدأ موعد الجميع التالي من لحظة المسح"""
+    cursor.execute("""
+        WITH due AS (
+            UPDATE salaries SET last_paid = %(now)s
+            WHERE last_paid <= %(due_before)s
+            RETURNING user_id
+        ), paid AS (
+            UPDATE users SET balance = users.balance + %(amount)s
+            FROM due
+            WHERE users.user_id = due.user_id
+            RETURNING users.user_id
+        )
+        INSERT INTO transactions (user_id, type, amount, description)
+        SELECT user_id, 'salary', %(amount)s, 'راتب دوري' FROM paid
+        RETURNING user_id
+    """, {"now": now, "due_before": now - interval, "amount": salary_amount})
+    return [row[0] for row in cursor.fetchall()]
+
+def seed(conn, accounts, start):
+    """حسابات فُتحت في أوقات متفرقة خلال فترة الراتب السابقة"""
+    with conn.cursor() as cursor:
+        cursor.execute("TRUNCATE users, salaries, transactions, investments RESTART IDENTITY CASCADE")
+        cursor.execute("INSERT INTO users (user_id, balance) SELECT g, 1500.00 FROM generate_series(1, %s) g", (accounts,))
+        cursor.execute("""
+            INSERT INTO salaries (user_id, last_paid)
+            SELECT g, %s - random() * %s FROM generate_series(1, %s) g
+        """, (start, INTERVAL, accounts))
+        cursor.execute("ANALYZE")
+    conn.commit()
+
+def simulate(conn, fn, accounts, hours, tick, batch_size):
+    """تشغيل fn على ساعة افتراضية كل tick، ويعيد (أكبر عدد في معاملة، عدد المعاملات، التأخير الوسيط والأقصى، الزمن الكلي)"""
+    start = datetime(2026, 1, 1)
+    seed(conn, accounts, start)
+    largest = transactions = 0
+    delays = []
+    elapsed = 0.0
+    now = start
+    while now < start + timedelta(hours=hours):
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT user_id, last_paid FROM salaries WHERE last_paid <= %s", (now - INTERVAL,))
+            due = dict(cursor.fetchall())
+        conn.commit()
+        while True:
+            started = time.perf_counter()
+            with conn.cursor() as cursor:
+                paid = fn(cursor, SALARY_AMOUNT, INTERVAL, now, batch_size)
+            conn.commit()
+            elapsed += time.perf_counter() - started
+            transactions += 1
+            largest = max(largest, len(paid))
+            delays.extend((now - (due[user_id] + INTERVAL)).total_seconds() for user_id in paid)
+            if batch_size is None or len(paid) < batch_size:
+                break
+        now += tick
+    delays.sort()
+    return largest, transactions, delays[len(delays) // 2] / 60, delays[-1] / 60, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Salary scheduling simulation")
+    parser.add_argument("--dsn", default=os.getenv("BENCH_DATABASE_URL") or os.getenv("DATABASE_URL"))
+    parser.add_argument("--accounts", type=int, default=100000)
+    parser.add_argument("--hours", type=float, default=12)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(args.dsn)
+    schema = f"bench_salary_schedule_{os.getpid()}"
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"CREATE SCHEMA {schema}")
+            cursor.execute(f"SET search_path TO {schema}")
+            migrate(cursor)
+        conn.commit()
+
+        print(f"{'schedule':>16} {'max rows/txn':>13} {'txns':>7} {'p50 delay':>10} {'max delay':>10} {'db time':>8}")
+        for name, fn, tick, batch_size in (
+            ("3h sweep", legacy_pay_due_salaries, INTERVAL, None),
+            ("1min batches", queries.pay_due_salaries, timedelta(minutes=1), args.batch_size),
+        ):
+            largest, transactions, p50, worst, elapsed = simulate(conn, fn, args.accounts, args.hours, tick, batch_size)
+            print(f"{name:>16} {largest:>13} {transactions:>7} {p50:>8.1f}m {worst:>8.1f}m {elapsed:>7.2f}s")
+    finally:
+        conn.rollback()
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        conn.commit()
+        conn.close()
+
+if __name__ == '__main__':
+    main()
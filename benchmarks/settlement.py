@@ -0,0 +1,73 @@
+# قياس زمن تسوية الاستثمارات المنتهية على قاعدة بيانات PostgreSQL محلية مؤقتة
+# الاستخدام: python -m benchmarks.settlement --dsn postgresql://localhost/bank_bench --sizes 10000,100000,1000000
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+
+import psycopg2
+
+from database import migrate
+import queries
+
+def seed(conn, size, users, now):
+    """إنشاء استثمارات منتهية موزعة على عدد محدود من المستخدمين"""
+    with conn.cursor() as cursor:
+        cursor.execute("TRUNCATE users, salaries, transactions, investments RESTART IDENTITY CASCADE")
+        cursor.execute("INSERT INTO users (user_id, balance) SELECT g, 0 FROM generate_series(1, %s) g", (users,))
+        cursor.execute("""
+            INSERT INTO investments (user_id, amount, start_date, end_date, return_rate, status)
+            SELECT 1 + g %% %s, 100.00 + (g %% 1000), %s, %s, 0.05, 'active' FROM generate_series(1, %s) g
+        """, (users, now - timedelta(days=7), now - timedelta(minutes=1), size))
+        cursor.execute("ANALYZE")
+    conn.commit()
+
+def run(conn, size, users, chunk_size):
+    now = datetime.now()
+    seed(conn, size, users, now)
+    started = time.perf_counter()
+    total, chunks, slowest = 0, 0, 0.0
+    while True:
+        chunk_started = time.perf_counter()
+        with conn.cursor() as cursor:
+            settled = queries.settle_matured_investments(cursor, now, chunk_size)
+        conn.commit()
+        slowest = max(slowest, time.perf_counter() - chunk_started)
+        total += len(settled)
+        chunks += 1
+        if len(settled) < chunk_size:
+            break
+    elapsed = time.perf_counter() - started
+    assert total == size, f"expected {size} settlements, got {total}"
+    return elapsed, chunks, slowest
+
+def main():
+    parser = argparse.ArgumentParser(description="Investment settlement benchmark")
+    parser.add_argument("--dsn", default=os.getenv("BENCH_DATABASE_URL") or os.getenv("DATABASE_URL"))
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(args.dsn)
+    schema = f"bench_settlement_{os.getpid()}"
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"CREATE SCHEMA {schema}")
+            cursor.execute(f"SET search_path TO {schema}")
+            migrate(cursor)
+        conn.commit()
+
+        print(f"{'investments':>12} {'total':>10} {'chunks':>8} {'slowest chunk':>14}")
+        for size in (int(s) for s in args.sizes.split(",")):
+            elapsed, chunks, slowest = run(conn, size, args.users, args.chunk_size)
+            print(f"{size:>12} {elapsed:>9.2f}s {chunks:>8} {slowest * 1000:>12.0f}ms")
+    finally:
+        conn.rollback()
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        conn.commit()
+        conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+# اختبار ضغط للتحويلات المتزامنة على قاعدة بيانات PostgreSQL محلية مؤقتة
+# يتحقق من عدم إنشاء أموال أو إتلافها، وعدم ظهور أرصدة سالبة، وعدم حدوث جمود
+# مع --settlers و--payrolls تعمل معها في نفس الوقت تسوية الاستثمارات ودفع الرواتب على نفس الحسابات (كما تفعل
+# عدة نسخ من البوت)، فكل منها يقفل صفوف users وأي ترتيب مختلف للأقفال بينها يظهر هنا جمودًا
+# الاستخدام: python -m benchmarks.transfers --dsn postgresql://localhost/bank_bench --workers 32 --transfers 20000 --settlers 2 --payrolls 2
+import argparse
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import psycopg2
+from psycopg2 import errors
+
+from database import migrate
+import queries
+
+def legacy_transfer(cursor, sender_id, recipient_id, amount):
+    """التنفيذ السابق: قراءة ثم تحقق في بايثون ثم تحديث، دون قفل الصفوف"""
+    cursor.execute("SELECT balance FROM users WHERE user_id = %s", (sender_id,))
+    sender_balance = cursor.fetchone()
+    if not sender_balance or sender_balance[0] < amount:
+        return queries.INSUFFICIENT_FUNDS, None, None
+    cursor.execute("SELECT user_id FROM users WHERE user_id = %s", (recipient_id,))
+    if not cursor.fetchone():
+        return queries.NOT_FOUND, None, None
+    cursor.execute("UPDATE users SET balance = balance - %s WHERE user_id = %s", (amount, sender_id))
+    cursor.execute("INSERT INTO transactions (user_id, type, amount, description) VALUES (%s, %s, %s, %s)",
+                   (sender_id, "transfer_send", -amount, f"تحويل إلى {recipient_id}"))
+    cursor.execute("UPDATE users SET balance = balance + %s WHERE user_id = %s", (amount, recipient_id))
+    cursor.execute("INSERT INTO transactions (user_id, type, amount, description) VALUES (%s, %s, %s, %s)",
+                   (recipient_id, "transfer_receive", amount, f"استلام من {sender_id}"))
+    return queries.OK, None, None
+
+def worker(dsn, schema, fn, accounts, count, seed, results):
+    rng = random.Random(seed)
+    conn = psycopg2.connect(dsn)
+    with conn.cursor() as cursor:
+        cursor.execute(f"SET search_path TO {schema}")
+    conn.commit()
+    outcome = {"ok": 0, "rejected": 0, "deadlocks": 0, "latencies": []}
+    for _ in range(count):
+        # حسابات قليلة ومبالغ كبيرة لزيادة التنافس على نفس الصفوف
+        sender, recipient = rng.sample(range(1, accounts + 1), 2)
+        amount = Decimal(rng.randint(1, 400))
+        started = time.perf_counter()
+        try:
+            with conn.cursor() as cursor:
+                result, _, _ = fn(cursor, sender, recipient, amount)
+            conn.commit()
+            outcome["ok" if result == queries.OK else "rejected"] += 1
+        except errors.DeadlockDetected:
+            conn.rollback()
+            outcome["deadlocks"] += 1
+        outcome["latencies"].append(time.perf_counter() - started)
+    conn.close()
+    results.append(outcome)
+
+def background(dsn, schema, kind, accounts, stop, seed, results):
+    """تسوية استثمارات تنضج باستمرار، أو دفع رواتب بفترة قصيرة جدًا، حتى تنتهي التحويلات"""
+    rng = random.Random(seed)
+    conn = psycopg2.connect(dsn)
+    with conn.cursor() as cursor:
+        cursor.execute(f"SET search_path TO {schema}")
+    conn.commit()
+    outcome = {"kind": kind, "batches": 0, "rows": 0, "deadlocks": 0}
+    while not stop.is_set():
+        try:
+            with conn.cursor() as cursor:
+                if kind == "settlement":
+                    now = datetime.now()
+                    cursor.executemany(
+                        "INSERT INTO investments (user_id, amount, start_date, end_date, return_rate, status) VALUES (%s, 1.00, %s, %s, 0.05, 'active')",
+                        [(user_id, now - timedelta(days=1), now - timedelta(seconds=1)) for user_id in sorted(rng.choices(range(1, accounts + 1), k=accounts))])
+                    conn.commit()
+                    rows = queries.settle_matured_investments(cursor, datetime.now(), accounts)
+                else:
+                    rows = queries.pay_due_salaries(cursor, 1, timedelta(milliseconds=100), datetime.now(), accounts)
+            conn.commit()
+            outcome["batches"] += 1
+            outcome["rows"] += len(rows)
+        except errors.DeadlockDetected:
+            conn.rollback()
+            outcome["deadlocks"] += 1
+    conn.close()
+    results.append(outcome)
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent transfer stress test")
+    parser.add_argument("--dsn", default=os.getenv("BENCH_DATABASE_URL") or os.getenv("DATABASE_URL"))
+    parser.add_argument("--accounts", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--transfers", type=int, default=20000)
+    parser.add_argument("--legacy", action="store_true", help="تشغيل التنفيذ السابق للمقارنة")
+    parser.add_argument("--settlers", type=int, default=2, help="خيوط تسوية الاستثمارات أثناء التحويلات")
+    parser.add_argument("--payrolls", type=int, default=2, help="خيوط دفع الرواتب أثناء التحويلات")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(args.dsn)
+    schema = f"bench_transfers_{os.getpid()}"
+    initial_balance = Decimal("1000.00")
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"CREATE SCHEMA {schema}")
+            cursor.execute(f"SET search_path TO {schema}")
+            migrate(cursor)
+            cursor.execute("INSERT INTO users (user_id, balance) SELECT g, %s FROM generate_series(1, %s) g", (initial_balance, args.accounts))
+            cursor.execute("INSERT INTO salaries (user_id, last_paid) SELECT g, %s FROM generate_series(1, %s) g", (datetime.now(), args.accounts))
+        conn.commit()
+
+        fn = legacy_transfer if args.legacy else queries.transfer
+        results = []
+        per_worker = args.transfers // args.workers
+        threads = [threading.Thread(target=worker, args=(args.dsn, schema, fn, args.accounts, per_worker, i, results)) for i in range(args.workers)]
+        stop, background_results = threading.Event(), []
+        jobs = [threading.Thread(target=background, args=(args.dsn, schema, kind, args.accounts, stop, i, background_results))
+                for i, kind in enumerate(["settlement"] * args.settlers + ["payroll"] * args.payrolls)]
+        started = time.perf_counter()
+        for thread in threads + jobs:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        stop.set()
+        for thread in jobs:
+            thread.join()
+
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT SUM(balance), MIN(balance) FROM users")
+            total, minimum = cursor.fetchone()
+            cursor.execute("""
+                SELECT COALESCE(SUM(amount), 0), COUNT(*) FILTER (WHERE type IN ('transfer_send', 'transfer_receive')),
+                       COALESCE(SUM(amount) FILTER (WHERE type IN ('transfer_send', 'transfer_receive')), 0)
+                FROM transactions
+            """)
+            ledger_sum, ledger_rows, transfers_sum = cursor.fetchone()
+
+        latencies = sorted(l for r in results for l in r["latencies"])
+        done = sum(r["ok"] for r in results)
+        print(f"implementation : {'legacy' if args.legacy else 'bank_transfer()'}")
+        print(f"transfers      : {len(latencies)} in {elapsed:.2f}s ({len(latencies) / elapsed:.0f}/s), {args.workers} workers, {args.accounts} accounts")
+        print(f"completed      : {done}, rejected: {sum(r['rejected'] for r in results)}, deadlocks: {sum(r['deadlocks'] for r in results)}")
+        print(f"latency        : p50 {latencies[len(latencies) // 2] * 1000:.1f}ms, p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f}ms")
+        for kind in ("settlement", "payroll"):
+            runs = [r for r in background_results if r["kind"] == kind]
+            if runs:
+                print(f"{kind:<15}: {sum(r['batches'] for r in runs)} batches, {sum(r['rows'] for r in runs)} rows, "
+                      f"deadlocks: {sum(r['deadlocks'] for r in runs)} ({len(runs)} threads)")
+        # الرواتب وعوائد الاستثمار تضيف مالًا مسجلًا في السجل، والتحويلات صافيها صفر
+        expected = initial_balance * args.accounts + ledger_sum
+        print(f"money supply   : {total} (expected {expected}), min balance {minimum}")
+        print(f"ledger         : {ledger_rows} transfer rows (expected {done * 2}), transfers net {transfers_sum} (expected 0)")
+        deadlocks = sum(r["deadlocks"] for r in results + background_results)
+        consistent = total == expected and minimum >= 0 and transfers_sum == 0 and ledger_rows == done * 2 and not deadlocks
+        print(f"consistent     : {'yes' if consistent else 'NO'}")
+    finally:
+        conn.rollback()
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        conn.commit()
+        conn.close()
+
+if __name__ == '__main__':
+    main()
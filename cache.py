@@ -0,0 +1,189 @@
+# ذاكرة تخزين مؤقت للبيانات التي تُقرأ بكثرة وتتغير نادرًا
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from config import CARD_CATALOG_TTL, ACCOUNT_CACHE_SIZE, ACCOUNT_CACHE_TTL
+from database import run_db
+import queries
+
+class CardCatalog:
+    """نسخة في الذاكرة من جدول البطاقات مع إبطال صريح ومدة صلاحية احتياطية"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._cards = []
+        self._by_name = {}
+        self._loaded_at = None
+        self._lock = asyncio.Lock()
+
+    def is_fresh(self):
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    async def load(self):
+        """إعادة تحميل البطاقات من قاعدة البيانات"""
+        cards = await run_db(queries.list_cards)
+        self._cards = cards
+        self._by_name = {card[0]: card for card in cards}
+        self._loaded_at = time.monotonic()
+
+    async def _ensure_loaded(self):
+        if self.is_fresh():
+            return
+        async with self._lock:
+            # قد يكون طلب آخر أعاد التحميل أثناء انتظار القفل
+            if not self.is_fresh():
+                await self.load()
+
+    async def get_all(self):
+        """جميع البطاقات (الاسم، السعر، الميزات) مرتبة حسب السعر"""
+        await self._ensure_loaded()
+        return self._cards
+
+    async def get(self, card_name):
+        """بطاقة واحدة بالاسم أو None إذا لم تكن موجودة"""
+        await self._ensure_loaded()
+        return self._by_name.get(card_name)
+
+    def invalidate(self):
+        """يجب استدعاؤها بعد أي تعديل على جدول البطاقات"""
+        self._loaded_at = None
+
+card_catalog = CardCatalog(CARD_CATALOG_TTL)
+
+class AccountCache:
+    """ذاكرة LRU محدودة لحسابات المستخدمين (الرصيد، نوع البطاقة) مع كتابة متزامنة عند كل تعديل
+
+    تُستخدم من حلقة أحداث البوت فقط. أي عملية تتداخل مع عملية أخرى على نفس المستخدم
+    (قراءة أو تعديل)، أو مع إبطال جماعي، تنتهي بحذف المدخل بدل تخزين قيمة قد تكون قديمة.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict() # user_id -> (الرصيد، نوع البطاقة، وقت التخزين)
+        self._pending = {} # user_id -> [عدد العمليات الجارية، هل حدث تداخل]
+        self._epoch = 0 # يزداد مع كل إبطال جماعي
+        self.hits = 0
+        self.misses = 0
+        self.dropped_fills = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def get(self, user_id):
+        entry = self._entries.get(user_id)
+        if entry is None or time.monotonic() - entry[2] >= self.ttl:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return entry[0], entry[1]
+
+    async def get_account(self, user_id):
+        """(الرصيد، نوع البطاقة) من الذاكرة أو من قاعدة البيانات، أو None إذا لم يكن للمستخدم حساب"""
+        account = self.get(user_id)
+        if account is not None:
+            return account
+        epoch = self._begin(user_id)
+        try:
+            account = await run_db(queries.get_account, user_id)
+        except BaseException:
+            self._end(user_id)
+            raise
+        if self._end(user_id) and self._epoch == epoch and account:
+            self._store(user_id, account[0], account[1])
+        else:
+            self.dropped_fills += 1
+        return account
+
+    @contextmanager
+    def writing(self, *user_ids):
+        """يحيط بعملية تعديل على حسابات المستخدمين، وتُسجَّل القيم الجديدة عبر write.set(...)"""
+        write = _AccountWrite()
+        epoch = self._epoch
+        for user_id in user_ids:
+            self._begin(user_id)
+        failed = False
+        try:
+            yield write
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            for user_id in user_ids:
+                clean = self._end(user_id) and self._epoch == epoch and not failed
+                value = write.values.get(user_id)
+                if not clean or value is None:
+                    self._discard(user_id)
+                    continue
+                balance, card_type = value
+                if card_type is None:
+                    # نعرف الرصيد فقط: نحدّث المدخل إن كان موجودًا
+                    entry = self._entries.get(user_id)
+                    if entry is None:
+                        continue
+                    card_type = entry[1]
+                self._store(user_id, balance, card_type)
+
+    def invalidate(self, *user_ids):
+        for user_id in user_ids:
+            self._discard(user_id)
+            if user_id in self._pending:
+                self._pending[user_id][1] = True
+
+    def invalidate_all(self):
+        """للتعديلات الجماعية (الرواتب، تسوية الاستثمارات) أو أي تعديل خارج البوت"""
+        self._epoch += 1
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "dropped_fills": self.dropped_fills,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+        }
+
+    def _begin(self, user_id):
+        pending = self._pending.get(user_id)
+        if pending is None:
+            self._pending[user_id] = [1, False]
+        else:
+            pending[0] += 1
+            pending[1] = True
+        return self._epoch
+
+    def _end(self, user_id):
+        """إنهاء عملية جارية، ويعيد True إذا لم تتداخل معها أي عملية أخرى"""
+        pending = self._pending[user_id]
+        pending[0] -= 1
+        if pending[0] == 0:
+            del self._pending[user_id]
+        return not pending[1]
+
+    def _store(self, user_id, balance, card_type):
+        self._entries[user_id] = (balance, card_type, time.monotonic())
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _discard(self, user_id):
+        if self._entries.pop(user_id, None) is not None:
+            self.invalidations += 1
+
+class _AccountWrite:
+    def __init__(self):
+        self.values = {}
+
+    def set(self, user_id, balance, card_type=None):
+        self.values[user_id] = (balance, card_type)
+
+account_cache = AccountCache(ACCOUNT_CACHE_SIZE, ACCOUNT_CACHE_TTL)
@@ -0,0 +1,170 @@
+# تشغيل أكثر من نسخة من البوت على نفس قاعدة PostgreSQL (للشظايا أو للنشر دون توقف)
+# العمل الدوري القابل للتقسيم (الرواتب وتسوية الاستثمارات) تتقاسمه النسخ دون تنسيق إضافي: كل دفعة تحجز صفوفها
+# بـ FOR UPDATE SKIP LOCKED، وPostgreSQL يعيد فحص شرط الاستحقاق على الصف بعد حجزه، فالصف الذي دفعته نسخة
+# أخرى للتو لا يُدفع مرة ثانية. ما يجب أن تنفذه نسخة واحدة فقط (أقسام السجل ولقطاته وأرشفته) تنفذه القائدة:
+# النسخة التي تحمل قفلًا استشاريًا على مستوى الجلسة في اتصال التحكم؛ إذا توقفت أُغلق اتصالها وتحرر القفل.
+# اتصال التحكم نفسه يستقبل إشعارات تغيّر الحسابات والبطاقات من النسخ الأخرى (الترحيل 10) فيبطلها من الذاكرة.
+import asyncio
+
+import psycopg2
+
+from config import DATABASE_URL, DATABASE_BACKEND, INSTANCE_NAME
+from database import application_name
+from cache import account_cache, card_catalog
+
+# مفتاح قفل القيادة (غير MIGRATION_LOCK_ID)
+LEADER_LOCK_ID = 7_160_002
+CHANNELS = ("bank_accounts", "bank_cards")
+# فترات إعادة المحاولة عند انقطاع اتصال التحكم (بالثواني)، والأخيرة تتكرر
+RECONNECT_DELAYS = (1, 2, 5, 10, 30)
+
+class Coordinator:
+    """اتصال تحكم واحد لكل نسخة يحمل قفل القيادة ويستقبل إشعارات التغيير من النسخ الأخرى"""
+
+    def __init__(self, dsn, instance, enabled):
+        self.dsn = dsn
+        self.name = application_name(instance)
+        self.enabled = enabled
+        # مع SQLite لا توجد إلا نسخة واحدة، فهي القائدة دائمًا
+        self.is_leader = not enabled
+        self.notifications = 0
+        self._conn = None
+        self._fd = None
+        self._loop = None
+        self._query_lock = None
+        self._reconnect_task = None
+
+    async def start(self):
+        if not self.enabled or self._loop is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._query_lock = asyncio.Lock()
+        try:
+            await self._connect()
+        except psycopg2.Error as e:
+            self._lost(e)
+
+    def _open(self):
+        conn = psycopg2.connect(self.dsn, application_name=self.name,
+                                keepalives=1, keepalives_idle=30, keepalives_interval=10, keepalives_count=3)
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            for channel in CHANNELS:
+                cursor.execute(f"LISTEN {channel}")
+        return conn
+
+    async def _connect(self):
+        self._conn = await asyncio.to_thread(self._open)
+        self._fd = self._conn.fileno()
+        self._loop.add_reader(self._fd, self._on_readable)
+
+    def _on_readable(self):
+        try:
+            self._conn.poll()
+        except psycopg2.Error as e:
+            self._lost(e)
+            return
+        self._drain()
+
+    def _drain(self):
+        while self._conn is not None and self._conn.notifies:
+            notify = self._conn.notifies.pop(0)
+            if notify.channel == "bank_accounts":
+                sender, ids = notify.payload.rsplit(" ", 1)
+            else:
+                sender, ids = notify.payload, None
+            # تغييرات هذه النسخة محدثة في ذاكرتها مسبقًا
+            if sender == self.name:
+                continue
+            self.notifications += 1
+            if ids is None:
+                card_catalog.invalidate()
+            else:
+                account_cache.invalidate(*(int(user_id) for user_id in ids.split(",")))
+
+    def _lost(self, error):
+        print(f"Lost coordination connection: {error}")
+        if self._fd is not None:
+            self._loop.remove_reader(self._fd)
+            self._fd = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        if self.is_leader:
+            print(f"Instance {self.name} is no longer the leader")
+            self.is_leader = False
+        # قد تكون فاتتنا إشعارات أثناء الانقطاع
+        account_cache.invalidate_all()
+        card_catalog.invalidate()
+        if self._reconnect_task is None:
+            self._reconnect_task = self._loop.create_task(self._reconnect())
+
+    async def _reconnect(self):
+        attempt = 0
+        try:
+            while True:
+                await asyncio.sleep(RECONNECT_DELAYS[min(attempt, len(RECONNECT_DELAYS) - 1)])
+                attempt += 1
+                try:
+                    await self._connect()
+                except psycopg2.Error as e:
+                    print(f"Could not reconnect coordination connection: {e}")
+                    continue
+                account_cache.invalidate_all()
+                card_catalog.invalidate()
+                print("Coordination connection restored")
+                return
+        finally:
+            self._reconnect_task = None
+
+    def _check_lock(self, held):
+        with self._conn.cursor() as cursor:
+            if held:
+                # القفل يبقى ما بقيت الجلسة، فيكفي التأكد أن الاتصال حي
+                cursor.execute("SELECT TRUE")
+            else:
+                cursor.execute("SELECT pg_try_advisory_lock(%s)", (LEADER_LOCK_ID,))
+            return cursor.fetchone()[0]
+
+    async def try_lead(self):
+        """هل هذه النسخة هي القائدة؟ تأخذ القيادة إن كانت شاغرة، وتتحقق من بقائها إن كانت تحملها"""
+        if not self.enabled:
+            return True
+        if self._conn is None:
+            return False
+        async with self._query_lock:
+            # لا نقرأ الإشعارات من حلقة الأحداث أثناء استخدام الاتصال في خيط آخر
+            self._loop.remove_reader(self._fd)
+            try:
+                leader = await asyncio.to_thread(self._check_lock, self.is_leader)
+            except psycopg2.Error as e:
+                self._lost(e)
+                return False
+            self._loop.add_reader(self._fd, self._on_readable)
+        self._drain()
+        if leader and not self.is_leader:
+            print(f"Instance {self.name} is now the leader")
+        self.is_leader = leader
+        return leader
+
+    def stats(self):
+        return {
+            "instance": self.name,
+            "leader": self.is_leader,
+            "connected": self._conn is not None or not self.enabled,
+            "notifications": self.notifications,
+        }
+
+    def close(self):
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+        if self._fd is not None:
+            self._loop.remove_reader(self._fd)
+            self._fd = None
+        if self._conn is not None:
+            # إغلاق الجلسة يحرر قفل القيادة فورًا لنسخة أخرى
+            self._conn.close()
+            self._conn = None
+        self.is_leader = not self.enabled
+
+coordinator = Coordinator(DATABASE_URL, INSTANCE_NAME, DATABASE_BACKEND == "postgresql")
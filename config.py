@@ -1,6 +1,90 @@
 import os
+import socket
 
 BOT_TOKEN = os.getenv("BOT_TOKEN", "YOUR_BOT_TOKEN")
 DATABASE_URL = os.getenv("DATABASE_URL") # رابط قاعدة بيانات PostgreSQL
+
+# واجهة التخزين: "postgresql" (خادم عبر DATABASE_URL) أو "sqlite" (ملف محلي مضمن لنشر على خادم واحد)
+DATABASE_BACKEND = os.getenv("DATABASE_BACKEND", "postgresql")
+# SQLite: مسار الملف، وعدد خيوط القراءة (الكتابة دائمًا على خيط واحد)، ووضع مزامنة القرص:
+# NORMAL مع WAL لا يفقد شيئًا عند توقف البوت، وقد يفقد آخر المعاملات المعتمدة فقط عند انقطاع الكهرباء
+# أو انهيار النظام؛ FULL يزامن القرص عند كل اعتماد
+SQLITE_PATH = os.getenv("SQLITE_PATH", "bank.sqlite3")
+SQLITE_READERS = int(os.getenv("SQLITE_READERS", "4"))
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
 CURRENCY = "ريال الحدود"
 
+# إعدادات مجمع اتصالات قاعدة البيانات
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "2"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5")) # أقصى مدة انتظار لاتصال متاح (بالثواني)
+DB_POOL_HEALTHCHECK_IDLE = float(os.getenv("DB_POOL_HEALTHCHECK_IDLE", "30")) # فحص الاتصال الخامل لأكثر من هذه المدة قبل استخدامه
+
+# عدد الاستثمارات المنتهية التي تُسوّى في كل معاملة
+SETTLEMENT_CHUNK_SIZE = int(os.getenv("SETTLEMENT_CHUNK_SIZE", "5000"))
+
+# مدة صلاحية نسخة البطاقات المخزنة في الذاكرة (بالثواني) كاحتياط إذا لم يتم إبطالها صراحة
+CARD_CATALOG_TTL = float(os.getenv("CARD_CATALOG_TTL", "3600"))
+
+# ذاكرة حسابات المستخدمين: أقصى عدد للحسابات المخزنة ومدة صلاحية كل مدخل (بالثواني)
+ACCOUNT_CACHE_SIZE = int(os.getenv("ACCOUNT_CACHE_SIZE", "10000"))
+ACCOUNT_CACHE_TTL = float(os.getenv("ACCOUNT_CACHE_TTL", "300"))
+
+# لوحة أغنى الناس: عدد المستخدمين المعروضين وفترة التحديث (بالدقائق)
+LEADERBOARD_SIZE = int(os.getenv("LEADERBOARD_SIZE", "10"))
+LEADERBOARD_REFRESH_MINUTES = float(os.getenv("LEADERBOARD_REFRESH_MINUTES", "5"))
+
+# كشف الحساب: أقصى حجم للملف المصدَّر (0 لاتباع حد المرفقات في السيرفر، وإلا فالأصغر منهما)
+# وعدد الصفوف المقروءة من الخادم في كل دفعة
+STATEMENT_MAX_EXPORT_BYTES = int(os.getenv("STATEMENT_MAX_EXPORT_BYTES", "0"))
+STATEMENT_FETCH_SIZE = int(os.getenv("STATEMENT_FETCH_SIZE", "5000"))
+
+# سجل المعاملات المقسم شهريًا: عدد الأشهر القادمة التي تُنشأ أقسامها مسبقًا، ومدة الاحتفاظ بالأقسام
+# (بالأشهر، 0 لتعطيل الأرشفة)، ومجلد ملفات الأرشيف المضغوطة
+LEDGER_PARTITIONS_AHEAD = int(os.getenv("LEDGER_PARTITIONS_AHEAD", "3"))
+LEDGER_RETENTION_MONTHS = int(os.getenv("LEDGER_RETENTION_MONTHS", "12"))
+LEDGER_ARCHIVE_DIR = os.getenv("LEDGER_ARCHIVE_DIR", "ledger_archive")
+
+# كاتب سجل المعاملات على دفعات: أنواع المعاملات التي تُكتب بعد اعتماد العملية على دفعات بدل كتابتها
+# داخل معاملتها (مفصولة بفواصل، فارغة افتراضيًا: كل الأنواع الحالية تحرك أرصدة وتبقى ذرية مع التغيير)،
+# وحجم الدفعة، وأقصى مدة انتظار قبل الكتابة (بالثواني)
+LEDGER_BATCHED_TYPES = tuple(t.strip() for t in os.getenv("LEDGER_BATCHED_TYPES", "").split(",") if t.strip())
+LEDGER_BATCH_SIZE = int(os.getenv("LEDGER_BATCH_SIZE", "500"))
+LEDGER_FLUSH_INTERVAL = float(os.getenv("LEDGER_FLUSH_INTERVAL", "1"))
+
+# الرواتب: المبلغ والفترة بين راتبين لكل مستخدم (بالساعات)، وفترة فحص المستحقين (بالثواني)
+# وأقصى عدد مستخدمين يُدفع لهم في كل معاملة
+SALARY_AMOUNT = float(os.getenv("SALARY_AMOUNT", "500"))
+SALARY_INTERVAL_HOURS = float(os.getenv("SALARY_INTERVAL_HOURS", "3"))
+SALARY_TICK_SECONDS = float(os.getenv("SALARY_TICK_SECONDS", "60"))
+SALARY_BATCH_SIZE = int(os.getenv("SALARY_BATCH_SIZE", "1000"))
+
+# تسوية الاستثمارات: الكومة في الذاكرة تحمل ما يستحق خلال هذا الأفق (بالساعات)، والاستقصاء الاحتياطي
+# كل هذه المدة (بالدقائق) يسوي ما فاتها ويعيد ملأها، لذلك يجب أن يكون الأفق أطول منه
+MATURITY_HORIZON_HOURS = float(os.getenv("MATURITY_HORIZON_HOURS", "6"))
+MATURITY_SAFETY_POLL_MINUTES = float(os.getenv("MATURITY_SAFETY_POLL_MINUTES", "30"))
+
+# نقطة /metrics بصيغة Prometheus (المنفذ 0 يعطلها)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+
+# محلل الاستعلامات: تفعيله عند الإقلاع (يمكن تبديله من لوحة الإدارة)، وحد الاستعلام البطيء (بالمللي ثانية)،
+# وطباعة خطة التنفيذ (EXPLAIN) لكل استعلام بطيء، وهي رحلة إضافية إلى الخادم
+QUERY_PROFILING = os.getenv("QUERY_PROFILING", "0") == "1"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "0") == "1"
+
+# تشغيل أكثر من نسخة من البوت على نفس قاعدة PostgreSQL: اسم هذه النسخة (يظهر في application_name لاتصالاتها
+# ويُميز إشعاراتها عن إشعارات النسخ الأخرى، فيجب أن يكون فريدًا لكل نسخة)
+INSTANCE_NAME = os.getenv("INSTANCE_NAME") or f"{socket.gethostname()}-{os.getpid()}"
+
+# التقسيم إلى شظايا: عدد الشظايا الكلي ("0" بلا تقسيم، "auto" العدد الذي يوصي به ديسكورد وكلها في هذه العملية)
+# والشظايا التي تشغلها هذه العملية (مثل "0-3" أو "0,2"، فارغ = كلها). launcher.py يضبطها لكل عملية،
+# ومعها ترتيب العملية وعدد العمليات لتقسيم مواعيد استحقاق الاستثمارات بينها
+SHARD_COUNT = os.getenv("SHARD_COUNT", "0")
+SHARD_IDS = os.getenv("SHARD_IDS", "")
+WORKER_INDEX = int(os.getenv("WORKER_INDEX", "0"))
+WORKER_COUNT = int(os.getenv("WORKER_COUNT", "1"))
+
+# مزامنة أوامر التطبيق (/bank و/finmin و/adminpanel) مع ديسكورد عند الإقلاع؛ launcher.py يفعّلها في عملية واحدة فقط
+SYNC_COMMANDS = os.getenv("SYNC_COMMANDS", "1") == "1"
@@ -1,101 +1,396 @@
+import asyncio
+import contextvars
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
 import psycopg2
-from urllib.parse import urlparse
-from config import DATABASE_URL
-
-def get_db_connection():
-    url = urlparse(DATABASE_URL)
-    conn = psycopg2.connect(
-        database=url.path[1:],
-        user=url.username,
-        password=url.password,
-        host=url.hostname,
-        port=url.port
-    )
-    return conn
+from psycopg2 import extensions, pool as pg_pool
 
-def init_db():
-    conn = get_db_connection()
-    cursor = conn.cursor()
+from config import DATABASE_URL, DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT, DB_POOL_HEALTHCHECK_IDLE, \
+    QUERY_PROFILING, SLOW_QUERY_MS, SLOW_QUERY_EXPLAIN, DATABASE_BACKEND, SQLITE_PATH, SQLITE_READERS, INSTANCE_NAME
+from migrations import MIGRATIONS, LATEST_VERSION
+import metrics
 
-    # جدول المستخدمين (الحسابات البنكية)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            user_id BIGINT PRIMARY KEY,
-            balance NUMERIC(15, 2) DEFAULT 1500.00,
-            card_type VARCHAR(50) DEFAULT 'basic'
-        )
-    """)
+# ============= قياس الاستعلامات =============
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_VALUE_ROWS = re.compile(r"\b(VALUES\s*)\([^()]*\)(?:\s*,\s*\([^()]*\))*", re.IGNORECASE)
+_EXPLAINABLE = re.compile(r"\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b", re.IGNORECASE)
 
-    # جدول البطاقات (لتحديد أسعار وميزات البطاقات)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS cards (
-            card_name VARCHAR(50) PRIMARY KEY,
-            price NUMERIC(15, 2) NOT NULL,
-            benefits TEXT
-        )
-    """)
+def normalize_sql(query):
+    """نص الاستعلام بعد استبدال القيم الحرفية بـ ? ودمج صفوف VALUES المتعددة ومسافاته"""
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", errors="replace")
+    query = _LITERALS.sub("?", query)
+    query = _VALUE_ROWS.sub(r"\1(...)", query)
+    return " ".join(query.split())
 
-    # إضافة أنواع البطاقات الافتراضية إذا لم تكن موجودة
-    cursor.execute("INSERT INTO cards (card_name, price, benefits) VALUES (
-        'silver', 5000.00, 'خصم 5% على رسوم التحويل، زيادة 1% في عائد الاستثمار'
-    ) ON CONFLICT (card_name) DO NOTHING;")
-    cursor.execute("INSERT INTO cards (card_name, price, benefits) VALUES (
-        'gold', 15000.00, 'خصم 10% على رسوم التحويل، زيادة 2% في عائد الاستثمار، سحب يومي أعلى'
-    ) ON CONFLICT (card_name) DO NOTHING;")
-    cursor.execute("INSERT INTO cards (card_name, price, benefits) VALUES (
-        'platinum', 50000.00, 'خصم 15% على رسوم التحويل، زيادة 3% في عائد الاستثمار، سحب يومي أعلى بكثير، دعم VIP'
-    ) ON CONFLICT (card_name) DO NOTHING;")
-
-    # جدول الوزارات (ميزانيات الوزارات)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS ministries (
-            ministry_id SERIAL PRIMARY KEY,
-            name VARCHAR(255) UNIQUE NOT NULL,
-            balance NUMERIC(15, 2) DEFAULT 0.00
-        )
-    """)
+class QueryProfiler:
+    """زمن الاستعلامات مجمعًا حسب نصها الموحد، مع تسجيل ما يتجاوز slow_ms (وخطته عند تفعيل explain)"""
 
-    # جدول المعاملات (للسحب، الإيداع، التحويلات)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS transactions (
-            transaction_id SERIAL PRIMARY KEY,
-            user_id BIGINT,
-            type VARCHAR(50) NOT NULL,
-            amount NUMERIC(15, 2) NOT NULL,
-            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            description TEXT,
-            FOREIGN KEY (user_id) REFERENCES users(user_id)
-        )
-    """)
+    def __init__(self, enabled, slow_ms, explain):
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self.explain = explain
+        self._lock = threading.Lock()
+        self._stats = {} # النص الموحد -> [عدد المرات، الزمن الكلي، أقصى زمن، عدد البطيئة]
 
-    # جدول الاستثمارات
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS investments (
-            investment_id SERIAL PRIMARY KEY,
-            user_id BIGINT,
-            amount NUMERIC(15, 2) NOT NULL,
-            start_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            end_date TIMESTAMP,
-            return_rate NUMERIC(5, 2),
-            status VARCHAR(50) DEFAULT 'active',
-            FOREIGN KEY (user_id) REFERENCES users(user_id)
-        )
-    """)
+    def record(self, cursor, query, vars, elapsed):
+        sql = normalize_sql(query)
+        slow = elapsed * 1000 >= self.slow_ms
+        with self._lock:
+            stats = self._stats.get(sql)
+            if stats is None:
+                stats = self._stats[sql] = [0, 0.0, 0.0, 0]
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+            stats[3] += slow
+        if slow:
+            print(f"Slow query ({elapsed * 1000:.1f} ms): {sql}")
+            if self.explain:
+                self._print_plan(cursor, query, vars)
+
+    def _print_plan(self, cursor, query, vars):
+        # خطة التنفيذ دون تشغيل الاستعلام مرة أخرى، داخل نقطة حفظ حتى لا يُفسد فشلها المعاملة الجارية
+        if cursor.name is not None or not _EXPLAINABLE.match(query.decode("utf-8", errors="replace") if isinstance(query, bytes) else query):
+            return
+        prefix = b"EXPLAIN " if isinstance(query, bytes) else "EXPLAIN "
+        with cursor.connection.cursor(cursor_factory=extensions.cursor) as plan:
+            try:
+                plan.execute("SAVEPOINT explain_slow_query")
+                plan.execute(prefix + query, vars)
+                print("\n".join(f"    {row[0]}" for row in plan.fetchall()))
+                plan.execute("RELEASE SAVEPOINT explain_slow_query")
+            except psycopg2.Error as e:
+                plan.execute("ROLLBACK TO SAVEPOINT explain_slow_query")
+                print(f"Could not explain slow query: {e}")
+
+    def top(self, limit=10):
+        """أعلى الاستعلامات زمنًا كليًا: (النص، عدد المرات، الزمن الكلي، أقصى زمن، عدد البطيئة)"""
+        with self._lock:
+            rows = [(sql, *stats) for sql, stats in self._stats.items()]
+        return sorted(rows, key=lambda row: row[2], reverse=True)[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+query_profiler = QueryProfiler(QUERY_PROFILING, SLOW_QUERY_MS, SLOW_QUERY_EXPLAIN)
+
+class MeteredCursor(extensions.cursor):
+    """مؤشر يسجل عدد الاستعلامات وزمنها للعملية الجارية (انظر metrics.py)، ولمحلل الاستعلامات عند تفعيله"""
+
+    def _timed(self, run, query, vars):
+        started = time.perf_counter()
+        try:
+            result = run()
+        except BaseException:
+            metrics.record_db(time.perf_counter() - started)
+            raise
+        elapsed = time.perf_counter() - started
+        metrics.record_db(elapsed)
+        if query_profiler.enabled:
+            query_profiler.record(self, query, vars, elapsed)
+        return result
+
+    def execute(self, query, vars=None):
+        return self._timed(lambda: super(MeteredCursor, self).execute(query, vars), query, vars)
+
+    def executemany(self, query, vars_list):
+        return self._timed(lambda: super(MeteredCursor, self).executemany(query, vars_list), query, None)
+
+    def copy_expert(self, sql, file, size=8192):
+        return self._timed(lambda: super(MeteredCursor, self).copy_expert(sql, file, size), sql, None)
+
+# ============= مجمع الاتصالات =============
+def application_name(instance):
+    """اسم اتصالات النسخة في PostgreSQL (pg_stat_activity وإشعارات التغيير، بحد 63 حرفًا)"""
+    return f"bank:{instance}"[:63]
+
+class PoolTimeoutError(Exception):
+    """لم يتوفر اتصال في المجمع خلال المهلة المحددة"""
+
+class ConnectionPool:
+    """مجمع اتصالات محدود الحجم مشترك بين جميع الأزرار والمهام الدورية"""
+
+    def __init__(self, dsn, minconn, maxconn, timeout, healthcheck_idle):
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck_idle = healthcheck_idle
+        self._pool = pg_pool.ThreadedConnectionPool(minconn, maxconn, dsn, cursor_factory=MeteredCursor,
+                                                    application_name=application_name(INSTANCE_NAME))
+        # ThreadedConnectionPool يرفع خطأ فورًا عند الامتلاء، لذلك نضبط الانتظار بسيمافور
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._last_used = {}
+        self._in_use = 0
+        self._peak_in_use = 0
+        self._acquires = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._wait_time = 0.0
+        self._discarded = 0
+
+    def acquire(self):
+        """استعارة اتصال سليم من المجمع مع الانتظار حتى انتهاء المهلة"""
+        started = time.monotonic()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._waits += 1
+            if not self._slots.acquire(timeout=self.timeout):
+                with self._lock:
+                    self._timeouts += 1
+                raise PoolTimeoutError(f"لم يتوفر اتصال بقاعدة البيانات خلال {self.timeout} ثانية")
+        try:
+            conn = self._get_healthy_connection()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._acquires += 1
+            self._wait_time += time.monotonic() - started
+            self._in_use += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+        return conn
 
-    # جدول الرواتب (لتتبع آخر راتب تم دفعه)
+    def release(self, conn):
+        """إرجاع الاتصال إلى المجمع أو إغلاقه إذا كان تالفًا"""
+        broken = conn.closed != 0
+        if not broken and conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+        with self._lock:
+            self._in_use -= 1
+            if broken:
+                self._discarded += 1
+                self._last_used.pop(id(conn), None)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+        self._pool.putconn(conn, close=broken)
+        self._slots.release()
+
+    def _get_healthy_connection(self):
+        # نعيد المحاولة مرة واحدة لكل اتصال في المجمع قبل الاستسلام
+        for _ in range(self.maxconn + 1):
+            conn = self._pool.getconn()
+            if self._is_healthy(conn):
+                return conn
+            with self._lock:
+                self._discarded += 1
+                self._last_used.pop(id(conn), None)
+            self._pool.putconn(conn, close=True)
+        raise psycopg2.OperationalError("تعذر الحصول على اتصال سليم بقاعدة البيانات")
+
+    def _is_healthy(self, conn):
+        if conn.closed != 0:
+            return False
+        last_used = self._last_used.get(id(conn))
+        if last_used is None or time.monotonic() - last_used < self.healthcheck_idle:
+            return True
+        # الاتصال خامل منذ مدة: نتحقق أنه ما زال حيًا قبل تسليمه
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    @contextmanager
+    def connection(self):
+        """اتصال مستعار يُرجع تلقائيًا، مع التراجع عن المعاملة عند الخطأ"""
+        conn = self.acquire()
+        try:
+            yield conn
+        except Exception:
+            if conn.closed == 0:
+                conn.rollback()
+            raise
+        finally:
+            self.release(conn)
+
+    def stats(self):
+        """مؤشرات تشبع المجمع"""
+        with self._lock:
+            return {
+                "max_size": self.maxconn,
+                "in_use": self._in_use,
+                "peak_in_use": self._peak_in_use,
+                "acquires": self._acquires,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "avg_wait_ms": (self._wait_time / self._acquires * 1000) if self._acquires else 0.0,
+                "discarded": self._discarded,
+            }
+
+    def close(self):
+        self._pool.closeall()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """إرجاع المجمع المشترك وإنشاؤه عند أول استخدام"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DATABASE_URL, DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT, DB_POOL_HEALTHCHECK_IDLE)
+    return _pool
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+@contextmanager
+def db_connection():
+    """استعارة اتصال من المجمع المشترك"""
+    with get_pool().connection() as conn:
+        yield conn
+
+# دوال تُستدعى بعد اعتماد المعاملة الجارية فقط (لا تُستدعى إذا تم التراجع عنها)
+_after_commit = contextvars.ContextVar("after_commit", default=None)
+
+@contextmanager
+def after_commit_scope():
+    """نطاق معاملة لـ on_commit: الدوال المسجلة داخله تُستدعى بعد خروج الكتلة بنجاح فقط"""
+    callbacks = []
+    token = _after_commit.set(callbacks)
+    try:
+        yield
+    finally:
+        _after_commit.reset(token)
+    for callback in callbacks:
+        callback()
+
+@contextmanager
+def db_cursor():
+    """مؤشر داخل معاملة: تُعتمد عند النجاح ويُتراجع عنها عند الخطأ"""
+    with after_commit_scope():
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                yield cursor
+            conn.commit()
+
+def on_commit(callback):
+    """تأجيل callback() إلى ما بعد اعتماد معاملة db_cursor الجارية"""
+    callbacks = _after_commit.get()
+    if callbacks is None:
+        raise RuntimeError("on_commit must be called inside a database transaction")
+    callbacks.append(callback)
+
+def pool_stats():
+    return get_pool().stats()
+
+# ============= التنفيذ غير المتزامن =============
+# خيوط مخصصة لاستعلامات قاعدة البيانات بعدد اتصالات المجمع، حتى لا يتوقف البوت
+# بالكامل (بما فيه نبضات الاتصال بديسكورد) أثناء انتظار استعلام بطيء
+_executor = ThreadPoolExecutor(max_workers=DB_POOL_MAX, thread_name_prefix="db")
+
+def _run_in_transaction(fn, args, kwargs):
+    with db_cursor() as cursor:
+        return fn(cursor, *args, **kwargs)
+
+class PostgresBackend:
+    """PostgreSQL عبر مجمع الاتصالات، وكل دالة في معاملة على أحد خيوط قاعدة البيانات"""
+    name = "postgresql"
+
+    def submit(self, ctx, fn, args, kwargs):
+        """تنفيذ fn(cursor, *args, **kwargs) داخل السياق ctx، ويعيد concurrent.futures.Future"""
+        return _executor.submit(ctx.run, _run_in_transaction, fn, args, kwargs)
+
+    def stats(self):
+        return {"backend": self.name, **pool_stats()}
+
+    def close(self):
+        close_pool()
+
+# واجهة التخزين المختارة في DATABASE_BACKEND: "postgresql" أو "sqlite" (انظر sqlite_backend.py)
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if DATABASE_BACKEND == "sqlite":
+                # استيراد متأخر: sqlite_backend يستورد دوال الوصول للبيانات التي تستورد هذه الوحدة
+                from sqlite_backend import SqliteBackend
+                _backend = SqliteBackend(SQLITE_PATH, SQLITE_READERS)
+            elif DATABASE_BACKEND == "postgresql":
+                _backend = PostgresBackend()
+            else:
+                raise ValueError(f"Unknown DATABASE_BACKEND: {DATABASE_BACKEND!r}")
+        return _backend
+
+def close_db():
+    global _backend
+    with _backend_lock:
+        if _backend is not None:
+            _backend.close()
+            _backend = None
+
+def db_stats():
+    return get_backend().stats()
+
+async def run_db(fn, *args, **kwargs):
+    """تنفيذ دالة وصول للبيانات fn(cursor, ...) داخل معاملة على خيوط قاعدة البيانات"""
+    return await asyncio.wrap_future(get_backend().submit(contextvars.copy_context(), fn, args, kwargs))
+
+def run_db_sync(fn, *args, **kwargs):
+    """مثل run_db خارج حلقة الأحداث (سكربتات الإدارة واختبارات الأداء)"""
+    return get_backend().submit(contextvars.copy_context(), fn, args, kwargs).result()
+
+# ============= المخطط =============
+# مفتاح قفل استشاري يمنع نسختين من البوت من تطبيق الترحيلات في الوقت نفسه
+MIGRATION_LOCK_ID = 7_160_001
+
+def schema_version(cursor):
+    """إصدار المخطط الحالي في قاعدة البيانات (0 إذا لم يُطبق أي ترحيل)"""
+    cursor.execute("SELECT to_regclass('schema_version') IS NOT NULL")
+    if not cursor.fetchone()[0]:
+        return 0
+    cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    return cursor.fetchone()[0]
+
+def migrate(cursor):
+    """تطبيق الترحيلات غير المطبقة بالترتيب، ويعيد إصدارات ما تم تطبيقه"""
+    if schema_version(cursor) >= LATEST_VERSION:
+        return []
+    cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
     cursor.execute("""
-        CREATE TABLE IF NOT EXISTS salaries (
-            user_id BIGINT PRIMARY KEY,
-            last_paid TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     """)
+    # إعادة القراءة بعد أخذ القفل، فقد تكون نسخة أخرى طبقت الترحيلات أثناء الانتظار
+    current = schema_version(cursor)
+    applied = []
+    for version, description, steps in MIGRATIONS:
+        if version <= current:
+            continue
+        for step in steps:
+            if callable(step):
+                step(cursor)
+            else:
+                cursor.execute(step)
+        cursor.execute("INSERT INTO schema_version (version, description) VALUES (%s, %s)", (version, description))
+        applied.append(version)
+    return applied
 
-    conn.commit()
-    cursor.close()
-    conn.close()
+def init_db():
+    return run_db_sync(migrate)
 
 if __name__ == '__main__':
-    init_db()
-    print("Database initialized successfully.")
-
+    applied = init_db()
+    print(f"Database initialized successfully (applied migrations: {applied or 'none'}).")
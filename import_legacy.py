@@ -0,0 +1,253 @@
+# نقل بيانات البوت القديم (bank_data.db من main_backup.py) إلى مخطط PostgreSQL الحالي
+# أداة تعمل والبوت متوقف: تقرأ كل جدول من SQLite على دفعات وتكتبها بـ COPY داخل معاملة واحدة،
+# فإما أن تُنقل البيانات كلها وتُطابق أعدادها ومجاميعها، أو لا يتغير شيء في PostgreSQL.
+# الاستخدام: python import_legacy.py bank_data.db [--batch-size 100000] [--replace]
+import argparse
+import io
+import math
+import sqlite3
+import time
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+
+import psycopg2
+
+from config import DATABASE_URL, LEDGER_PARTITIONS_AHEAD
+from database import migrate
+import ledger
+
+CENT = Decimal("0.01")
+# أكبر قيمة في NUMERIC(15, 2)
+MAX_AMOUNT = Decimal("9999999999999.99")
+
+# النسخة القديمة كانت تسجل الخصم بمبلغ موجب؛ السجل الحالي يسجل كل خصم بالسالب (انظر snapshots.py)
+DEBIT_TYPES = ("withdraw", "transfer_send")
+
+# (الجدول، الأعمدة، أعمدة المبالغ، عمود المعرف التسلسلي) بترتيب يحترم المفاتيح الأجنبية
+TABLES = [
+    ("users", ("user_id", "balance", "card_type"), ("balance",), None),
+    ("ministries", ("ministry_id", "name", "balance"), ("balance",), "ministry_id"),
+    ("salaries", ("user_id", "last_paid"), (), None),
+    ("investments", ("investment_id", "user_id", "amount", "start_date", "end_date", "return_rate", "status"), ("amount", "return_rate"), "investment_id"),
+    ("transactions", ("transaction_id", "user_id", "type", "amount", "timestamp", "description"), ("amount",), "transaction_id"),
+]
+
+# صفوف تشير إلى مستخدم غير موجود: SQLite لا يفرض المفاتيح الأجنبية افتراضيًا، وPostgreSQL سيرفضها
+ORPHANS = {
+    "salaries": "SELECT COUNT(*) FROM salaries s WHERE NOT EXISTS (SELECT 1 FROM users u WHERE u.user_id = s.user_id)",
+    "investments": "SELECT COUNT(*) FROM investments i WHERE i.user_id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM users u WHERE u.user_id = i.user_id)",
+    "transactions": "SELECT COUNT(*) FROM transactions t WHERE t.user_id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM users u WHERE u.user_id = t.user_id)",
+}
+
+class LegacyImportError(Exception):
+    """بيانات لا يمكن نقلها كما هي، أو نتيجة نقل لا تطابق المصدر"""
+
+def to_numeric(value):
+    """REAL إلى NUMERIC بالهللة، ويعيد (القيمة، هل فُقد منها كسر حقيقي أصغر من الهللة)
+
+    يُؤخذ أقصر تمثيل عشري يعيد نفس القيمة (repr) ثم يُقرَّب، فيصبح 1499.9999999999998 هو 1500.00
+    """
+    exact = Decimal(repr(float(value)))
+    rounded = exact.quantize(CENT, rounding=ROUND_HALF_UP)
+    if abs(rounded) > MAX_AMOUNT:
+        raise LegacyImportError(f"Amount {value!r} does not fit NUMERIC(15, 2)")
+    return rounded, exact != rounded and abs(exact - rounded) > Decimal("0.000001")
+
+def _copy_text(value):
+    if value is None:
+        return "\\N"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+class TableImport:
+    """نقل جدول واحد على دفعات، مع حساب العدد ومجاميع المبالغ المتوقعة أثناء القراءة"""
+
+    def __init__(self, table, columns, amount_columns, now):
+        self.table = table
+        self.columns = columns
+        self.amount_indexes = [columns.index(c) for c in amount_columns]
+        self.now = now
+        self.rows = 0
+        self.sums = {c: Decimal(0) for c in amount_columns}
+        self.rounded = 0 # قيم فيها كسور أصغر من الهللة (وليست مجرد خطأ تمثيل الفاصلة العائمة)
+        self.negated = 0
+        self.filled_timestamps = 0
+        if table == "transactions":
+            self._ledger_indexes = (columns.index("type"), columns.index("amount"), columns.index("timestamp"))
+
+    def convert(self, row):
+        row = list(row)
+        for index in self.amount_indexes:
+            if row[index] is None:
+                continue
+            row[index], lost = to_numeric(row[index])
+            self.rounded += lost
+        if self.table == "transactions":
+            type_index, amount_index, ts_index = self._ledger_indexes
+            if row[type_index] in DEBIT_TYPES and row[amount_index] > 0:
+                row[amount_index] = -row[amount_index]
+                self.negated += 1
+            # مفتاح تقسيم السجل لا يقبل NULL
+            if row[ts_index] is None:
+                row[ts_index] = self.now
+                self.filled_timestamps += 1
+        for column, index in zip(self.sums, self.amount_indexes):
+            if row[index] is not None:
+                self.sums[column] += row[index]
+        return row
+
+    def run(self, source, cursor, batch_size):
+        rows = source.execute(f"SELECT {', '.join(self.columns)} FROM {self.table} ORDER BY rowid")
+        copy_sql = f"COPY {self.table} ({', '.join(self.columns)}) FROM STDIN"
+        while True:
+            batch = rows.fetchmany(batch_size)
+            if not batch:
+                return
+            buffer = io.StringIO()
+            for row in batch:
+                buffer.write("\t".join(_copy_text(value) for value in self.convert(row)) + "\n")
+            buffer.seek(0)
+            cursor.copy_expert(copy_sql, buffer)
+            self.rows += len(batch)
+
+def _check_source(source):
+    problems = [f"{table}: {count} rows reference missing users"
+                for table, sql in ORPHANS.items() if (count := source.execute(sql).fetchone()[0])]
+    if problems:
+        raise LegacyImportError("Legacy data has orphaned rows; fix them in SQLite first: " + "; ".join(problems))
+
+def _check_target_empty(cursor, replace):
+    if replace:
+        cursor.execute("TRUNCATE users, ministries, salaries, investments, transactions, balance_snapshots CASCADE")
+        return
+    for table, *_ in TABLES:
+        cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {table})")
+        if cursor.fetchone()[0]:
+            raise LegacyImportError(f"Target table {table} is not empty (use --replace to overwrite it)")
+
+def _prepare_partitions(source, cursor, now):
+    # أقسام شهرية لكل أشهر السجل القديم قبل النسخ، حتى لا تتكدس الصفوف في القسم الافتراضي
+    first = source.execute("SELECT MIN(timestamp) FROM transactions").fetchone()[0]
+    month = ledger.month_start(datetime.fromisoformat(first) if first else now)
+    existing = set(ledger.list_partitions(cursor))
+    while month < ledger.month_start(now):
+        if month not in existing:
+            ledger.create_partition(cursor, month)
+        month = ledger.add_months(month, 1)
+    ledger.ensure_partitions(cursor, now, LEDGER_PARTITIONS_AHEAD)
+
+def _reset_sequence(source, cursor, table, column):
+    # لا يُعاد استخدام معرف سبق إصداره في SQLite حتى لو حُذف صفه (AUTOINCREMENT يحفظه في sqlite_sequence)
+    row = source.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+    cursor.execute(f"SELECT MAX({column}) FROM {table}")
+    last = max(cursor.fetchone()[0] or 0, row[0] if row else 0)
+    cursor.execute("SELECT setval(pg_get_serial_sequence(%s, %s), %s, %s)", (table, column, max(last, 1), last > 0))
+
+# فرق التقريب المسموح بين مجموع المصدر ومجموع PostgreSQL: حتى نصف هللة لكل قيمة فيها كسر حقيقي أصغر من الهللة،
+# وخطأ تمثيل الفاصلة العائمة لكل قيمة أخرى (انظر to_numeric)
+HALF_CENT = Decimal("0.005")
+FLOAT_NOISE = Decimal("0.000001")
+
+def _source_sum(source, job, column):
+    """مجموع العمود في SQLite نفسه بعد قاعدة الإشارة الموثقة، مستقلًا عن TableImport.convert"""
+    expression, params = column, ()
+    if job.table == "transactions" and column == "amount":
+        expression = f"CASE WHEN type IN ({', '.join('?' * len(DEBIT_TYPES))}) AND amount > 0 THEN -amount ELSE amount END"
+        params = DEBIT_TYPES
+    rows = source.execute(f"SELECT {expression} FROM {job.table} WHERE {column} IS NOT NULL", params)
+    return Decimal(repr(math.fsum(float(value) for (value,) in rows)))
+
+def _verify(source, cursor, imports):
+    for job in imports:
+        source_rows = source.execute(f"SELECT COUNT(*) FROM {job.table}").fetchone()[0]
+        if source_rows != job.rows:
+            raise LegacyImportError(f"{job.table}: SQLite has {source_rows} rows but {job.rows} were copied")
+        cursor.execute(f"SELECT COUNT(*){''.join(f', COALESCE(SUM({c}), 0)' for c in job.sums)} FROM {job.table}")
+        count, *sums = cursor.fetchone()
+        if count != job.rows:
+            raise LegacyImportError(f"{job.table}: copied {job.rows} rows but found {count}")
+        for (column, expected), actual in zip(job.sums.items(), sums):
+            if actual != expected:
+                raise LegacyImportError(f"{job.table}.{column}: expected sum {expected} but found {actual}")
+            # مجموع الصفوف المحولة لا يكشف خطأً في التحويل نفسه (إشارة أو تقريب)، فيُقارن أيضًا بالمصدر
+            source_sum = _source_sum(source, job, column)
+            allowed = job.rounded * HALF_CENT + job.rows * FLOAT_NOISE
+            if abs(actual - source_sum) > allowed:
+                raise LegacyImportError(f"{job.table}.{column}: SQLite sums to {source_sum} but PostgreSQL to {actual} "
+                                        f"(more than the {allowed} allowed by rounding)")
+
+def import_legacy(sqlite_path, conn, batch_size=100_000, replace=False):
+    """نقل bank_data.db إلى قاعدة PostgreSQL عبر الاتصال conn في معاملة واحدة، ويعيد قائمة TableImport"""
+    source = sqlite3.connect(f"file:{sqlite_path}?mode=ro", uri=True)
+    now = datetime.now()
+    try:
+        _check_source(source)
+        with conn.cursor() as cursor:
+            migrate(cursor)
+            conn.commit()
+            # لا حاجة لانتظار مزامنة القرص عند الاعتماد: إذا انقطعت الكهرباء تُعاد الأداة كاملة
+            cursor.execute("SET LOCAL synchronous_commit = off")
+            _check_target_empty(cursor, replace)
+            _prepare_partitions(source, cursor, now)
+
+            imports = []
+            for table, columns, amount_columns, serial in TABLES:
+                job = TableImport(table, columns, amount_columns, now)
+                started = time.perf_counter()
+                job.run(source, cursor, batch_size)
+                elapsed = time.perf_counter() - started
+                print(f"{table}: {job.rows} rows in {elapsed:.1f}s ({job.rows / elapsed if elapsed else 0:.0f} rows/s)")
+                if serial:
+                    _reset_sequence(source, cursor, table, serial)
+                imports.append(job)
+
+            _verify(source, cursor, imports)
+            # للعلم فقط: النسخة القديمة لم تسجل كل حركة في السجل (مثل الاستثمارات المسواة يدويًا)،
+            # فكشوف الحساب القديمة قد لا تصل إلى الرصيد الحالي لهؤلاء المستخدمين
+            cursor.execute("""
+                SELECT COUNT(*) FROM users u
+                LEFT JOIN (SELECT user_id, SUM(amount) AS total FROM transactions WHERE ministry_id IS NULL GROUP BY user_id) t
+                    ON t.user_id = u.user_id
+                WHERE u.balance <> COALESCE(t.total, 0)
+            """)
+            unexplained = cursor.fetchone()[0]
+            if unexplained:
+                print(f"Note: the imported ledger does not add up to the current balance for {unexplained} users")
+            # اللقطات تُبنى من جديد من السجل المنقول في مهمة maintain_ledger التالية
+            cursor.execute("UPDATE snapshot_progress SET snapshot_through = NULL")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        source.close()
+
+    with conn.cursor() as cursor:
+        for table, *_ in TABLES:
+            cursor.execute(f"ANALYZE {table}")
+    conn.commit()
+    return imports
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Import the legacy SQLite bank_data.db into PostgreSQL")
+    parser.add_argument("sqlite_path", nargs="?", default="bank_data.db")
+    parser.add_argument("--dsn", default=DATABASE_URL)
+    parser.add_argument("--batch-size", type=int, default=100_000, help="عدد الصفوف في كل COPY")
+    parser.add_argument("--replace", action="store_true", help="حذف بيانات الجداول الحالية في PostgreSQL قبل النقل")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(args.dsn)
+    try:
+        started = time.perf_counter()
+        imports = import_legacy(args.sqlite_path, conn, args.batch_size, args.replace)
+    finally:
+        conn.close()
+    for job in imports:
+        sums = "".join(f", sum({column}) = {total}" for column, total in job.sums.items())
+        print(f"{job.table}: {job.rows} rows verified{sums}")
+        if job.rounded:
+            print(f"  {job.rounded} amounts had fractions of a cent and were rounded to 0.01")
+        if job.negated:
+            print(f"  {job.negated} withdraw/transfer_send amounts were stored as negative debits")
+        if job.filled_timestamps:
+            print(f"  {job.filled_timestamps} rows without a timestamp were given the import time")
+    print(f"Legacy import completed in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,153 @@
+# تشغيل البوت على عدة عمليات، كل عملية تحمل نطاقًا متصلًا من الشظايا ونواة معالج خاصة بها
+# بايثون ينفذ حلقة أحداث واحدة على نواة واحدة، فبوت كبير بعملية واحدة يتوقف عند نواة مهما كثرت الشظايا.
+# كل عملية نسخة كاملة من main.py (انظر cluster.py): الرواتب والتسوية تتقاسمها بـ SKIP LOCKED، وصيانة السجل
+# على القائدة فقط، ومواعيد الاستحقاق موزعة بـ WORKER_INDEX، وذاكرة كل عملية تُبطل بإشعارات الأخريات.
+# الاستخدام: python launcher.py [--processes 4] [--shards auto] [--db-connections 90] [--dry-run]
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from config import BOT_TOKEN, DATABASE_BACKEND, DB_POOL_MIN, DB_POOL_MAX, METRICS_PORT, INSTANCE_NAME
+from sharding import format_shard_ids, gateway_info, split_shards
+
+# ديسكورد يقبل اتصالًا جديدًا (IDENTIFY) واحدًا كل 5 ثوانٍ لكل مجموعة من max_concurrency شظية، وكل عملية
+# تلتزم بذلك لشظاياها فقط، فتتأخر كل عملية حتى تنتهي سابقاتها من الاتصال
+IDENTIFY_INTERVAL = 5
+# فترات انتظار إعادة تشغيل عملية توقفت (بالثواني)، والأخيرة تتكرر؛ وتُصفَّر إذا عاشت العملية هذه المدة
+RESTART_DELAYS = (1, 5, 15, 60)
+STABLE_SECONDS = 300
+# كل عملية تعمل من مجلد البوت مهما كان المجلد الذي شُغّل منه launcher.py
+BOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+class Worker:
+    """عملية main.py واحدة ومتغيرات بيئتها"""
+
+    def __init__(self, index, env, delay, core):
+        self.index = index
+        self.env = env
+        self.delay = delay
+        self.core = core
+        self.process = None
+        self.started = None
+        self.restarts = 0
+
+    @property
+    def name(self):
+        return self.env["INSTANCE_NAME"]
+
+    def start(self):
+        self.process = subprocess.Popen([sys.executable, os.path.join(BOT_DIR, "main.py")], cwd=BOT_DIR,
+                                        env={**os.environ, **self.env})
+        self.started = time.monotonic()
+        if self.core is not None:
+            try:
+                os.sched_setaffinity(self.process.pid, {self.core})
+            except OSError as e:
+                print(f"[{self.name}] Could not pin to CPU {self.core}: {e}")
+        print(f"[{self.name}] Started (pid {self.process.pid}, shards {self.env['SHARD_IDS']})")
+
+def plan(processes, shard_count, max_concurrency, db_connections, cores):
+    """متغيرات بيئة كل عملية ومدة تأخير بدئها"""
+    workers = []
+    delay = 0
+    pool_max = max(DB_POOL_MIN, min(DB_POOL_MAX, db_connections // processes))
+    for index, shard_ids in enumerate(split_shards(shard_count, processes)):
+        env = {
+            "SHARD_COUNT": str(shard_count),
+            "SHARD_IDS": format_shard_ids(shard_ids),
+            "WORKER_INDEX": str(index),
+            "WORKER_COUNT": str(processes),
+            "INSTANCE_NAME": f"{INSTANCE_NAME}-shards-{format_shard_ids(shard_ids)}",
+            "DB_POOL_MAX": str(pool_max),
+            # منفذ مقاييس مختلف لكل عملية (0 يبقى معطلًا)
+            "METRICS_PORT": str(METRICS_PORT + index if METRICS_PORT else 0),
+            # أوامر التطبيق عامة لكل الشظايا، فتكفي مزامنتها من عملية واحدة
+            "SYNC_COMMANDS": "1" if index == 0 else "0",
+        }
+        workers.append(Worker(index, env, delay, cores[index % len(cores)] if cores else None))
+        delay += -(-len(shard_ids) // max_concurrency) * IDENTIFY_INTERVAL
+    return workers
+
+def supervise(workers):
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for worker in workers:
+            if worker.process and worker.process.poll() is None:
+                worker.process.send_signal(signal.SIGINT)
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    started = time.monotonic()
+    for worker in workers:
+        time.sleep(max(0, started + worker.delay - time.monotonic()))
+        if stopping:
+            break
+        worker.start()
+
+    pending = {}
+    while not stopping:
+        time.sleep(1)
+        for worker in workers:
+            if worker.index in pending:
+                if time.monotonic() >= pending[worker.index]:
+                    del pending[worker.index]
+                    worker.start()
+                continue
+            code = worker.process.poll() if worker.process else None
+            if code is None:
+                continue
+            if time.monotonic() - worker.started >= STABLE_SECONDS:
+                worker.restarts = 0
+            wait = RESTART_DELAYS[min(worker.restarts, len(RESTART_DELAYS) - 1)]
+            worker.restarts += 1
+            print(f"[{worker.name}] Exited with code {code}, restarting in {wait}s")
+            pending[worker.index] = time.monotonic() + wait
+
+    for worker in workers:
+        if worker.process is not None:
+            try:
+                worker.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                print(f"[{worker.name}] Did not stop in time, killing it")
+                worker.process.kill()
+
+if __name__ == '__main__':
+    available = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else None
+    parser = argparse.ArgumentParser(description="Run the bot as several sharded processes")
+    parser.add_argument("--processes", type=int, default=len(available) if available else os.cpu_count() or 1)
+    parser.add_argument("--shards", default="auto", help="عدد الشظايا الكلي، أو auto للعدد الذي يوصي به ديسكورد")
+    parser.add_argument("--max-concurrency", type=int, help="يُقرأ من ديسكورد مع --shards auto، وإلا 1")
+    parser.add_argument("--db-connections", type=int, default=90,
+                        help="مجموع اتصالات PostgreSQL لكل العمليات (اترك هامشًا من max_connections لاتصالات التحكم)")
+    parser.add_argument("--no-pin", action="store_true", help="عدم تثبيت كل عملية على نواة")
+    parser.add_argument("--dry-run", action="store_true", help="طباعة التوزيع دون تشغيل شيء")
+    args = parser.parse_args()
+
+    if DATABASE_BACKEND != "postgresql" and args.processes > 1:
+        sys.exit("Running several processes needs DATABASE_BACKEND=postgresql (SQLite has a single writer per process)")
+
+    max_concurrency = args.max_concurrency or 1
+    if args.shards == "auto":
+        recommended, concurrency = asyncio.run(gateway_info(BOT_TOKEN))
+        max_concurrency = args.max_concurrency or concurrency
+        shard_count = recommended
+        print(f"Discord recommends {recommended} shards (max_concurrency {concurrency})")
+    else:
+        shard_count = int(args.shards)
+    # كل عملية تحمل شظية واحدة على الأقل
+    shard_count = max(shard_count, args.processes)
+
+    workers = plan(args.processes, shard_count, max_concurrency, args.db_connections, None if args.no_pin else available)
+    for worker in workers:
+        print(f"{worker.name}: start after {worker.delay}s, cpu {worker.core if worker.core is not None else '-'}, "
+              + " ".join(f"{key}={value}" for key, value in worker.env.items()))
+    if not args.dry_run:
+        supervise(workers)
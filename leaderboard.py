@@ -0,0 +1,64 @@
+# لوحة أغنى الناس: تُحدَّث دوريًا في الخلفية وتُعرض من الذاكرة فورًا
+import asyncio
+import time
+
+import discord
+
+from config import LEADERBOARD_SIZE, LEADERBOARD_REFRESH_MINUTES
+from database import run_db
+import queries
+
+# مدة الاحتفاظ باسم مستخدم محلول قبل إعادة جلبه من ديسكورد (بالثواني)
+NAME_TTL = 3600
+
+class Leaderboard:
+    """أغنى المستخدمين مع أسمائهم المحلولة مسبقًا"""
+
+    def __init__(self, size, refresh_interval):
+        self.size = size
+        self.refresh_interval = refresh_interval
+        self._rows = []
+        self._refreshed_at = None
+        self._names = {} # user_id -> (الاسم، وقت الجلب)
+        self._lock = asyncio.Lock()
+
+    def is_fresh(self):
+        return self._refreshed_at is not None and time.monotonic() - self._refreshed_at < self.refresh_interval
+
+    async def refresh(self, client):
+        """إعادة قراءة القائمة من قاعدة البيانات وحل الأسماء الناقصة بالتوازي"""
+        async with self._lock:
+            rows = await run_db(queries.richest_users, self.size)
+            now = time.monotonic()
+            missing = [user_id for user_id, _ in rows
+                       if user_id not in self._names or now - self._names[user_id][1] >= NAME_TTL]
+            names = await asyncio.gather(*(self._resolve_name(client, user_id) for user_id in missing))
+            for user_id, name in zip(missing, names):
+                if name is not None:
+                    self._names[user_id] = (name, now)
+            # لا نحتفظ إلا بأسماء من هم في القائمة حاليًا
+            current = {user_id for user_id, _ in rows}
+            self._names = {user_id: entry for user_id, entry in self._names.items() if user_id in current}
+            self._rows = rows
+            self._refreshed_at = now
+
+    async def ensure_fresh(self, client):
+        if not self.is_fresh():
+            await self.refresh(client)
+
+    def entries(self):
+        """قائمة (الترتيب، الاسم، الرصيد)"""
+        return [(i + 1, self._names.get(user_id, (f"المستخدم {user_id}",))[0], balance)
+                for i, (user_id, balance) in enumerate(self._rows)]
+
+    @staticmethod
+    async def _resolve_name(client, user_id):
+        user = client.get_user(user_id)
+        if user is None:
+            try:
+                user = await client.fetch_user(user_id)
+            except discord.HTTPException:
+                return None
+        return user.display_name
+
+leaderboard = Leaderboard(LEADERBOARD_SIZE, LEADERBOARD_REFRESH_MINUTES * 60)
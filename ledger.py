@@ -0,0 +1,89 @@
+# إدارة أقسام سجل المعاملات: جدول transactions مقسم شهريًا حسب timestamp
+# تُنشأ أقسام الأشهر القادمة مسبقًا، وتُؤرشف الأقسام الأقدم من مدة الاحتفاظ إلى ملفات مضغوطة ثم تُحذف.
+import gzip
+import os
+import re
+from datetime import datetime
+
+PARTITION_PREFIX = "transactions_p"
+DEFAULT_PARTITION = "transactions_default"
+_PARTITION_NAME = re.compile(rf"{PARTITION_PREFIX}(\d{{6}})")
+
+def month_start(ts):
+    return datetime(ts.year, ts.month, 1)
+
+def add_months(month, count):
+    years, index = divmod(month.month - 1 + count, 12)
+    return datetime(month.year + years, index + 1, 1)
+
+def partition_name(month):
+    return f"{PARTITION_PREFIX}{month:%Y%m}"
+
+def list_partitions(cursor):
+    """أشهر الأقسام الملحقة حاليًا بجدول المعاملات، تصاعديًا"""
+    cursor.execute("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'transactions'::regclass
+    """)
+    months = []
+    for (name,) in cursor.fetchall():
+        match = _PARTITION_NAME.fullmatch(name)
+        if match:
+            months.append(datetime.strptime(match.group(1), "%Y%m"))
+    return sorted(months)
+
+def create_partition(cursor, month):
+    """إنشاء قسم الشهر وإلحاقه، بعد نقل أي صفوف من هذا الشهر وقعت في القسم الافتراضي"""
+    name = partition_name(month)
+    start, end = month, add_months(month, 1)
+    # يُنشأ الجدول منفصلًا ثم يُلحق، لأن إنشاءه مباشرة كقسم يفشل إذا احتوى القسم الافتراضي على صفوف من الشهر
+    cursor.execute(f"CREATE TABLE {name} (LIKE transactions INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    cursor.execute(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION} WHERE timestamp >= %s AND timestamp < %s RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """, (start, end))
+    cursor.execute(f"ALTER TABLE transactions ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", (start, end))
+
+def ensure_partitions(cursor, now, ahead):
+    """التأكد من وجود أقسام الشهر الحالي والأشهر القادمة، ويعيد أشهر ما تم إنشاؤه"""
+    existing = set(list_partitions(cursor))
+    created = []
+    current = month_start(now)
+    for offset in range(ahead + 1):
+        month = add_months(current, offset)
+        if month not in existing:
+            create_partition(cursor, month)
+            created.append(month)
+    return created
+
+def expired_partitions(cursor, now, retention_months):
+    """أشهر الأقسام التي انتهت كلها قبل بداية مدة الاحتفاظ"""
+    cutoff = add_months(month_start(now), -retention_months)
+    return [month for month in list_partitions(cursor) if add_months(month, 1) <= cutoff]
+
+def archive_partition(cursor, month, archive_dir):
+    """نسخ قسم منتهٍ إلى ملف CSV مضغوط ثم فصله وحذفه، ويعيد (مسار الملف، عدد الصفوف)
+
+    يُقفل القسم وحده أثناء النسخ، ولا يُقفل الجدول الأصلي إلا لحظة الفصل في آخر المعاملة.
+    """
+    name = partition_name(month)
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"transactions_{month:%Y_%m}.csv.gz")
+    partial = path + ".partial"
+
+    cursor.execute(f"LOCK TABLE {name} IN SHARE MODE")
+    with open(partial, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as compressed:
+            cursor.copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER)", compressed)
+        raw.flush()
+        os.fsync(raw.fileno())
+    cursor.execute(f"SELECT COUNT(*) FROM {name}")
+    rows = cursor.fetchone()[0]
+    # إذا فشل اعتماد المعاملة بعد هذه النقطة يبقى القسم كما هو، وتُعاد كتابة الملف في المرة القادمة
+    os.replace(partial, path)
+
+    cursor.execute(f"ALTER TABLE transactions DETACH PARTITION {name}")
+    cursor.execute(f"DROP TABLE {name}")
+    return path, rows
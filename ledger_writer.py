@@ -0,0 +1,139 @@
+# كاتب سجل المعاملات على دفعات
+# قيود أنواع المعاملات المختارة في LEDGER_BATCHED_TYPES تُضاف إلى طابور في الذاكرة بعد اعتماد العملية،
+# وتُكتب لاحقًا بإدخال متعدد الصفوف عند امتلاء الدفعة أو مرور LEDGER_FLUSH_INTERVAL.
+# بقية الأنواع تُكتب داخل معاملة العملية نفسها كما هي. القيود المؤجلة قد تضيع إذا توقفت العملية فجأة
+# قبل كتابتها، لذلك لا تصلح إلا للقيود المعلوماتية التي لا تحرك رصيدًا (انظر snapshots.py).
+# القيد الذي تأخرت كتابته حتى نصف مهلة اللقطات يُكتب بوقت كتابته، فلا يقع أبدًا في يوم أُغلقت لقطاته.
+import asyncio
+import threading
+from collections import deque
+from datetime import datetime
+
+from psycopg2.extras import execute_values
+
+from config import LEDGER_BATCHED_TYPES, LEDGER_BATCH_SIZE, LEDGER_FLUSH_INTERVAL
+from database import run_db
+from snapshots import GRACE
+
+# أقصى عمر لقيد في الطابور قبل أن يُكتب بوقت كتابته، وقبل أن يتوقف تأجيل القيود الجديدة
+STALE_AFTER = GRACE / 2
+# مهل إعادة محاولة كتابة ما تبقى في الطابور عند الإيقاف (بالثواني)
+CLOSE_RETRY_DELAYS = (1, 2, 5)
+
+def _insert_batch(cursor, entries):
+    execute_values(cursor, """
+        INSERT INTO transactions (user_id, ministry_id, type, amount, description, timestamp) VALUES %s
+    """, entries, page_size=len(entries))
+
+class LedgerWriter:
+    """طابور قيود مشترك بين خيوط قاعدة البيانات ومهمة كتابة واحدة على حلقة البوت"""
+
+    def __init__(self, batched_types, batch_size, flush_interval):
+        self.batched_types = frozenset(batched_types)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._loop = None
+        self._wakeup = None
+        self._task = None
+        self._closing = False
+        self._written = 0
+        self._batches = 0
+        self._failures = 0
+        self._restamped = 0
+
+    def is_batched(self, type_):
+        """هل يُؤجَّل هذا النوع؟ (لا شيء يُؤجَّل قبل بدء مهمة الكتابة أو بعد إيقافها،
+        ولا ما دام في الطابور قيد متأخر عن STALE_AFTER لأن الكتابة متعثرة)"""
+        return (self._task is not None and not self._closing and type_ in self.batched_types
+                and not self._stalled(datetime.now()))
+
+    def _stalled(self, now):
+        with self._lock:
+            return bool(self._pending) and now - self._pending[0][5] > STALE_AFTER
+
+    def submit(self, entry):
+        """إضافة قيد (user_id, ministry_id, type, amount, description, timestamp)، من أي خيط"""
+        with self._lock:
+            self._pending.append(entry)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def start(self):
+        if self._task is None and self.batched_types:
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+            self._closing = False
+            self._task = self._loop.create_task(self._run())
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+        await self.flush()
+
+    async def flush(self):
+        """كتابة كل ما في الطابور على دفعات، مع إبقاء الدفعة الفاشلة في مقدمته لإعادة المحاولة"""
+        while True:
+            with self._lock:
+                batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+            if not batch:
+                return
+            now = datetime.now()
+            stale = sum(1 for entry in batch if now - entry[5] > STALE_AFTER)
+            rows = [entry if now - entry[5] <= STALE_AFTER else entry[:5] + (now,) for entry in batch]
+            try:
+                await run_db(_insert_batch, rows)
+            except Exception as e:
+                with self._lock:
+                    self._pending.extendleft(reversed(batch))
+                self._failures += 1
+                print(f"Error writing ledger batch of {len(batch)} entries: {e}")
+                return
+            if stale:
+                self._restamped += stale
+                print(f"Ledger batch had {stale} entries older than {STALE_AFTER}, written with the current time")
+            self._written += len(batch)
+            self._batches += 1
+
+    async def close(self):
+        """إيقاف مهمة الكتابة بعد كتابة ما تبقى في الطابور، مع إعادة المحاولة إن فشلت الكتابة"""
+        if self._task is None:
+            return
+        self._closing = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        for delay in CLOSE_RETRY_DELAYS:
+            if not self._pending:
+                return
+            await asyncio.sleep(delay)
+            await self.flush()
+        with self._lock:
+            lost = list(self._pending)
+            self._pending.clear()
+        # آخر ملجأ: طباعة القيود كاملة لإدخالها يدويًا
+        for entry in lost:
+            print(f"Unwritten ledger entry: {entry!r}")
+        if lost:
+            print(f"Ledger writer stopped with {len(lost)} unwritten entries")
+
+    def stats(self):
+        with self._lock:
+            queued = len(self._pending)
+        return {
+            "batched_types": sorted(self.batched_types),
+            "queued": queued,
+            "written": self._written,
+            "batches": self._batches,
+            "failures": self._failures,
+            "restamped": self._restamped,
+        }
+
+ledger_writer = LedgerWriter(LEDGER_BATCHED_TYPES, LEDGER_BATCH_SIZE, LEDGER_FLUSH_INTERVAL)
@@ -1,19 +1,102 @@
 import discord
+from discord import app_commands
 from discord.ext import commands, tasks
 from discord.ui import Button, View, Select
 import os
+import time
 import psycopg2
 from datetime import datetime, timedelta
+from decimal import Decimal
 from urllib.parse import urlparse
 
-from config import BOT_TOKEN, DATABASE_URL, CURRENCY
-from database import init_db, get_db_connection
-
-intents = discord.Intents.default()
-intents.message_content = True
-intents.members = True
-
-bot = commands.Bot(command_prefix="!", intents=intents)
+from config import BOT_TOKEN, DATABASE_URL, CURRENCY, SETTLEMENT_CHUNK_SIZE, LEADERBOARD_REFRESH_MINUTES, \
+    LEDGER_PARTITIONS_AHEAD, LEDGER_RETENTION_MONTHS, LEDGER_ARCHIVE_DIR, \
+    SALARY_AMOUNT, SALARY_INTERVAL_HOURS, SALARY_TICK_SECONDS, SALARY_BATCH_SIZE, MATURITY_SAFETY_POLL_MINUTES, \
+    METRICS_HOST, METRICS_PORT, SHARD_COUNT, SHARD_IDS, SYNC_COMMANDS
+from database import migrate, run_db, db_stats, close_db, query_profiler
+import queries
+import statements
+import ledger
+import snapshots
+from cache import card_catalog, account_cache
+from ledger_writer import ledger_writer
+from maturity import maturity_scheduler
+import metrics
+from metrics import instrument
+from leaderboard import leaderboard
+from cluster import coordinator
+from sharding import shard_options, format_shard_ids
+
+# الأوامر كلها أوامر تطبيق (/) والأزرار تفاعلات، وكلاهما يصل دون أي نية (intent)؛ نية guilds وحدها تكفي لذاكرة
+# السيرفرات وأدوارها التي تعتمد عليها has_role وis_admin. بلا رسائل ولا أعضاء لا يرسل ديسكورد أحداث كل رسالة
+# وكتابة وتفاعل في كل قناة، ولا يُحمَّل كل أعضاء كل سيرفر في الذاكرة
+intents = discord.Intents.none()
+intents.guilds = True
+
+# None: بوت باتصال واحد بالبوابة، وإلا AutoShardedBot يشغل الشظايا المحددة لهذه العملية (انظر sharding.py)
+SHARDING = shard_options(SHARD_COUNT, SHARD_IDS)
+
+class BankBot(commands.Bot if SHARDING is None else commands.AutoShardedBot):
+    """البوت مع دورة إقلاع تعمل مرة واحدة لكل عملية، لا عند كل إعادة اتصال بالبوابة"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.process_started = time.perf_counter()
+        self.ready_reported = False
+        self.metrics_runner = None
+
+    async def setup_hook(self):
+        started = time.perf_counter()
+        try:
+            applied = await run_db(migrate) # التأكد من تهيئة قاعدة البيانات عند بدء البوت
+            print(f"Database ensured to be initialized (applied migrations: {applied or 'none'}).")
+        except Exception as e:
+            print(f"Error initializing database: {e}")
+        try:
+            await card_catalog.load()
+        except Exception as e:
+            print(f"Error loading card catalog: {e}")
+        for task in (salary_task, process_investments, refresh_leaderboard, maintain_ledger):
+            if not task.is_running():
+                task.start()
+        ledger_writer.start()
+        await coordinator.start()
+        metrics.track_interaction_responses()
+        if METRICS_PORT:
+            try:
+                self.metrics_runner = await metrics.start_server(METRICS_HOST, METRICS_PORT)
+                print(f"Metrics available at http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+            except OSError as e:
+                print(f"Error starting metrics endpoint: {e}")
+        maturity_scheduler.start(settle_matured_investments)
+        if SYNC_COMMANDS:
+            try:
+                synced = await self.tree.sync()
+                print(f"Synced {len(synced)} application commands")
+            except discord.HTTPException as e:
+                print(f"Error syncing application commands: {e}")
+        print(f"Bootstrap completed in {time.perf_counter() - started:.2f}s")
+
+    def dispatch(self, event_name, /, *args, **kwargs):
+        # عدّ أحداث البوابة هنا بدل مستمع on_socket_event_type، الذي يُنشئ مهمة لكل حدث
+        if event_name == "socket_event_type":
+            metrics.gateway_events.inc(event=args[0])
+        super().dispatch(event_name, *args, **kwargs)
+
+    async def close(self):
+        for task in (salary_task, process_investments, refresh_leaderboard, maintain_ledger):
+            task.cancel()
+        maturity_scheduler.stop()
+        coordinator.close()
+        await super().close()
+        await ledger_writer.close()
+        if self.metrics_runner:
+            await self.metrics_runner.cleanup()
+        close_db()
+
+# لا بادئة للأوامر (لا تصل الرسائل أصلًا)، ولا ذاكرة للرسائل، ولا يُحفظ العضو الذي يأتي مع كل تفاعل
+bot = BankBot(command_prefix=commands.when_mentioned, intents=intents, help_command=None, max_messages=None,
+              member_cache_flags=discord.MemberCacheFlags.none(), chunk_guilds_at_startup=False, **(SHARDING or {}))
 
 # ============= دوال مساعدة =============
 def has_role(member, role_name):
@@ -27,90 +110,108 @@ def is_admin(member):
 # ============= أحداث البوت =============
 @bot.event
 async def on_ready():
+    # يُستدعى بعد كل إعادة اتصال، لذلك لا يحتوي إلا على ما هو رخيص
     print(f'Logged in as {bot.user}')
-    try:
-        init_db() # التأكد من تهيئة قاعدة البيانات عند بدء البوت
-        print("Database ensured to be initialized.")
-    except Exception as e:
-        print(f"Error initializing database: {e}")
-    salary_task.start()
-    process_investments.start()
-    print("Bot is ready!")
+    if not bot.ready_reported:
+        bot.ready_reported = True
+        print(f"Bot is ready! (startup took {time.perf_counter() - bot.process_started:.2f}s)")
 
 @bot.event
-async def on_command_error(ctx, error):
-    if isinstance(error, commands.CommandNotFound):
-        return
-    elif isinstance(error, commands.MissingRequiredArgument):
-        await ctx.send(f"الرجاء توفير جميع المتطلبات لهذا الأمر: {error}")
-    elif isinstance(error, commands.MissingPermissions):
-        await ctx.send("ليس لديك الصلاحيات الكافية لاستخدام هذا الأمر.")
+async def on_shard_ready(shard_id):
+    print(f"Shard {shard_id} of {bot.shard_count} is ready ({len([g for g in bot.guilds if g.shard_id == shard_id])} guilds)")
+
+@bot.tree.error
+async def on_app_command_error(interaction, error):
+    print(f"An error occurred in /{interaction.command.name if interaction.command else '?'}: {error}")
+    message = "حدث خطأ غير متوقع. الرجاء المحاولة لاحقًا."
+    if interaction.response.is_done():
+        await interaction.followup.send(message, ephemeral=True)
     else:
-        print(f"An error occurred: {error}")
-        await ctx.send("حدث خطأ غير متوقع. الرجاء المحاولة لاحقًا.")
+        await interaction.response.send_message(message, ephemeral=True)
 
 # ============= مهام دورية =============
-@tasks.loop(hours=3)
+@tasks.loop(seconds=SALARY_TICK_SECONDS)
+@instrument
 async def salary_task():
-    """مهمة دفع الرواتب كل 3 ساعات"""
-    conn = None
+    """دفع الرواتب المستحقة كل دقيقة على دفعات صغيرة، فيُدفع لكل مستخدم عند موعده كل 3 ساعات"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT user_id, last_paid FROM salaries")
-        salaries_data = cursor.fetchall()
-
-        for user_data in salaries_data:
-            user_id = user_data[0] # user_id
-            last_paid = user_data[1] # last_paid is already datetime object from psycopg2
-
-            if datetime.now() - last_paid >= timedelta(hours=3):
-                salary_amount = 500.00
-                cursor.execute("UPDATE users SET balance = balance + %s WHERE user_id = %s", (salary_amount, user_id))
-                cursor.execute("UPDATE salaries SET last_paid = %s WHERE user_id = %s", (datetime.now(), user_id))
-                cursor.execute("INSERT INTO transactions (user_id, type, amount, description) VALUES (%s, %s, %s, %s)",
-                               (user_id, "salary", salary_amount, "راتب دوري"))
-                print(f"Paid salary of {salary_amount} to user {user_id}")
-
-        conn.commit()
+        now = datetime.now()
+        total = 0
+        while True:
+            paid_users = await run_db(queries.pay_due_salaries, SALARY_AMOUNT, timedelta(hours=SALARY_INTERVAL_HOURS), now, SALARY_BATCH_SIZE)
+            account_cache.invalidate(*paid_users)
+            total += len(paid_users)
+            if len(paid_users) < SALARY_BATCH_SIZE:
+                break
+        if total:
+            print(f"Paid salary of {SALARY_AMOUNT} to {total} users")
     except Exception as e:
         print(f"Error in salary task: {e}")
-    finally:
-        if conn:
-            conn.close()
 
-@tasks.loop(minutes=10)
+async def settle_matured_investments(now):
+    """تسوية كل الاستثمارات المنتهية حتى now (تستدعيها جدولة الاستحقاق والاستقصاء الاحتياطي)"""
+    # التسوية على دفعات محدودة، كل دفعة في معاملة مستقلة حتى لا تُحجز الأقفال طويلًا
+    total = 0
+    while True:
+        settled = await run_db(queries.settle_matured_investments, now, SETTLEMENT_CHUNK_SIZE)
+        account_cache.invalidate(*(user_id for _, user_id, _ in settled))
+        total += len(settled)
+        if len(settled) < SETTLEMENT_CHUNK_SIZE:
+            break
+    if total:
+        print(f"Processed {total} matured investments")
+
+@tasks.loop(minutes=MATURITY_SAFETY_POLL_MINUTES)
+@instrument
 async def process_investments():
-    """مهمة معالجة الاستثمارات المنتهية"""
-    conn = None
+    """استقصاء احتياطي: تسوية ما فات جدولة الاستحقاق، ثم إعادة ملء كومتها للأفق القادم"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        now = datetime.now()
-        cursor.execute("SELECT investment_id, user_id, amount, return_rate FROM investments WHERE status = %s AND end_date <= %s", ("active", now))
-        completed_investments = cursor.fetchall()
-
-        for inv in completed_investments:
-            investment_id = inv[0] # investment_id
-            user_id = inv[1] # user_id
-            original_amount = inv[2] # amount
-            return_rate = inv[3] # return_rate
+        await settle_matured_investments(datetime.now())
+        await maturity_scheduler.refill()
+    except Exception as e:
+        print(f"Error processing investments: {e}")
 
-            profit = float(original_amount) * float(return_rate)
-            total_return = float(original_amount) + profit
+@tasks.loop(minutes=LEADERBOARD_REFRESH_MINUTES)
+@instrument
+async def refresh_leaderboard():
+    """تحديث لوحة أغنى الناس في الخلفية حتى تُعرض فورًا عند الضغط"""
+    try:
+        await bot.wait_until_ready()
+        await leaderboard.refresh(bot)
+    except Exception as e:
+        print(f"Error refreshing leaderboard: {e}")
 
-            cursor.execute("UPDATE users SET balance = balance + %s WHERE user_id = %s", (total_return, user_id))
-            cursor.execute("INSERT INTO transactions (user_id, type, amount, description) VALUES (%s, %s, %s, %s)",
-                           (user_id, "investment_return", total_return, f"عائد استثمار رقم {investment_id} (أصل + ربح)"))
-            cursor.execute("UPDATE investments SET status = %s WHERE investment_id = %s", ("completed", investment_id))
-            print(f"Processed investment {investment_id} for user {user_id}. Returned {total_return}")
+@tasks.loop(hours=1)
+@instrument
+async def maintain_ledger():
+    """إنشاء أقسام سجل المعاملات للأشهر القادمة، والتقاط لقطات الأرصدة اليومية، وأرشفة الأقسام القديمة
 
-        conn.commit()
+    تعمل على النسخة القائدة فقط (انظر cluster.py)، وكل ساعة حتى تتولاها نسخة أخرى سريعًا إذا توقفت القائدة؛
+    الجولة التي لا تجد عملًا لا تكلف إلا بضعة استعلامات.
+    """
+    try:
+        if not await coordinator.try_lead():
+            return
+        now = datetime.now()
+        created = await run_db(ledger.ensure_partitions, now, LEDGER_PARTITIONS_AHEAD)
+        if created:
+            print(f"Created ledger partitions: {', '.join(f'{month:%Y-%m}' for month in created)}")
+        # اللقطات أولًا: لا يُؤرشف قسم قبل أن تُلتقط أرصدة كل أيامه
+        while True:
+            through, written = await run_db(snapshots.take_snapshots, now)
+            if written:
+                print(f"Wrote {written} balance snapshots through {through}")
+            if through >= (now - snapshots.GRACE).date() - timedelta(days=1):
+                break
+        if LEDGER_RETENTION_MONTHS <= 0:
+            return
+        # كل قسم في معاملة مستقلة حتى لا يُحجز قفل الجدول الأصلي إلا لحظة فصل القسم
+        expired = await run_db(ledger.expired_partitions, now, LEDGER_RETENTION_MONTHS)
+        for month in (m for m in expired if ledger.add_months(m, 1).date() <= through + timedelta(days=1)):
+            path, rows = await run_db(ledger.archive_partition, month, LEDGER_ARCHIVE_DIR)
+            print(f"Archived {rows} transactions from {month:%Y-%m} to {path}")
     except Exception as e:
-        print(f"Error processing investments: {e}")
-    finally:
-        if conn:
-            conn.close()
+        print(f"Error maintaining ledger: {e}")
 
 # ============= القوائم التفاعلية =============
 
@@ -120,39 +221,28 @@ class MemberMenuView(View):
         super().__init__(timeout=None)
 
     @discord.ui.button(label="💰 فتح حساب", style=discord.ButtonStyle.green, custom_id="open_account")
+    @instrument
     async def open_account_button(self, interaction: discord.Interaction, button: Button):
         user_id = interaction.user.id
-        conn = None
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM users WHERE user_id = %s", (user_id,))
-            user = cursor.fetchone()
-            if user:
+            initial_balance = Decimal("1500.00")
+            with account_cache.writing(user_id) as write:
+                created = await run_db(queries.open_account, user_id, initial_balance, datetime.now())
+                if created:
+                    write.set(user_id, initial_balance, "basic")
+            if not created:
                 await interaction.response.send_message("لديك بالفعل حساب بنكي!", ephemeral=True)
             else:
-                initial_balance = 1500.00
-                cursor.execute("INSERT INTO users (user_id, balance) VALUES (%s, %s)", (user_id, initial_balance))
-                cursor.execute("INSERT INTO salaries (user_id, last_paid) VALUES (%s, %s)", (user_id, datetime.now()))
-                cursor.execute("INSERT INTO transactions (user_id, type, amount, description) VALUES (%s, %s, %s, %s)",
-                               (user_id, "deposit", initial_balance, "رصيد مبدئي لفتح الحساب"))
-                conn.commit()
                 await interaction.response.send_message(f"✅ تم فتح حساب بنكي لك بنجاح!\n💵 رصيدك المبدئي: **{initial_balance} {CURRENCY}**", ephemeral=True)
         except Exception as e:
             await interaction.response.send_message(f"❌ حدث خطأ: {e}", ephemeral=True)
-        finally:
-            if conn:
-                conn.close()
 
     @discord.ui.button(label="💳 رصيدي", style=discord.ButtonStyle.primary, custom_id="check_balance")
+    @instrument
     async def check_balance_button(self, interaction: discord.Interaction, button: Button):
         user_id = interaction.user.id
-        conn = None
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT balance, card_type FROM users WHERE user_id = %s", (user_id,))
-            user = cursor.fetchone()
+            user = await account_cache.get_account(user_id)
             if user:
                 embed = discord.Embed(title="💳 رصيدك الحالي", color=discord.Color.blue())
                 embed.add_field(name="المبلغ", value=f"**{user[0]} {CURRENCY}**", inline=False)
@@ -162,53 +252,42 @@ class MemberMenuView(View):
                 await interaction.response.send_message("❌ ليس لديك حساب بنكي. استخدم زر **فتح حساب** أولاً.", ephemeral=True)
         except Exception as e:
             await interaction.response.send_message(f"❌ حدث خطأ: {e}", ephemeral=True)
-        finally:
-            if conn:
-                conn.close()
 
     @discord.ui.button(label="💸 تحويل", style=discord.ButtonStyle.primary, custom_id="transfer")
+    @instrument
     async def transfer_button(self, interaction: discord.Interaction, button: Button):
         await interaction.response.send_modal(TransferModal())
 
     @discord.ui.button(label="📈 استثمار", style=discord.ButtonStyle.primary, custom_id="invest")
+    @instrument
     async def invest_button(self, interaction: discord.Interaction, button: Button):
         await interaction.response.send_modal(InvestModal())
 
     @discord.ui.button(label="📊 استثماراتي", style=discord.ButtonStyle.secondary, custom_id="my_investments")
+    @instrument
     async def my_investments_button(self, interaction: discord.Interaction, button: Button):
-        user_id = interaction.user.id
-        conn = None
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT amount, start_date, end_date, return_rate, status FROM investments WHERE user_id = %s ORDER BY status DESC, end_date ASC", (user_id,))
-            investments = cursor.fetchall()
+            view = InvestmentsPageView(interaction.user.id)
+            await view.load_page()
 
-            if not investments:
+            if not view.rows:
                 await interaction.response.send_message("❌ ليس لديك أي استثمارات حاليًا.", ephemeral=True)
                 return
 
-            embed = discord.Embed(title="📊 استثماراتك", color=discord.Color.green())
-            for inv in investments:
-                status_text = "🟢 نشط" if inv[4] == "active" else "✅ منتهي"
-                embed.add_field(name=f"💰 {inv[0]} {CURRENCY}",
-                                value=f"📅 بدء: {inv[1]}\n📅 انتهاء: {inv[2]}\n📈 عائد: {float(inv[3])*100:.0f}%\n{status_text}",
-                                inline=False)
-            await interaction.response.send_message(embed=embed, ephemeral=True)
+            await interaction.response.send_message(embed=view.build_embed(), view=view, ephemeral=True)
         except Exception as e:
             await interaction.response.send_message(f"❌ حدث خطأ: {e}", ephemeral=True)
-        finally:
-            if conn:
-                conn.close()
+
+    @discord.ui.button(label="📜 كشف حساب", style=discord.ButtonStyle.secondary, custom_id="statement")
+    @instrument
+    async def statement_button(self, interaction: discord.Interaction, button: Button):
+        await interaction.response.send_modal(StatementModal())
 
     @discord.ui.button(label="💎 البطاقات", style=discord.ButtonStyle.secondary, custom_id="cards")
+    @instrument
     async def cards_button(self, interaction: discord.Interaction, button: Button):
-        conn = None
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT card_name, price, benefits FROM cards ORDER BY price ASC")
-            cards = cursor.fetchall()
+            cards = await card_catalog.get_all()
 
             if not cards:
                 await interaction.response.send_message("❌ لا توجد بطاقات متاحة حاليًا.", ephemeral=True)
@@ -217,14 +296,155 @@ class MemberMenuView(View):
             embed = discord.Embed(title="💎 البطاقات البنكية المتاحة", description="اختر البطاقة التي تناسبك!", color=discord.Color.purple())
             for card in cards:
                 embed.add_field(name=f"{card[0].capitalize()} - {card[1]} {CURRENCY}", value=card[2], inline=False)
-            
+
             view = BuyCardView()
             await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
         except Exception as e:
             await interaction.response.send_message(f"❌ حدث خطأ: {e}", ephemeral=True)
+
+# تصفح الاستثمارات صفحة بصفحة
+class InvestmentsPageView(View):
+    PAGE_SIZE = 10 # أقل بكثير من حد ديسكورد (25 حقلًا لكل رسالة)
+
+    def __init__(self, user_id):
+        super().__init__(timeout=300)
+        self.user_id = user_id
+        self.page_starts = [None] # مفتاح بداية كل صفحة تمت زيارتها
+        self.rows = []
+        self.has_next = False
+
+    async def load_page(self):
+        """تحميل الصفحة الحالية فقط (صف إضافي لمعرفة وجود صفحة تالية)"""
+        rows = await run_db(queries.list_investments_page, self.user_id, self.page_starts[-1], self.PAGE_SIZE + 1)
+        self.has_next = len(rows) > self.PAGE_SIZE
+        self.rows = rows[:self.PAGE_SIZE]
+        self.previous_button.disabled = len(self.page_starts) == 1
+        self.next_button.disabled = not self.has_next
+
+    def build_embed(self):
+        embed = discord.Embed(title="📊 استثماراتك", color=discord.Color.green())
+        for inv in self.rows:
+            status_text = "🟢 نشط" if inv[5] == "active" else "✅ منتهي"
+            embed.add_field(name=f"💰 {inv[1]} {CURRENCY}",
+                            value=f"📅 بدء: {inv[2]}\n📅 انتهاء: {inv[3]}\n📈 عائد: {float(inv[4])*100:.0f}%\n{status_text}",
+                            inline=False)
+        embed.set_footer(text=f"صفحة {len(self.page_starts)}")
+        return embed
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        return interaction.user.id == self.user_id
+
+    @discord.ui.button(label="◀️ السابق", style=discord.ButtonStyle.secondary)
+    @instrument
+    async def previous_button(self, interaction: discord.Interaction, button: Button):
+        try:
+            self.page_starts.pop()
+            await self.load_page()
+            await interaction.response.edit_message(embed=self.build_embed(), view=self)
+        except Exception as e:
+            await interaction.response.send_message(f"❌ حدث خطأ: {e}", ephemeral=True)
+
+    @discord.ui.button(label="التالي ▶️", style=discord.ButtonStyle.secondary)
+    @instrument
+    async def next_button(self, interaction: discord.Interaction, button: Button):
+        try:
+            last = self.rows[-1]
+            self.page_starts.append((last[5], last[3], last[0]))
+            await self.load_page()
+            await interaction.response.edit_message(embed=self.build_embed(), view=self)
+        except Exception as e:
+            await interaction.response.send_message(f"❌ حدث خطأ: {e}", ephemeral=True)
+
+# كشف الحساب صفحة بصفحة مع التصدير كملف
+class StatementView(View):
+    PAGE_SIZE = 10
+
+    def __init__(self, user_id, start, end):
+        super().__init__(timeout=600)
+        self.user_id = user_id
+        self.start = start
+        self.end = end
+        self.page_starts = [None]
+        self.rows = []
+        self.has_next = False
+        self.opening_balance = None
+
+    async def load_opening_balance(self):
+        if self.start:
+            day = self.start.date() - timedelta(days=1)
+            self.opening_balance = await run_db(snapshots.balance_on, snapshots.USER, self.user_id, day)
+
+    async def load_page(self):
+        rows = await run_db(queries.list_transactions_page, self.user_id, self.start, self.end, self.page_starts[-1], self.PAGE_SIZE + 1)
+        self.has_next = len(rows) > self.PAGE_SIZE
+        self.rows = rows[:self.PAGE_SIZE]
+        self.previous_button.disabled = len(self.page_starts) == 1
+        self.next_button.disabled = not self.has_next
+
+    def build_embed(self):
+        period = f"{self.start:%Y-%m-%d} ← {self.end - timedelta(days=1):%Y-%m-%d}" if self.start and self.end else \
+                 f"منذ {self.start:%Y-%m-%d}" if self.start else \
+                 f"حتى {self.end - timedelta(days=1):%Y-%m-%d}" if self.end else "كل الفترات"
+        if self.opening_balance is not None:
+            period += f"\nالرصيد في بداية الفترة: **{self.opening_balance}** {CURRENCY}"
+        embed = discord.Embed(title="📜 كشف الحساب", description=period, color=discord.Color.teal())
+        for transaction_id, timestamp, type_, amount, description in self.rows:
+            embed.add_field(name=f"{amount} {CURRENCY}",
+                            value=f"📅 {timestamp:%Y-%m-%d %H:%M}\n🏷️ {type_}\n{description or ''}",
+                            inline=False)
+        embed.set_footer(text=f"صفحة {len(self.page_starts)}")
+        return embed
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        return interaction.user.id == self.user_id
+
+    @discord.ui.button(label="◀️ السابق", style=discord.ButtonStyle.secondary)
+    @instrument
+    async def previous_button(self, interaction: discord.Interaction, button: Button):
+        try:
+            self.page_starts.pop()
+            await self.load_page()
+            await interaction.response.edit_message(embed=self.build_embed(), view=self)
+        except Exception as e:
+            await interaction.response.send_message(f"❌ حدث خطأ: {e}", ephemeral=True)
+
+    @discord.ui.button(label="التالي ▶️", style=discord.ButtonStyle.secondary)
+    @instrument
+    async def next_button(self, interaction: discord.Interaction, button: Button):
+        try:
+            last = self.rows[-1]
+            self.page_starts.append((last[1], last[0]))
+            await self.load_page()
+            await interaction.response.edit_message(embed=self.build_embed(), view=self)
+        except Exception as e:
+            await interaction.response.send_message(f"❌ حدث خطأ: {e}", ephemeral=True)
+
+    @discord.ui.button(label="📥 CSV", style=discord.ButtonStyle.primary)
+    @instrument
+    async def export_csv_button(self, interaction: discord.Interaction, button: Button):
+        await self.export(interaction, "csv")
+
+    @discord.ui.button(label="📥 JSONL", style=discord.ButtonStyle.primary)
+    @instrument
+    async def export_jsonl_button(self, interaction: discord.Interaction, button: Button):
+        await self.export(interaction, "jsonl")
+
+    async def export(self, interaction, fmt):
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        try:
+            out, count = await run_db(statements.export_transactions, self.user_id, self.start, self.end, fmt,
+                                      statements.export_limit(interaction.guild))
+        except statements.ExportTooLarge:
+            await interaction.followup.send("❌ الكشف أكبر من الحد المسموح للمرفقات. الرجاء تضييق الفترة الزمنية.", ephemeral=True)
+            return
+        except Exception as e:
+            await interaction.followup.send(f"❌ حدث خطأ أثناء التصدير: {e}", ephemeral=True)
+            return
+        try:
+            file = discord.File(out, filename=f"statement_{self.user_id}.{fmt}.gz")
+            await interaction.followup.send(f"✅ تم تصدير **{count}** معاملة.", file=file, ephemeral=True)
         finally:
-            if conn:
-                conn.close()
+            out.close()
 
 # قائمة وزير المالية
 class FinanceMinisterMenuView(View):
@@ -232,6 +452,7 @@ class FinanceMinisterMenuView(View):
         super().__init__(timeout=None)
 
     @discord.ui.button(label="🏛️ توزيع ميزانية", style=discord.ButtonStyle.green, custom_id="distribute_budget")
+    @instrument
     async def distribute_budget_button(self, interaction: discord.Interaction, button: Button):
         if not has_role(interaction.user, "وزير المالية") and not is_admin(interaction.user):
             await interaction.response.send_message("❌ هذا الخيار متاح فقط لوزير المالية!", ephemeral=True)
@@ -239,16 +460,13 @@ class FinanceMinisterMenuView(View):
         await interaction.response.send_modal(DistributeBudgetModal())
 
     @discord.ui.button(label="📊 ميزانيات الوزارات", style=discord.ButtonStyle.primary, custom_id="view_ministry_budgets")
+    @instrument
     async def view_ministry_budgets_button(self, interaction: discord.Interaction, button: Button):
         if not has_role(interaction.user, "وزير المالية") and not is_admin(interaction.user):
             await interaction.response.send_message("❌ هذا الخيار متاح فقط لوزير المالية!", ephemeral=True)
             return
-        conn = None
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT name, balance FROM ministries")
-            ministries = cursor.fetchall()
+            ministries = await run_db(queries.list_ministries)
 
             if not ministries:
                 await interaction.response.send_message("❌ لا توجد وزارات مسجلة حاليًا.", ephemeral=True)
@@ -260,11 +478,9 @@ class FinanceMinisterMenuView(View):
             await interaction.response.send_message(embed=embed, ephemeral=True)
         except Exception as e:
             await interaction.response.send_message(f"❌ حدث خطأ: {e}", ephemeral=True)
-        finally:
-            if conn:
-                conn.close()
 
     @discord.ui.button(label="💸 سحب من وزارة", style=discord.ButtonStyle.red, custom_id="withdraw_from_ministry")
+    @instrument
     async def withdraw_from_ministry_button(self, interaction: discord.Interaction, button: Button):
         if not has_role(interaction.user, "وزير المالية") and not is_admin(interaction.user):
             await interaction.response.send_message("❌ هذا الخيار متاح فقط لوزير المالية!", ephemeral=True)
@@ -277,6 +493,7 @@ class AdminMenuView(View):
         super().__init__(timeout=None)
 
     @discord.ui.button(label="💰 إعطاء مال", style=discord.ButtonStyle.green, custom_id="give_money_admin")
+    @instrument
     async def give_money_admin_button(self, interaction: discord.Interaction, button: Button):
         if not is_admin(interaction.user):
             await interaction.response.send_message("❌ هذا الخيار متاح فقط للإدارة!", ephemeral=True)
@@ -284,6 +501,7 @@ class AdminMenuView(View):
         await interaction.response.send_modal(GiveMoneyModal())
 
     @discord.ui.button(label="💸 سحب مال", style=discord.ButtonStyle.red, custom_id="take_money_admin")
+    @instrument
     async def take_money_admin_button(self, interaction: discord.Interaction, button: Button):
         if not is_admin(interaction.user):
             await interaction.response.send_message("❌ هذا الخيار متاح فقط للإدارة!", ephemeral=True)
@@ -291,6 +509,7 @@ class AdminMenuView(View):
         await interaction.response.send_modal(TakeMoneyModal())
 
     @discord.ui.button(label="🏛️ إنشاء وزارة", style=discord.ButtonStyle.primary, custom_id="create_ministry_admin")
+    @instrument
     async def create_ministry_admin_button(self, interaction: discord.Interaction, button: Button):
         if not is_admin(interaction.user):
             await interaction.response.send_message("❌ هذا الخيار متاح فقط للإدارة!", ephemeral=True)
@@ -298,34 +517,122 @@ class AdminMenuView(View):
         await interaction.response.send_modal(CreateMinistryModal())
 
     @discord.ui.button(label="📊 أغنى الناس", style=discord.ButtonStyle.blurple, custom_id="richest_users_admin")
+    @instrument
     async def richest_users_admin_button(self, interaction: discord.Interaction, button: Button):
         if not is_admin(interaction.user):
             await interaction.response.send_message("❌ هذا الخيار متاح فقط للإدارة!", ephemeral=True)
             return
-        conn = None
+        # الرد المؤجل أولًا، فقد يحتاج التحديث إلى جلب أسماء من ديسكورد بعد مهلة الثلاث ثوانٍ
+        await interaction.response.defer(ephemeral=True, thinking=True)
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT user_id, balance FROM users ORDER BY balance DESC LIMIT 10")
-            richest_users = cursor.fetchall()
+            await leaderboard.ensure_fresh(bot)
+            richest_users = leaderboard.entries()
 
             if not richest_users:
-                await interaction.response.send_message("❌ لا يوجد مستخدمون في البنك حاليًا.", ephemeral=True)
+                await interaction.followup.send("❌ لا يوجد مستخدمون في البنك حاليًا.", ephemeral=True)
                 return
 
-            embed = discord.Embed(title="👑 أغنى 10 مستخدمين", color=discord.Color.gold())
-            for i, user_data in enumerate(richest_users):
-                user_id = user_data[0]
-                balance = user_data[1]
-                user_obj = bot.get_user(user_id) or await bot.fetch_user(user_id)
-                username = user_obj.display_name if user_obj else f"المستخدم {user_id}"
-                embed.add_field(name=f"{i+1}. {username}", value=f"**{balance} {CURRENCY}**", inline=False)
-            await interaction.response.send_message(embed=embed, ephemeral=True)
+            embed = discord.Embed(title=f"👑 أغنى {len(richest_users)} مستخدمين", color=discord.Color.gold())
+            for rank, username, balance in richest_users:
+                embed.add_field(name=f"{rank}. {username}", value=f"**{balance} {CURRENCY}**", inline=False)
+            await interaction.followup.send(embed=embed, ephemeral=True)
         except Exception as e:
-            await interaction.response.send_message(f"❌ حدث خطأ: {e}", ephemeral=True)
-        finally:
-            if conn:
-                conn.close()
+            await interaction.followup.send(f"❌ حدث خطأ: {e}", ephemeral=True)
+
+    @discord.ui.button(label="🗄️ حالة قاعدة البيانات", style=discord.ButtonStyle.secondary, custom_id="db_status_admin")
+    @instrument
+    async def db_status_admin_button(self, interaction: discord.Interaction, button: Button):
+        if not is_admin(interaction.user):
+            await interaction.response.send_message("❌ هذا الخيار متاح فقط للإدارة!", ephemeral=True)
+            return
+        stats = db_stats()
+        if stats["backend"] == "sqlite":
+            embed = discord.Embed(title="🗄️ حالة قاعدة SQLite", color=discord.Color.dark_grey())
+            embed.add_field(name="الكتابة (خيط واحد)", value=f"**{stats['writes']}** معاملة، متوسط {stats['avg_write_ms']:.1f} ms، في الانتظار: {stats['pending_writes']}", inline=False)
+            embed.add_field(name="القراءة", value=f"**{stats['reads']}** معاملة على {stats['readers']} خيوط، متوسط {stats['avg_read_ms']:.1f} ms", inline=False)
+            embed.add_field(name="حجم الملف", value=f"**{stats['size_mb']:.1f} MB** ({stats['path']})", inline=False)
+        else:
+            embed = discord.Embed(title="🗄️ حالة مجمع الاتصالات", color=discord.Color.dark_grey())
+            embed.add_field(name="قيد الاستخدام", value=f"**{stats['in_use']} / {stats['max_size']}** (الذروة: {stats['peak_in_use']})", inline=False)
+            embed.add_field(name="مرات الاستعارة", value=f"**{stats['acquires']}** (انتظار: {stats['waits']}، انتهاء مهلة: {stats['timeouts']})", inline=False)
+            embed.add_field(name="متوسط الانتظار", value=f"**{stats['avg_wait_ms']:.1f} ms**", inline=False)
+            embed.add_field(name="اتصالات مستبعدة", value=f"**{stats['discarded']}**", inline=False)
+        cluster_stats = coordinator.stats()
+        embed.add_field(name="النسخة", value=f"**{cluster_stats['instance']}** ({'القائدة' if cluster_stats['leader'] else 'تابعة'})، إشعارات من النسخ الأخرى: {cluster_stats['notifications']}" + ("" if cluster_stats["connected"] else " ⚠️ اتصال التنسيق منقطع"), inline=False)
+        events = metrics.gateway_events.total()
+        uptime = time.perf_counter() - bot.process_started
+        embed.add_field(name="البوابة والذاكرة", value=f"**{events}** حدثًا ({events / uptime:.2f}/ث منذ الإقلاع)، الذاكرة المقيمة: {metrics.resident_memory() / 1024 / 1024:.0f} MB", inline=False)
+        if SHARDING is not None:
+            latencies = ", ".join(f"{shard_id}: {latency * 1000:.0f} ms" for shard_id, latency in bot.latencies)
+            embed.add_field(name="الشظايا", value=f"**{format_shard_ids(bot.shards)}** من {bot.shard_count} ({latencies})", inline=False)
+        cache_stats = account_cache.stats()
+        embed.add_field(name="ذاكرة الحسابات", value=f"**{cache_stats['hit_rate'] * 100:.1f}%** إصابة ({cache_stats['hits']} / {cache_stats['hits'] + cache_stats['misses']})، الحجم: {cache_stats['size']} / {cache_stats['max_size']}", inline=False)
+        writer_stats = ledger_writer.stats()
+        if writer_stats["batched_types"]:
+            embed.add_field(name="كاتب السجل على دفعات", value=f"في الطابور: **{writer_stats['queued']}**، مكتوب: {writer_stats['written']} في {writer_stats['batches']} دفعة، إخفاقات: {writer_stats['failures']}، كُتبت متأخرة: {writer_stats['restamped']}", inline=False)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @discord.ui.button(label="🔬 تحليل الاستعلامات", style=discord.ButtonStyle.secondary, custom_id="query_profiler_admin")
+    @instrument
+    async def query_profiler_admin_button(self, interaction: discord.Interaction, button: Button):
+        if not is_admin(interaction.user):
+            await interaction.response.send_message("❌ هذا الخيار متاح فقط للإدارة!", ephemeral=True)
+            return
+        view = QueryProfilerView()
+        await interaction.response.send_message(embed=view.build_embed(), view=view, ephemeral=True)
+
+# تشغيل محلل الاستعلامات وإيقافه وعرض أبطأ الاستعلامات
+class QueryProfilerView(View):
+    TOP = 10
+
+    def __init__(self):
+        super().__init__(timeout=600)
+        self.refresh_labels()
+
+    def refresh_labels(self):
+        self.toggle_button.label = "⏹️ إيقاف التحليل" if query_profiler.enabled else "▶️ تشغيل التحليل"
+        self.explain_button.label = f"📋 خطة التنفيذ: {'مفعلة' if query_profiler.explain else 'معطلة'}"
+
+    def build_embed(self):
+        state = "يعمل" if query_profiler.enabled else "متوقف"
+        embed = discord.Embed(title="🔬 محلل الاستعلامات",
+                              description=f"الحالة: **{state}**، حد الاستعلام البطيء: **{query_profiler.slow_ms:.0f} ms** (يُطبع في سجل البوت)",
+                              color=discord.Color.dark_grey())
+        for sql, calls, total, worst, slow in query_profiler.top(self.TOP):
+            embed.add_field(name=f"{total * 1000:.0f} ms إجمالًا — {calls} مرة، الأقصى {worst * 1000:.1f} ms، بطيئة {slow}",
+                            value=f"```sql\n{sql[:400]}\n```", inline=False)
+        if not embed.fields:
+            embed.add_field(name="لا توجد بيانات", value="شغّل التحليل ثم استخدم البوت قليلًا.", inline=False)
+        return embed
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        return is_admin(interaction.user)
+
+    @discord.ui.button(label="▶️ تشغيل التحليل", style=discord.ButtonStyle.primary)
+    @instrument
+    async def toggle_button(self, interaction: discord.Interaction, button: Button):
+        query_profiler.enabled = not query_profiler.enabled
+        self.refresh_labels()
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
+
+    @discord.ui.button(label="📋 خطة التنفيذ", style=discord.ButtonStyle.secondary)
+    @instrument
+    async def explain_button(self, interaction: discord.Interaction, button: Button):
+        query_profiler.explain = not query_profiler.explain
+        self.refresh_labels()
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
+
+    @discord.ui.button(label="🔄 تحديث", style=discord.ButtonStyle.secondary)
+    @instrument
+    async def refresh_button(self, interaction: discord.Interaction, button: Button):
+        self.refresh_labels()
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
+
+    @discord.ui.button(label="🗑️ تصفير", style=discord.ButtonStyle.red)
+    @instrument
+    async def reset_button(self, interaction: discord.Interaction, button: Button):
+        query_profiler.reset()
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
 
 # ============= Modals =============
 
@@ -335,6 +642,7 @@ class TransferModal(discord.ui.Modal, title="تحويل الأموال"):
         self.add_item(discord.ui.TextInput(label="معرف المستخدم (ID) المستلم", custom_id="recipient_id", placeholder="أدخل ID المستخدم المستلم"))
         self.add_item(discord.ui.TextInput(label="المبلغ", custom_id="amount", placeholder="أدخل المبلغ للتحويل"))
 
+    @instrument
     async def on_submit(self, interaction: discord.Interaction):
         recipient_id = int(self.children[0].value)
         amount = float(self.children[1].value)
@@ -344,41 +652,49 @@ class TransferModal(discord.ui.Modal, title="تحويل الأموال"):
             await interaction.response.send_message("❌ لا يمكن تحويل مبلغ صفر أو أقل.", ephemeral=True)
             return
 
-        conn = None
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-
-            cursor.execute("SELECT balance FROM users WHERE user_id = %s", (sender_id,))
-            sender_balance = cursor.fetchone()
-
-            if not sender_balance or sender_balance[0] < amount:
+            with account_cache.writing(sender_id, recipient_id) as write:
+                result, sender_balance, recipient_balance = await run_db(queries.transfer, sender_id, recipient_id, amount)
+                if result == queries.OK:
+                    write.set(sender_id, sender_balance)
+                    write.set(recipient_id, recipient_balance)
+            if result == queries.INSUFFICIENT_FUNDS:
                 await interaction.response.send_message("❌ رصيدك غير كافٍ لإجراء هذا التحويل.", ephemeral=True)
-                return
-            
-            cursor.execute("SELECT user_id FROM users WHERE user_id = %s", (recipient_id,))
-            recipient_exists = cursor.fetchone()
-            if not recipient_exists:
+            elif result == queries.NOT_FOUND:
                 await interaction.response.send_message("❌ المستخدم المستلم غير موجود في البنك.", ephemeral=True)
-                return
+            else:
+                await interaction.response.send_message(f"✅ تم تحويل **{amount} {CURRENCY}** إلى المستخدم <@{recipient_id}> بنجاح!", ephemeral=True)
+        except Exception as e:
+            await interaction.response.send_message(f"❌ حدث خطأ أثناء التحويل: {e}", ephemeral=True)
+
+class StatementModal(discord.ui.Modal, title="كشف الحساب"): 
+    def __init__(self):
+        super().__init__()
+        self.add_item(discord.ui.TextInput(label="من تاريخ (اختياري)", custom_id="start_date", placeholder="YYYY-MM-DD", required=False))
+        self.add_item(discord.ui.TextInput(label="إلى تاريخ (اختياري)", custom_id="end_date", placeholder="YYYY-MM-DD", required=False))
+
+    @instrument
+    async def on_submit(self, interaction: discord.Interaction):
+        try:
+            start = datetime.strptime(self.children[0].value, "%Y-%m-%d") if self.children[0].value else None
+            # تاريخ النهاية شامل لليوم كله
+            end = datetime.strptime(self.children[1].value, "%Y-%m-%d") + timedelta(days=1) if self.children[1].value else None
+        except ValueError:
+            await interaction.response.send_message("❌ صيغة التاريخ غير صحيحة. استخدم YYYY-MM-DD.", ephemeral=True)
+            return
 
-            # خصم من المرسل
-            cursor.execute("UPDATE users SET balance = balance - %s WHERE user_id = %s", (amount, sender_id))
-            cursor.execute("INSERT INTO transactions (user_id, type, amount, description) VALUES (%s, %s, %s, %s)",
-                           (sender_id, "transfer_send", -amount, f"تحويل إلى {recipient_id}"))
+        try:
+            view = StatementView(interaction.user.id, start, end)
+            await view.load_page()
+            await view.load_opening_balance()
 
-            # إضافة للمستلم
-            cursor.execute("UPDATE users SET balance = balance + %s WHERE user_id = %s", (amount, recipient_id))
-            cursor.execute("INSERT INTO transactions (user_id, type, amount, description) VALUES (%s, %s, %s, %s)",
-                           (recipient_id, "transfer_receive", amount, f"استلام من {sender_id}"))
+            if not view.rows:
+                await interaction.response.send_message("❌ لا توجد معاملات في هذه الفترة.", ephemeral=True)
+                return
 
-            conn.commit()
-            await interaction.response.send_message(f"✅ تم تحويل **{amount} {CURRENCY}** إلى المستخدم <@{recipient_id}> بنجاح!", ephemeral=True)
+            await interaction.response.send_message(embed=view.build_embed(), view=view, ephemeral=True)
         except Exception as e:
-            await interaction.response.send_message(f"❌ حدث خطأ أثناء التحويل: {e}", ephemeral=True)
-        finally:
-            if conn:
-                conn.close()
+            await interaction.response.send_message(f"❌ حدث خطأ: {e}", ephemeral=True)
 
 class InvestModal(discord.ui.Modal, title="بدء استثمار جديد"): 
     def __init__(self):
@@ -386,6 +702,7 @@ class InvestModal(discord.ui.Modal, title="بدء استثمار جديد"):
         self.add_item(discord.ui.TextInput(label="المبلغ", custom_id="amount", placeholder="أدخل المبلغ للاستثمار"))
         self.add_item(discord.ui.TextInput(label="عدد الأيام", custom_id="days", placeholder="أدخل عدد أيام الاستثمار (مثال: 7)"))
 
+    @instrument
     async def on_submit(self, interaction: discord.Interaction):
         amount = float(self.children[0].value)
         days = int(self.children[1].value)
@@ -394,38 +711,20 @@ class InvestModal(discord.ui.Modal, title="بدء استثمار جديد"):
         if amount <= 0 or days <= 0:
             await interaction.response.send_message("❌ المبلغ وعدد الأيام يجب أن يكونا أكبر من صفر.", ephemeral=True)
             return
-        
-        conn = None
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
 
-            cursor.execute("SELECT balance FROM users WHERE user_id = %s", (user_id,))
-            user_balance = cursor.fetchone()
-
-            if not user_balance or user_balance[0] < amount:
-                await interaction.response.send_message("❌ رصيدك غير كافٍ لإجراء هذا الاستثمار.", ephemeral=True)
-                return
-            
-            # خصم مبلغ الاستثمار من الرصيد
-            cursor.execute("UPDATE users SET balance = balance - %s WHERE user_id = %s", (amount, user_id))
-            
-            # حساب تاريخ الانتهاء والعائد (مثال: 5% عائد)
-            end_date = datetime.now() + timedelta(days=days)
+        try:
             return_rate = 0.05 # 5% عائد
-
-            cursor.execute("INSERT INTO investments (user_id, amount, end_date, return_rate, status) VALUES (%s, %s, %s, %s, %s)",
-                           (user_id, amount, end_date, return_rate, "active"))
-            cursor.execute("INSERT INTO transactions (user_id, type, amount, description) VALUES (%s, %s, %s, %s)",
-                           (user_id, "investment_start", -amount, f"بدء استثمار لمدة {days} يوم"))
-
-            conn.commit()
-            await interaction.response.send_message(f"✅ تم بدء استثمار بمبلغ **{amount} {CURRENCY}** لمدة **{days} يوم** بنجاح!", ephemeral=True)
+            with account_cache.writing(user_id) as write:
+                result, new_balance, maturity = await run_db(queries.start_investment, user_id, amount, days, return_rate, datetime.now())
+                if result == queries.OK:
+                    write.set(user_id, new_balance)
+                    maturity_scheduler.schedule(*maturity)
+            if result == queries.INSUFFICIENT_FUNDS:
+                await interaction.response.send_message("❌ رصيدك غير كافٍ لإجراء هذا الاستثمار.", ephemeral=True)
+            else:
+                await interaction.response.send_message(f"✅ تم بدء استثمار بمبلغ **{amount} {CURRENCY}** لمدة **{days} يوم** بنجاح!", ephemeral=True)
         except Exception as e:
             await interaction.response.send_message(f"❌ حدث خطأ أثناء الاستثمار: {e}", ephemeral=True)
-        finally:
-            if conn:
-                conn.close()
 
 class BuyCardModal(discord.ui.Modal, title="شراء بطاقة"): 
     def __init__(self, card_name):
@@ -433,6 +732,7 @@ class BuyCardModal(discord.ui.Modal, title="شراء بطاقة"):
         self.card_name = card_name
         self.add_item(discord.ui.TextInput(label=f"تأكيد شراء بطاقة {card_name.capitalize()}", custom_id="confirm", placeholder="اكتب \"تأكيد\" للشراء"))
 
+    @instrument
     async def on_submit(self, interaction: discord.Interaction):
         confirmation = self.children[0].value
         user_id = interaction.user.id
@@ -440,62 +740,42 @@ class BuyCardModal(discord.ui.Modal, title="شراء بطاقة"):
         if confirmation.lower() != "تأكيد":
             await interaction.response.send_message("❌ لم يتم تأكيد الشراء.", ephemeral=True)
             return
-        
-        conn = None
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
 
-            cursor.execute("SELECT price FROM cards WHERE card_name = %s", (self.card_name,))
-            card_price = cursor.fetchone()
-            if not card_price:
+        try:
+            card = await card_catalog.get(self.card_name)
+            if not card:
                 await interaction.response.send_message("❌ البطاقة غير موجودة.", ephemeral=True)
                 return
-            card_price = card_price[0]
-
-            cursor.execute("SELECT balance, card_type FROM users WHERE user_id = %s", (user_id,))
-            user_data = cursor.fetchone()
 
-            if not user_data:
+            with account_cache.writing(user_id) as write:
+                result, new_balance = await run_db(queries.buy_card, user_id, self.card_name, card[1])
+                if result == queries.OK:
+                    write.set(user_id, new_balance, self.card_name)
+            if result == queries.NO_ACCOUNT:
                 await interaction.response.send_message("❌ ليس لديك حساب بنكي. يرجى فتح حساب أولاً.", ephemeral=True)
-                return
-            
-            user_balance = user_data[0]
-            current_card_type = user_data[1]
-
-            if user_balance < card_price:
+            elif result == queries.INSUFFICIENT_FUNDS:
                 await interaction.response.send_message("❌ رصيدك غير كافٍ لشراء هذه البطاقة.", ephemeral=True)
-                return
-            
-            # خصم سعر البطاقة وتحديث نوع البطاقة
-            cursor.execute("UPDATE users SET balance = balance - %s, card_type = %s WHERE user_id = %s", (card_price, self.card_name, user_id))
-            cursor.execute("INSERT INTO transactions (user_id, type, amount, description) VALUES (%s, %s, %s, %s)",
-                           (user_id, "card_purchase", -card_price, f"شراء بطاقة {self.card_name}"))
-
-            conn.commit()
-            await interaction.response.send_message(f"✅ تم شراء بطاقة **{self.card_name.capitalize()}** بنجاح!", ephemeral=True)
+            else:
+                await interaction.response.send_message(f"✅ تم شراء بطاقة **{self.card_name.capitalize()}** بنجاح!", ephemeral=True)
         except Exception as e:
             await interaction.response.send_message(f"❌ حدث خطأ أثناء شراء البطاقة: {e}", ephemeral=True)
-        finally:
-            if conn:
-                conn.close()
 
 class BuyCardView(View):
     def __init__(self):
         super().__init__(timeout=None)
-        self.add_item(discord.ui.Button(label="شراء فضية", style=discord.ButtonStyle.blurple, custom_id="buy_silver_card"))
-        self.add_item(discord.ui.Button(label="شراء ذهبية", style=discord.ButtonStyle.gold, custom_id="buy_gold_card"))
-        self.add_item(discord.ui.Button(label="شراء بلاتينيوم", style=discord.ButtonStyle.grey, custom_id="buy_platinum_card"))
 
     @discord.ui.button(label="شراء فضية", style=discord.ButtonStyle.blurple, custom_id="buy_silver_card")
+    @instrument
     async def buy_silver_card_button(self, interaction: discord.Interaction, button: Button):
         await interaction.response.send_modal(BuyCardModal("silver"))
 
-    @discord.ui.button(label="شراء ذهبية", style=discord.ButtonStyle.gold, custom_id="buy_gold_card")
+    @discord.ui.button(label="شراء ذهبية", style=discord.ButtonStyle.green, custom_id="buy_gold_card")
+    @instrument
     async def buy_gold_card_button(self, interaction: discord.Interaction, button: Button):
         await interaction.response.send_modal(BuyCardModal("gold"))
 
     @discord.ui.button(label="شراء بلاتينيوم", style=discord.ButtonStyle.grey, custom_id="buy_platinum_card")
+    @instrument
     async def buy_platinum_card_button(self, interaction: discord.Interaction, button: Button):
         await interaction.response.send_modal(BuyCardModal("platinum"))
 
@@ -505,6 +785,7 @@ class DistributeBudgetModal(discord.ui.Modal, title="توزيع ميزانية 
         self.add_item(discord.ui.TextInput(label="اسم الوزارة", custom_id="ministry_name", placeholder="أدخل اسم الوزارة"))
         self.add_item(discord.ui.TextInput(label="المبلغ", custom_id="amount", placeholder="أدخل المبلغ لتوزيعه"))
 
+    @instrument
     async def on_submit(self, interaction: discord.Interaction):
         ministry_name = self.children[0].value
         amount = float(self.children[1].value)
@@ -513,30 +794,14 @@ class DistributeBudgetModal(discord.ui.Modal, title="توزيع ميزانية 
             await interaction.response.send_message("❌ لا يمكن توزيع مبلغ صفر أو أقل.", ephemeral=True)
             return
 
-        conn = None
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-
-            # التحقق من وجود الوزارة
-            cursor.execute("SELECT ministry_id FROM ministries WHERE name = %s", (ministry_name,))
-            ministry_exists = cursor.fetchone()
-            if not ministry_exists:
+            result = await run_db(queries.distribute_ministry_budget, ministry_name, amount, interaction.user.id)
+            if result == queries.NOT_FOUND:
                 await interaction.response.send_message("❌ الوزارة غير موجودة.", ephemeral=True)
-                return
-            
-            # إضافة المبلغ لميزانية الوزارة
-            cursor.execute("UPDATE ministries SET balance = balance + %s WHERE name = %s", (amount, ministry_name))
-            cursor.execute("INSERT INTO transactions (user_id, type, amount, description) VALUES (%s, %s, %s, %s)",
-                           (interaction.user.id, "ministry_budget_distribution", amount, f"توزيع ميزانية لوزارة {ministry_name}"))
-
-            conn.commit()
-            await interaction.response.send_message(f"✅ تم توزيع **{amount} {CURRENCY}** على وزارة **{ministry_name}** بنجاح!", ephemeral=True)
+            else:
+                await interaction.response.send_message(f"✅ تم توزيع **{amount} {CURRENCY}** على وزارة **{ministry_name}** بنجاح!", ephemeral=True)
         except Exception as e:
             await interaction.response.send_message(f"❌ حدث خطأ أثناء توزيع الميزانية: {e}", ephemeral=True)
-        finally:
-            if conn:
-                conn.close()
 
 class WithdrawFromMinistryModal(discord.ui.Modal, title="سحب أموال من وزارة"): 
     def __init__(self):
@@ -544,6 +809,7 @@ class WithdrawFromMinistryModal(discord.ui.Modal, title="سحب أموال من
         self.add_item(discord.ui.TextInput(label="اسم الوزارة", custom_id="ministry_name", placeholder="أدخل اسم الوزارة"))
         self.add_item(discord.ui.TextInput(label="المبلغ", custom_id="amount", placeholder="أدخل المبلغ للسحب"))
 
+    @instrument
     async def on_submit(self, interaction: discord.Interaction):
         ministry_name = self.children[0].value
         amount = float(self.children[1].value)
@@ -552,35 +818,16 @@ class WithdrawFromMinistryModal(discord.ui.Modal, title="سحب أموال من
             await interaction.response.send_message("❌ لا يمكن سحب مبلغ صفر أو أقل.", ephemeral=True)
             return
 
-        conn = None
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-
-            # التحقق من وجود الوزارة ورصيدها
-            cursor.execute("SELECT balance FROM ministries WHERE name = %s", (ministry_name,))
-            ministry_balance = cursor.fetchone()
-
-            if not ministry_balance:
+            result = await run_db(queries.withdraw_from_ministry, ministry_name, amount, interaction.user.id)
+            if result == queries.NOT_FOUND:
                 await interaction.response.send_message("❌ الوزارة غير موجودة.", ephemeral=True)
-                return
-            
-            if ministry_balance[0] < amount:
+            elif result == queries.INSUFFICIENT_FUNDS:
                 await interaction.response.send_message("❌ رصيد الوزارة غير كافٍ لإجراء هذا السحب.", ephemeral=True)
-                return
-            
-            # خصم المبلغ من ميزانية الوزارة
-            cursor.execute("UPDATE ministries SET balance = balance - %s WHERE name = %s", (amount, ministry_name))
-            cursor.execute("INSERT INTO transactions (user_id, type, amount, description) VALUES (%s, %s, %s, %s)",
-                           (interaction.user.id, "ministry_withdraw", -amount, f"سحب من وزارة {ministry_name}"))
-
-            conn.commit()
-            await interaction.response.send_message(f"✅ تم سحب **{amount} {CURRENCY}** من وزارة **{ministry_name}** بنجاح!", ephemeral=True)
+            else:
+                await interaction.response.send_message(f"✅ تم سحب **{amount} {CURRENCY}** من وزارة **{ministry_name}** بنجاح!", ephemeral=True)
         except Exception as e:
             await interaction.response.send_message(f"❌ حدث خطأ أثناء السحب من الوزارة: {e}", ephemeral=True)
-        finally:
-            if conn:
-                conn.close()
 
 class GiveMoneyModal(discord.ui.Modal, title="إعطاء أموال لمستخدم"): 
     def __init__(self):
@@ -588,6 +835,7 @@ class GiveMoneyModal(discord.ui.Modal, title="إعطاء أموال لمستخد
         self.add_item(discord.ui.TextInput(label="معرف المستخدم (ID)", custom_id="user_id", placeholder="أدخل ID المستخدم"))
         self.add_item(discord.ui.TextInput(label="المبلغ", custom_id="amount", placeholder="أدخل المبلغ لإعطائه"))
 
+    @instrument
     async def on_submit(self, interaction: discord.Interaction):
         target_user_id = int(self.children[0].value)
         amount = float(self.children[1].value)
@@ -596,30 +844,15 @@ class GiveMoneyModal(discord.ui.Modal, title="إعطاء أموال لمستخد
             await interaction.response.send_message("❌ لا يمكن إعطاء مبلغ صفر أو أقل.", ephemeral=True)
             return
 
-        conn = None
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-
-            # التحقق من وجود المستخدم
-            cursor.execute("SELECT user_id FROM users WHERE user_id = %s", (target_user_id,))
-            user_exists = cursor.fetchone()
-            if not user_exists:
+            with account_cache.writing(target_user_id):
+                result = await run_db(queries.admin_give, target_user_id, amount, interaction.user.id)
+            if result == queries.NOT_FOUND:
                 await interaction.response.send_message("❌ المستخدم غير موجود في البنك.", ephemeral=True)
-                return
-            
-            # إضافة المبلغ للمستخدم
-            cursor.execute("UPDATE users SET balance = balance + %s WHERE user_id = %s", (amount, target_user_id))
-            cursor.execute("INSERT INTO transactions (user_id, type, amount, description) VALUES (%s, %s, %s, %s)",
-                           (target_user_id, "admin_give", amount, f"إعطاء من الإدارة بواسطة {interaction.user.id}"))
-
-            conn.commit()
-            await interaction.response.send_message(f"✅ تم إعطاء **{amount} {CURRENCY}** للمستخدم <@{target_user_id}> بنجاح!", ephemeral=True)
+            else:
+                await interaction.response.send_message(f"✅ تم إعطاء **{amount} {CURRENCY}** للمستخدم <@{target_user_id}> بنجاح!", ephemeral=True)
         except Exception as e:
             await interaction.response.send_message(f"❌ حدث خطأ أثناء إعطاء الأموال: {e}", ephemeral=True)
-        finally:
-            if conn:
-                conn.close()
 
 class TakeMoneyModal(discord.ui.Modal, title="سحب أموال من مستخدم"): 
     def __init__(self):
@@ -627,6 +860,7 @@ class TakeMoneyModal(discord.ui.Modal, title="سحب أموال من مستخد
         self.add_item(discord.ui.TextInput(label="معرف المستخدم (ID)", custom_id="user_id", placeholder="أدخل ID المستخدم"))
         self.add_item(discord.ui.TextInput(label="المبلغ", custom_id="amount", placeholder="أدخل المبلغ للسحب"))
 
+    @instrument
     async def on_submit(self, interaction: discord.Interaction):
         target_user_id = int(self.children[0].value)
         amount = float(self.children[1].value)
@@ -635,84 +869,60 @@ class TakeMoneyModal(discord.ui.Modal, title="سحب أموال من مستخد
             await interaction.response.send_message("❌ لا يمكن سحب مبلغ صفر أو أقل.", ephemeral=True)
             return
 
-        conn = None
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-
-            # التحقق من وجود المستخدم ورصيده
-            cursor.execute("SELECT balance FROM users WHERE user_id = %s", (target_user_id,))
-            user_balance = cursor.fetchone()
-
-            if not user_balance:
+            with account_cache.writing(target_user_id):
+                result = await run_db(queries.admin_take, target_user_id, amount, interaction.user.id)
+            if result == queries.NOT_FOUND:
                 await interaction.response.send_message("❌ المستخدم غير موجود في البنك.", ephemeral=True)
-                return
-            
-            if user_balance[0] < amount:
+            elif result == queries.INSUFFICIENT_FUNDS:
                 await interaction.response.send_message("❌ رصيد المستخدم غير كافٍ لإجراء هذا السحب.", ephemeral=True)
-                return
-            
-            # خصم المبلغ من المستخدم
-            cursor.execute("UPDATE users SET balance = balance - %s WHERE user_id = %s", (amount, target_user_id))
-            cursor.execute("INSERT INTO transactions (user_id, type, amount, description) VALUES (%s, %s, %s, %s)",
-                           (target_user_id, "admin_take", -amount, f"سحب من الإدارة بواسطة {interaction.user.id}"))
-
-            conn.commit()
-            await interaction.response.send_message(f"✅ تم سحب **{amount} {CURRENCY}** من المستخدم <@{target_user_id}> بنجاح!", ephemeral=True)
+            else:
+                await interaction.response.send_message(f"✅ تم سحب **{amount} {CURRENCY}** من المستخدم <@{target_user_id}> بنجاح!", ephemeral=True)
         except Exception as e:
             await interaction.response.send_message(f"❌ حدث خطأ أثناء سحب الأموال: {e}", ephemeral=True)
-        finally:
-            if conn:
-                conn.close()
 
 class CreateMinistryModal(discord.ui.Modal, title="إنشاء وزارة جديدة"): 
     def __init__(self):
         super().__init__()
         self.add_item(discord.ui.TextInput(label="اسم الوزارة", custom_id="ministry_name", placeholder="أدخل اسم الوزارة الجديدة"))
 
+    @instrument
     async def on_submit(self, interaction: discord.Interaction):
         ministry_name = self.children[0].value
 
-        conn = None
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-
-            cursor.execute("INSERT INTO ministries (name, balance) VALUES (%s, %s) ON CONFLICT (name) DO NOTHING RETURNING ministry_id", (ministry_name, 0.00))
-            ministry_id = cursor.fetchone()
-
-            if ministry_id:
-                conn.commit()
+            created = await run_db(queries.create_ministry, ministry_name)
+            if created:
                 await interaction.response.send_message(f"✅ تم إنشاء وزارة **{ministry_name}** بنجاح!", ephemeral=True)
             else:
                 await interaction.response.send_message(f"❌ الوزارة **{ministry_name}** موجودة بالفعل.", ephemeral=True)
         except Exception as e:
             await interaction.response.send_message(f"❌ حدث خطأ أثناء إنشاء الوزارة: {e}", ephemeral=True)
-        finally:
-            if conn:
-                conn.close()
 
 # ============= أوامر البوت =============
 
-@bot.command(name="bank")
-async def bank_command(ctx):
-    await ctx.send("مرحبًا بك في بنك AL7DOD CITY!", view=MemberMenuView())
+@bot.tree.command(name="bank", description="قائمة البنك")
+@app_commands.guild_only()
+async def bank_command(interaction: discord.Interaction):
+    await interaction.response.send_message("مرحبًا بك في بنك AL7DOD CITY!", view=MemberMenuView())
 
-@bot.command(name="finmin")
-async def finance_minister_command(ctx):
-    if not has_role(ctx.author, "وزير المالية") and not is_admin(ctx.author):
-        await ctx.send("❌ ليس لديك الصلاحيات الكافية للوصول إلى قائمة وزير المالية.", ephemeral=True)
+@bot.tree.command(name="finmin", description="قائمة وزير المالية")
+@app_commands.guild_only()
+async def finance_minister_command(interaction: discord.Interaction):
+    if not has_role(interaction.user, "وزير المالية") and not is_admin(interaction.user):
+        await interaction.response.send_message("❌ ليس لديك الصلاحيات الكافية للوصول إلى قائمة وزير المالية.", ephemeral=True)
         return
-    await ctx.send("قائمة وزير المالية:", view=FinanceMinisterMenuView())
-
-@bot.command(name="adminpanel")
-async def admin_panel_command(ctx):
-    if not is_admin(ctx.author):
-        await ctx.send("❌ ليس لديك الصلاحيات الكافية للوصول إلى لوحة تحكم الإدارة.", ephemeral=True)
+    await interaction.response.send_message("قائمة وزير المالية:", view=FinanceMinisterMenuView())
+
+@bot.tree.command(name="adminpanel", description="لوحة تحكم الإدارة")
+@app_commands.guild_only()
+@app_commands.default_permissions(administrator=True)
+async def admin_panel_command(interaction: discord.Interaction):
+    if not is_admin(interaction.user):
+        await interaction.response.send_message("❌ ليس لديك الصلاحيات الكافية للوصول إلى لوحة تحكم الإدارة.", ephemeral=True)
         return
-    await ctx.send("لوحة تحكم الإدارة:", view=AdminMenuView())
+    await interaction.response.send_message("لوحة تحكم الإدارة:", view=AdminMenuView())
 
 # تشغيل البوت
 if __name__ == '__main__':
     bot.run(BOT_TOKEN)
-
@@ -0,0 +1,98 @@
+# جدولة تسوية الاستثمارات: كومة صغرى (end_date, investment_id) في الذاكرة تستيقظ عند أقرب استحقاق
+# تُملأ من قاعدة البيانات بالاستثمارات المستحقة خلال الأفق القادم فقط، ويضاف إليها كل استثمار جديد.
+# الاستقصاء الدوري في main.process_investments يبقى احتياطًا ويعيد ملء الكومة.
+# مع عدة عمليات تحمل كل كومة نصيب عمليتها فقط حتى لا تستيقظ كل العمليات عند كل استحقاق؛ الاستقصاء
+# الاحتياطي في أي عملية يسوي كل المستحق، فلا يضيع نصيب عملية متوقفة.
+import asyncio
+import heapq
+from datetime import datetime, timedelta
+
+from config import MATURITY_HORIZON_HOURS, WORKER_INDEX, WORKER_COUNT
+from database import run_db
+import queries
+
+# أقصى مدة نوم متواصل، حتى لا يتأثر الاستيقاظ بانحراف ساعة النظام
+MAX_SLEEP = 300
+
+class MaturityScheduler:
+    """كومة مواعيد الاستحقاق مع مهمة واحدة تنام حتى أقربها ثم تستدعي دالة التسوية"""
+
+    def __init__(self, horizon, worker_index=0, worker_count=1):
+        self.horizon = horizon
+        self.worker_index = worker_index
+        self.worker_count = worker_count
+        self._heap = []
+        self._queued = set()
+        self._changed = None
+        self._task = None
+        self._settle = None
+
+    def __len__(self):
+        return len(self._heap)
+
+    def schedule(self, end_date, investment_id):
+        """إضافة استثمار جديد إذا كان يستحق خلال الأفق ومن نصيب هذه العملية (وإلا سيضاف عند إعادة الملء)"""
+        if end_date - datetime.now() > self.horizon or investment_id % self.worker_count != self.worker_index:
+            return
+        self._push(end_date, investment_id)
+        if self._changed:
+            self._changed.set()
+
+    def _push(self, end_date, investment_id):
+        if investment_id not in self._queued:
+            self._queued.add(investment_id)
+            heapq.heappush(self._heap, (end_date, investment_id))
+
+    async def refill(self):
+        """إضافة الاستثمارات النشطة التي تستحق خلال الأفق من قاعدة البيانات"""
+        rows = await run_db(queries.upcoming_maturities, datetime.now() + self.horizon,
+                            self.worker_index, self.worker_count)
+        for end_date, investment_id in rows:
+            self._push(end_date, investment_id)
+        if self._changed:
+            self._changed.set()
+        return len(rows)
+
+    def start(self, settle):
+        """settle: دالة غير متزامنة settle(now) تسوي كل الاستثمارات المنتهية حتى now"""
+        if self._task is None:
+            self._settle = settle
+            self._changed = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            self._changed.clear()
+            timeout = None
+            if self._heap:
+                timeout = min(max((self._heap[0][0] - datetime.now()).total_seconds(), 0), MAX_SLEEP)
+            if timeout != 0:
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout)
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+
+            now = datetime.now()
+            if not self._heap or self._heap[0][0] > now:
+                continue
+            due = []
+            while self._heap and self._heap[0][0] <= now:
+                entry = heapq.heappop(self._heap)
+                self._queued.discard(entry[1])
+                due.append(entry)
+            try:
+                await self._settle(now)
+            except Exception as e:
+                print(f"Error settling matured investments: {e}")
+                # إعادتها إلى الكومة حتى تُعاد المحاولة بعد قليل، لا عند الاستقصاء الاحتياطي التالي
+                for end_date, investment_id in due:
+                    self._push(end_date, investment_id)
+                await asyncio.sleep(5)
+
+maturity_scheduler = MaturityScheduler(timedelta(hours=MATURITY_HORIZON_HOURS), WORKER_INDEX, WORKER_COUNT)
@@ -0,0 +1,226 @@
+# قياس زمن الأزرار والنوافذ والمهام الدورية، وعرضه بصيغة Prometheus على منفذ محلي
+# كل دالة مُغلفة بـ instrument تُسجَّل كعملية: مدتها، وعدد استعلاماتها وزمنها في قاعدة البيانات،
+# وزمن أول رد على التفاعل مقاسًا من لحظة إنشائه في ديسكورد (المهلة 3 ثوانٍ).
+import contextvars
+import functools
+import os
+import resource
+import threading
+import time
+
+import discord
+from aiohttp import web
+
+# مهلة ديسكورد لأول رد على التفاعل (بالثواني)
+DEADLINE = 3.0
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 10, 30, 60)
+ROUND_TRIP_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+class _Metric:
+    def __init__(self, name, help_text, kind):
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+def _labels(labels, **extra):
+    items = {**dict(labels), **extra}
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in items.items()) + "}"
+
+class Counter(_Metric):
+    def __init__(self, name, help_text):
+        super().__init__(name, help_text, "counter")
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def total(self):
+        with self._lock:
+            return sum(self._series.values())
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            for key, value in sorted(self._series.items()):
+                lines.append(f"{self.name}{_labels(key)} {value}")
+        return lines
+
+class Histogram(_Metric):
+    def __init__(self, name, help_text, buckets):
+        super().__init__(name, help_text, "histogram")
+        self.buckets = buckets
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def summary(self, **labels):
+        """(عدد الملاحظات، مجموعها) لسلسلة واحدة"""
+        with self._lock:
+            series = self._series.get(tuple(sorted(labels.items())))
+            return (series[-1], series[-2]) if series else (0, 0.0)
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_labels(key, le=bound)} {count}")
+                lines.append(f"{self.name}_bucket{_labels(key, le='+Inf')} {series[-1]}")
+                lines.append(f"{self.name}_sum{_labels(key)} {series[-2]}")
+                lines.append(f"{self.name}_count{_labels(key)} {series[-1]}")
+        return lines
+
+class Gauge(_Metric):
+    """قيمة تُقرأ عند كل طلب لـ /metrics من الدالة read"""
+
+    def __init__(self, name, help_text, read):
+        super().__init__(name, help_text, "gauge")
+        self.read = read
+
+    def render(self):
+        return self._header() + [f"{self.name} {self.read()}"]
+
+def resident_memory():
+    """الذاكرة المقيمة للعملية بالبايت (من /proc على لينكس، وإلا ذروتها من getrusage)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+operation_latency = Histogram("bank_operation_latency_seconds", "Duration of a button, modal or background loop run", LATENCY_BUCKETS)
+first_response = Histogram("bank_interaction_first_response_seconds", "Time from interaction creation to the first response", LATENCY_BUCKETS)
+deadline_missed = Counter("bank_interaction_deadline_missed_total", "Interactions answered after the 3 second deadline or not at all")
+operation_errors = Counter("bank_operation_errors_total", "Exceptions that escaped an operation")
+db_round_trips = Histogram("bank_operation_db_round_trips", "Database statements executed per operation", ROUND_TRIP_BUCKETS)
+db_time = Histogram("bank_operation_db_seconds", "Time spent in database statements per operation", LATENCY_BUCKETS)
+db_statements = Counter("bank_db_statements_total", "Database statements executed")
+gateway_events = Counter("bank_gateway_events_total", "Gateway dispatch events received, by event type")
+process_memory = Gauge("process_resident_memory_bytes", "Resident memory of the bot process", resident_memory)
+
+REGISTRY = [operation_latency, first_response, deadline_missed, operation_errors, db_round_trips, db_time, db_statements,
+            gateway_events, process_memory]
+
+# ============= تتبع العملية الجارية =============
+class Operation:
+    __slots__ = ("name", "kind", "interaction", "db_calls", "db_time", "first_response_at")
+
+    def __init__(self, name, kind, interaction):
+        self.name = name
+        self.kind = kind
+        self.interaction = interaction
+        self.db_calls = 0
+        self.db_time = 0.0
+        self.first_response_at = None
+
+# تنتقل إلى خيوط قاعدة البيانات مع سياق run_db، فتُنسب الاستعلامات إلى العملية التي طلبتها
+_current = contextvars.ContextVar("metrics_operation", default=None)
+
+def record_db(elapsed):
+    """تسجيل استعلام واحد (يستدعيه مؤشر قاعدة البيانات من أي خيط)"""
+    db_statements.inc()
+    operation = _current.get()
+    if operation is not None:
+        operation.db_calls += 1
+        operation.db_time += elapsed
+
+def _find_interaction(args):
+    for arg in args:
+        if isinstance(arg, discord.Interaction):
+            return arg
+    return None
+
+def instrument(fn):
+    """تغليف زر أو نافذة أو مهمة دورية غير متزامنة لتسجيلها كعملية باسم Class.method"""
+    name = fn.__qualname__
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        interaction = _find_interaction(args)
+        operation = Operation(name, "interaction" if interaction else "task", interaction)
+        token = _current.set(operation)
+        started = time.perf_counter()
+        try:
+            return await fn(*args, **kwargs)
+        except Exception:
+            operation_errors.inc(operation=name)
+            raise
+        finally:
+            _current.reset(token)
+            _finish(operation, time.perf_counter() - started)
+    return wrapper
+
+def _finish(operation, elapsed):
+    labels = {"operation": operation.name, "kind": operation.kind}
+    operation_latency.observe(elapsed, **labels)
+    db_round_trips.observe(operation.db_calls, **labels)
+    db_time.observe(operation.db_time, **labels)
+    if operation.interaction is None:
+        return
+    if operation.first_response_at is None:
+        # أُجيب مسبقًا (مثل زر يفتح نافذة من عملية أخرى) أو لم يُجب إطلاقًا
+        if not operation.interaction.response.is_done():
+            deadline_missed.inc(operation=operation.name)
+        return
+    waited = operation.first_response_at - operation.interaction.created_at.timestamp()
+    first_response.observe(waited, operation=operation.name)
+    if waited > DEADLINE:
+        deadline_missed.inc(operation=operation.name)
+
+def _track_response(method):
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        result = await method(self, *args, **kwargs)
+        operation = _current.get()
+        if operation is not None and operation.first_response_at is None:
+            operation.first_response_at = time.time()
+        return result
+    return wrapper
+
+_responses_tracked = False
+
+def track_interaction_responses():
+    """تسجيل لحظة أول رد لكل تفاعل عبر تغليف دوال الرد في discord.InteractionResponse"""
+    global _responses_tracked
+    if _responses_tracked:
+        return
+    for method_name in ("send_message", "defer", "edit_message", "send_modal"):
+        setattr(discord.InteractionResponse, method_name, _track_response(getattr(discord.InteractionResponse, method_name)))
+    _responses_tracked = True
+
+# ============= نقطة /metrics =============
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+async def _handle_metrics(request):
+    return web.Response(text=render(), content_type="text/plain")
+
+async def start_server(host, port):
+    """تشغيل خادم /metrics على حلقة البوت، ويعيد المشغل لإيقافه لاحقًا"""
+    app = web.Application()
+    app.router.add_get("/metrics", _handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,285 @@
+# ترحيلات مخطط قاعدة البيانات
+# كل ترحيل (الإصدار، الوصف، الخطوات) يُطبَّق مرة واحدة بالترتيب ويُسجَّل في جدول schema_version.
+# لا يُعدَّل ترحيل سبق تطبيقه؛ أي تغيير جديد على المخطط يضاف كترحيل بإصدار أعلى.
+from datetime import datetime
+
+from config import LEDGER_PARTITIONS_AHEAD, SALARY_INTERVAL_HOURS
+import ledger
+
+def _initial_schema(cursor):
+    """الجداول الأساسية والبطاقات الافتراضية (تطابق ما كان ينشئه init_db سابقًا)"""
+    # جدول المستخدمين (الحسابات البنكية)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            user_id BIGINT PRIMARY KEY,
+            balance NUMERIC(15, 2) DEFAULT 1500.00,
+            card_type VARCHAR(50) DEFAULT 'basic'
+        )
+    """)
+
+    # جدول البطاقات (لتحديد أسعار وميزات البطاقات)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS cards (
+            card_name VARCHAR(50) PRIMARY KEY,
+            price NUMERIC(15, 2) NOT NULL,
+            benefits TEXT
+        )
+    """)
+
+    # إضافة أنواع البطاقات الافتراضية إذا لم تكن موجودة
+    cursor.executemany("INSERT INTO cards (card_name, price, benefits) VALUES (%s, %s, %s) ON CONFLICT (card_name) DO NOTHING", [
+        ('silver', 5000.00, 'خصم 5% على رسوم التحويل، زيادة 1% في عائد الاستثمار'),
+        ('gold', 15000.00, 'خصم 10% على رسوم التحويل، زيادة 2% في عائد الاستثمار، سحب يومي أعلى'),
+        ('platinum', 50000.00, 'خصم 15% على رسوم التحويل، زيادة 3% في عائد الاستثمار، سحب يومي أعلى بكثير، دعم VIP'),
+    ])
+
+    # جدول الوزارات (ميزانيات الوزارات)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ministries (
+            ministry_id SERIAL PRIMARY KEY,
+            name VARCHAR(255) UNIQUE NOT NULL,
+            balance NUMERIC(15, 2) DEFAULT 0.00
+        )
+    """)
+
+    # جدول المعاملات (للسحب، الإيداع، التحويلات)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS transactions (
+            transaction_id SERIAL PRIMARY KEY,
+            user_id BIGINT,
+            type VARCHAR(50) NOT NULL,
+            amount NUMERIC(15, 2) NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            description TEXT,
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        )
+    """)
+
+    # جدول الاستثمارات
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS investments (
+            investment_id SERIAL PRIMARY KEY,
+            user_id BIGINT,
+            amount NUMERIC(15, 2) NOT NULL,
+            start_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            end_date TIMESTAMP,
+            return_rate NUMERIC(5, 2),
+            status VARCHAR(50) DEFAULT 'active',
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        )
+    """)
+
+    # جدول الرواتب (لتتبع آخر راتب تم دفعه)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS salaries (
+            user_id BIGINT PRIMARY KEY,
+            last_paid TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        )
+    """)
+
+def _partition_transactions(cursor):
+    """تحويل جدول المعاملات إلى جدول مقسم شهريًا حسب timestamp مع الاحتفاظ بالمعرفات والتسلسل"""
+    cursor.execute("ALTER TABLE transactions RENAME TO transactions_unpartitioned")
+    cursor.execute("ALTER INDEX transactions_pkey RENAME TO transactions_unpartitioned_pkey")
+    cursor.execute("ALTER SEQUENCE transactions_transaction_id_seq OWNED BY NONE")
+
+    # مفتاح التقسيم يجب أن يكون ضمن المفتاح الأساسي
+    cursor.execute("""
+        CREATE TABLE transactions (
+            transaction_id BIGINT NOT NULL DEFAULT nextval('transactions_transaction_id_seq'),
+            user_id BIGINT,
+            type VARCHAR(50) NOT NULL,
+            amount NUMERIC(15, 2) NOT NULL,
+            timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            description TEXT,
+            PRIMARY KEY (transaction_id, timestamp),
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        ) PARTITION BY RANGE (timestamp)
+    """)
+    cursor.execute("ALTER SEQUENCE transactions_transaction_id_seq AS BIGINT OWNED BY transactions.transaction_id")
+    # يلتقط أي صف خارج الأقسام الشهرية (مثل تاريخ مستقبلي بعيد) بدل رفض الإدخال
+    cursor.execute(f"CREATE TABLE {ledger.DEFAULT_PARTITION} PARTITION OF transactions DEFAULT")
+
+    cursor.execute("SELECT MIN(timestamp) FROM transactions_unpartitioned")
+    first = cursor.fetchone()[0] or datetime.now()
+    month = ledger.month_start(first)
+    while month < ledger.month_start(datetime.now()):
+        ledger.create_partition(cursor, month)
+        month = ledger.add_months(month, 1)
+    ledger.ensure_partitions(cursor, datetime.now(), LEDGER_PARTITIONS_AHEAD)
+
+    cursor.execute("""
+        INSERT INTO transactions (transaction_id, user_id, type, amount, timestamp, description)
+        SELECT transaction_id, user_id, type, amount, COALESCE(timestamp, CURRENT_TIMESTAMP), description
+        FROM transactions_unpartitioned
+    """)
+    cursor.execute("DROP TABLE transactions_unpartitioned")
+    # يُنشأ بعد النسخ لأنه أسرع من تحديثه صفًا صفًا، ويُنشأ تلقائيًا على كل قسم جديد
+    cursor.execute("CREATE INDEX idx_transactions_user_ts_id ON transactions (user_id, timestamp, transaction_id)")
+
+def _spread_salary_schedules(cursor):
+    """الدفع الجماعي السابق جعل مواعيد الجميع متطابقة؛ توزيعها مرة واحدة على فترة الراتب المضبوطة
+    حتى يُدفع كل مستخدم في موعده الخاص بدفعات صغيرة متفرقة
+
+    التوزيع إلى الأمام فقط: لا يصبح أحد مستحقًا قبل موعده الأصلي، فلا يُدفع لأحد راتب مبكر
+    """
+    interval_seconds = max(int(SALARY_INTERVAL_HOURS * 3600), 1)
+    cursor.execute("UPDATE salaries SET last_paid = last_paid + (user_id %% %s) * INTERVAL '1 second'", (interval_seconds,))
+
+MIGRATIONS = [
+    (1, "initial schema", [_initial_schema]),
+    (2, "hot path indexes", [
+        # تسوية الاستثمارات تبحث فقط في النشطة مرتبة حسب تاريخ الانتهاء
+        "CREATE INDEX IF NOT EXISTS idx_investments_active_end_date ON investments (end_date, investment_id) WHERE status = 'active'",
+        # زر استثماراتي
+        "CREATE INDEX IF NOT EXISTS idx_investments_user ON investments (user_id, status DESC, end_date)",
+        # سجل معاملات المستخدم، وفحص المفتاح الأجنبي عند الحذف من users
+        "CREATE INDEX IF NOT EXISTS idx_transactions_user_timestamp ON transactions (user_id, timestamp)",
+        # لوحة أغنى الناس
+        "CREATE INDEX IF NOT EXISTS idx_users_balance ON users (balance DESC)",
+        # تحديد الرواتب المستحقة
+        "CREATE INDEX IF NOT EXISTS idx_salaries_last_paid ON salaries (last_paid)",
+    ]),
+    (3, "atomic transfer function", [
+        # التحويل كاملًا في رحلة واحدة إلى الخادم: قفل الحسابين بترتيب ثابت حسب المعرف
+        # (لتجنب الجمود بين تحويلين متعاكسين)، ثم التحقق والخصم والإضافة والتسجيل في السجل
+        """
+        CREATE OR REPLACE FUNCTION bank_transfer(p_sender BIGINT, p_recipient BIGINT, p_amount NUMERIC)
+        RETURNS TEXT AS $$
+        DECLARE
+            v_sender_balance NUMERIC;
+        BEGIN
+            PERFORM 1 FROM users WHERE user_id IN (p_sender, p_recipient) ORDER BY user_id FOR UPDATE;
+
+            SELECT balance INTO v_sender_balance FROM users WHERE user_id = p_sender;
+            IF v_sender_balance IS NULL OR v_sender_balance < p_amount THEN
+                RETURN 'insufficient_funds';
+            END IF;
+            IF NOT EXISTS (SELECT 1 FROM users WHERE user_id = p_recipient) THEN
+                RETURN 'not_found';
+            END IF;
+
+            UPDATE users SET balance = balance - p_amount WHERE user_id = p_sender;
+            UPDATE users SET balance = balance + p_amount WHERE user_id = p_recipient;
+            INSERT INTO transactions (user_id, type, amount, description) VALUES
+                (p_sender, 'transfer_send', -p_amount, 'تحويل إلى ' || p_recipient),
+                (p_recipient, 'transfer_receive', p_amount, 'استلام من ' || p_sender);
+            RETURN 'ok';
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+    ]),
+    (4, "transfer returns new balances", [
+        # نفس منطق الإصدار 3، مع إعادة الرصيدين الجديدين لتحديث ذاكرة الحسابات دون استعلام إضافي
+        "DROP FUNCTION IF EXISTS bank_transfer(BIGINT, BIGINT, NUMERIC)",
+        """
+        CREATE FUNCTION bank_transfer(p_sender BIGINT, p_recipient BIGINT, p_amount NUMERIC,
+                                      OUT status TEXT, OUT sender_balance NUMERIC, OUT recipient_balance NUMERIC) AS $$
+        DECLARE
+            v_sender_balance NUMERIC;
+        BEGIN
+            PERFORM 1 FROM users WHERE user_id IN (p_sender, p_recipient) ORDER BY user_id FOR UPDATE;
+
+            SELECT balance INTO v_sender_balance FROM users WHERE user_id = p_sender;
+            IF v_sender_balance IS NULL OR v_sender_balance < p_amount THEN
+                status := 'insufficient_funds';
+                RETURN;
+            END IF;
+            IF NOT EXISTS (SELECT 1 FROM users WHERE user_id = p_recipient) THEN
+                status := 'not_found';
+                RETURN;
+            END IF;
+
+            UPDATE users SET balance = balance - p_amount WHERE user_id = p_sender RETURNING balance INTO sender_balance;
+            UPDATE users SET balance = balance + p_amount WHERE user_id = p_recipient RETURNING balance INTO recipient_balance;
+            INSERT INTO transactions (user_id, type, amount, description) VALUES
+                (p_sender, 'transfer_send', -p_amount, 'تحويل إلى ' || p_recipient),
+                (p_recipient, 'transfer_receive', p_amount, 'استلام من ' || p_sender);
+            status := 'ok';
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+    ]),
+    (5, "keyset index for investment history", [
+        # ترقيم صفحات استثماراتي بالمفتاح (status DESC, end_date, investment_id) يحل محل الفهرس السابق
+        "CREATE INDEX IF NOT EXISTS idx_investments_user_page ON investments (user_id, status DESC, end_date, investment_id)",
+        "DROP INDEX IF EXISTS idx_investments_user",
+    ]),
+    (6, "keyset index for statements", [
+        # كشف الحساب يُرتب ويُقسم حسب (timestamp, transaction_id) ضمن نطاق تاريخ
+        "CREATE INDEX IF NOT EXISTS idx_transactions_user_ts_id ON transactions (user_id, timestamp, transaction_id)",
+        "DROP INDEX IF EXISTS idx_transactions_user_timestamp",
+    ]),
+    (7, "monthly partitioned transactions ledger", [_partition_transactions]),
+    (8, "daily balance snapshots", [
+        # حركات الوزارات كانت تُسجَّل باسم المنفذ فقط؛ ministry_id يفصلها عن رصيد المستخدم نفسه
+        "ALTER TABLE transactions ADD COLUMN ministry_id INTEGER REFERENCES ministries(ministry_id)",
+        """
+        UPDATE transactions t SET ministry_id = m.ministry_id
+        FROM ministries m
+        WHERE (t.type = 'ministry_budget_distribution' AND t.description = 'توزيع ميزانية لوزارة ' || m.name)
+           OR (t.type = 'ministry_withdraw' AND t.description = 'سحب من وزارة ' || m.name)
+        """,
+        "CREATE INDEX idx_transactions_ministry_ts ON transactions (ministry_id, timestamp) WHERE ministry_id IS NOT NULL",
+        # رصيد إغلاق كل حساب في الأيام التي تحرك فيها فقط؛ الأيام الأخرى ترث آخر لقطة قبلها
+        """
+        CREATE TABLE balance_snapshots (
+            account_kind VARCHAR(10) NOT NULL,
+            account_id BIGINT NOT NULL,
+            day DATE NOT NULL,
+            balance NUMERIC(15, 2) NOT NULL,
+            PRIMARY KEY (account_kind, account_id, day)
+        )
+        """,
+        # آخر يوم اكتملت لقطاته (NULL قبل أول تشغيل)
+        """
+        CREATE TABLE snapshot_progress (
+            singleton BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (singleton),
+            snapshot_through DATE
+        )
+        """,
+        "INSERT INTO snapshot_progress (snapshot_through) VALUES (NULL)",
+    ]),
+    (9, "spread salary due times", [_spread_salary_schedules]),
+    (10, "change notifications for other instances", [
+        # إشعار بقية نسخ البوت عند تغير حسابات المستخدمين أو البطاقات لتحديث ذاكرتها المؤقتة (انظر cluster.py).
+        # الحمولة: application_name للنسخة المرسلة ثم المعرفات، بإشعار لكل 300 مستخدم (حد الحمولة 8000 بايت)
+        # وعلى مستوى العبارة، فدفعة رواتب من 1000 مستخدم ترسل 4 إشعارات لا 1000
+        """
+        CREATE FUNCTION notify_account_changes() RETURNS trigger AS $$
+        DECLARE
+            v_ids TEXT;
+        BEGIN
+            FOR v_ids IN
+                SELECT string_agg(user_id::text, ',') FROM (
+                    SELECT user_id, (row_number() OVER () - 1) / 300 AS chunk FROM changed_rows
+                ) c GROUP BY chunk
+            LOOP
+                PERFORM pg_notify('bank_accounts', current_setting('application_name') || ' ' || v_ids);
+            END LOOP;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        """
+        CREATE TRIGGER users_notify_update AFTER UPDATE ON users
+        REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION notify_account_changes()
+        """,
+        """
+        CREATE TRIGGER users_notify_delete AFTER DELETE ON users
+        REFERENCING OLD TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION notify_account_changes()
+        """,
+        """
+        CREATE FUNCTION notify_card_changes() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('bank_cards', current_setting('application_name'));
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        "CREATE TRIGGER cards_notify AFTER INSERT OR UPDATE OR DELETE ON cards FOR EACH STATEMENT EXECUTE FUNCTION notify_card_changes()",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
@@ -0,0 +1,288 @@
+# دوال الوصول للبيانات
+# كل دالة تستقبل مؤشرًا (cursor) داخل معاملة مفتوحة وتُنفَّذ عبر database.run_db
+# خارج حلقة أحداث البوت، وتعيد نتيجة بسيطة يبني عليها الزر أو النافذة رده.
+from datetime import datetime, timedelta
+
+from database import on_commit
+from ledger_writer import ledger_writer
+
+# نتائج العمليات
+OK = "ok"
+NO_ACCOUNT = "no_account"
+NOT_FOUND = "not_found"
+INSUFFICIENT_FUNDS = "insufficient_funds"
+
+# ============= سجل المعاملات =============
+def record_transaction(cursor, user_id, type_, amount, description, ministry_id=None):
+    """تسجيل قيد في سجل المعاملات: داخل المعاملة الجارية، أو بعد اعتمادها على دفعات
+    إذا كان النوع ضمن LEDGER_BATCHED_TYPES (انظر ledger_writer.py)"""
+    if ledger_writer.is_batched(type_):
+        entry = (user_id, ministry_id, type_, amount, description, datetime.now())
+        on_commit(lambda: ledger_writer.submit(entry))
+        return
+    cursor.execute("INSERT INTO transactions (user_id, ministry_id, type, amount, description) VALUES (%s, %s, %s, %s, %s)",
+                   (user_id, ministry_id, type_, amount, description))
+
+# ============= الحسابات =============
+def open_account(cursor, user_id, initial_balance, now):
+    """فتح حساب جديد، ويعيد False إذا كان الحساب موجودًا مسبقًا"""
+    cursor.execute("INSERT INTO users (user_id, balance) VALUES (%s, %s) ON CONFLICT (user_id) DO NOTHING RETURNING user_id", (user_id, initial_balance))
+    if not cursor.fetchone():
+        return False
+    cursor.execute("INSERT INTO salaries (user_id, last_paid) VALUES (%s, %s)", (user_id, now))
+    record_transaction(cursor, user_id, "deposit", initial_balance, "رصيد مبدئي لفتح الحساب")
+    return True
+
+def account_exists(cursor, user_id):
+    """هل للمستخدم حساب؟"""
+    cursor.execute("SELECT 1 FROM users WHERE user_id = %s", (user_id,))
+    return cursor.fetchone() is not None
+
+def get_account(cursor, user_id):
+    """(الرصيد، نوع البطاقة) أو None إذا لم يكن للمستخدم حساب"""
+    cursor.execute("SELECT balance, card_type FROM users WHERE user_id = %s", (user_id,))
+    return cursor.fetchone()
+
+def richest_users(cursor, limit=10):
+    cursor.execute("SELECT user_id, balance FROM users ORDER BY balance DESC LIMIT %s", (limit,))
+    return cursor.fetchall()
+
+def transfer(cursor, sender_id, recipient_id, amount):
+    """تحويل ذري في رحلة واحدة عبر الدالة المخزنة bank_transfer (انظر migrations.py)،
+    ويعيد (النتيجة، رصيد المرسل الجديد، رصيد المستلم الجديد)"""
+    cursor.execute("SELECT status, sender_balance, recipient_balance FROM bank_transfer(%s, %s, %s)", (sender_id, recipient_id, amount))
+    return cursor.fetchone()
+
+def list_transactions_page(cursor, user_id, start, end, before, limit):
+    """صفحة من معاملات المستخدم من الأحدث إلى الأقدم ضمن النطاق [start, end)
+
+    before هو مفتاح آخر صف في الصفحة السابقة (timestamp, transaction_id) أو None للصفحة الأولى.
+    كل صف: (transaction_id, timestamp, type, amount, description)
+    """
+    cursor.execute("""
+        SELECT transaction_id, timestamp, type, amount, description FROM transactions
+        WHERE user_id = %(user_id)s
+          AND (%(start)s::timestamp IS NULL OR timestamp >= %(start)s)
+          AND (%(end)s::timestamp IS NULL OR timestamp < %(end)s)
+          AND (%(before_ts)s::timestamp IS NULL OR (timestamp, transaction_id) < (%(before_ts)s, %(before_id)s))
+        ORDER BY timestamp DESC, transaction_id DESC
+        LIMIT %(limit)s
+    """, {"user_id": user_id, "start": start, "end": end, "limit": limit,
+          "before_ts": before[0] if before else None, "before_id": before[1] if before else None})
+    return cursor.fetchall()
+
+def admin_give(cursor, target_user_id, amount, admin_id):
+    cursor.execute("SELECT user_id FROM users WHERE user_id = %s", (target_user_id,))
+    if not cursor.fetchone():
+        return NOT_FOUND
+
+    cursor.execute("UPDATE users SET balance = balance + %s WHERE user_id = %s", (amount, target_user_id))
+    record_transaction(cursor, target_user_id, "admin_give", amount, f"إعطاء من الإدارة بواسطة {admin_id}")
+    return OK
+
+def admin_take(cursor, target_user_id, amount, admin_id):
+    # الشرط على الرصيد داخل التحديث نفسه، فلا تسحب عمليتان متزامنتان أكثر من الرصيد
+    cursor.execute("UPDATE users SET balance = balance - %s WHERE user_id = %s AND balance >= %s RETURNING balance",
+                   (amount, target_user_id, amount))
+    if not cursor.fetchone():
+        return INSUFFICIENT_FUNDS if account_exists(cursor, target_user_id) else NOT_FOUND
+    record_transaction(cursor, target_user_id, "admin_take", -amount, f"سحب من الإدارة بواسطة {admin_id}")
+    return OK
+
+# ============= الاستثمارات =============
+def start_investment(cursor, user_id, amount, days, return_rate, now):
+    """بدء استثمار، ويعيد (النتيجة، الرصيد الجديد، (تاريخ الاستحقاق، معرف الاستثمار))"""
+    # خصم مبلغ الاستثمار من الرصيد إن كان يكفي، في عبارة واحدة
+    cursor.execute("UPDATE users SET balance = balance - %s WHERE user_id = %s AND balance >= %s RETURNING balance",
+                   (amount, user_id, amount))
+    user_balance = cursor.fetchone()
+    if not user_balance:
+        return INSUFFICIENT_FUNDS, None, None
+    new_balance = user_balance[0]
+    end_date = now + timedelta(days=days)
+    cursor.execute("INSERT INTO investments (user_id, amount, end_date, return_rate, status) VALUES (%s, %s, %s, %s, %s) RETURNING investment_id",
+                   (user_id, amount, end_date, return_rate, "active"))
+    investment_id = cursor.fetchone()[0]
+    record_transaction(cursor, user_id, "investment_start", -amount, f"بدء استثمار لمدة {days} يوم")
+    return OK, new_balance, (end_date, investment_id)
+
+def upcoming_maturities(cursor, before, worker_index=0, worker_count=1):
+    """(end_date, investment_id) للاستثمارات النشطة التي تستحق قبل before
+
+    مع عدة عمليات (launcher.py) تأخذ كل عملية الاستثمارات التي investment_id % worker_count فيها يساوي worker_index
+    """
+    cursor.execute("""
+        SELECT end_date, investment_id FROM investments
+        WHERE status = 'active' AND end_date < %s AND investment_id %% %s = %s
+        ORDER BY end_date, investment_id
+    """, (before, worker_count, worker_index))
+    return cursor.fetchall()
+
+def list_investments_page(cursor, user_id, after, limit):
+    """صفحة من استثمارات المستخدم مرتبة حسب (status DESC, end_date, investment_id)
+
+    after هو مفتاح آخر صف في الصفحة السابقة (status, end_date, investment_id) أو None للصفحة الأولى.
+    كل صف: (investment_id, amount, start_date, end_date, return_rate, status)
+    """
+    if after is None:
+        cursor.execute("""
+            SELECT investment_id, amount, start_date, end_date, return_rate, status FROM investments
+            WHERE user_id = %s
+            ORDER BY status DESC, end_date, investment_id
+            LIMIT %s
+        """, (user_id, limit))
+        return cursor.fetchall()
+    # فرعان يقرأ كل منهما نطاقًا متصلًا من الفهرس، فتبقى تكلفة الصفحة ثابتة مهما كان موقعها
+    status, end_date, investment_id = after
+    cursor.execute("""
+        (SELECT investment_id, amount, start_date, end_date, return_rate, status FROM investments
+         WHERE user_id = %(user_id)s AND status = %(status)s AND (end_date, investment_id) > (%(end_date)s, %(investment_id)s)
+         ORDER BY end_date, investment_id
+         LIMIT %(limit)s)
+        UNION ALL
+        (SELECT investment_id, amount, start_date, end_date, return_rate, status FROM investments
+         WHERE user_id = %(user_id)s AND status < %(status)s
+         ORDER BY status DESC, end_date, investment_id
+         LIMIT %(limit)s)
+        ORDER BY status DESC, end_date, investment_id
+        LIMIT %(limit)s
+    """, {"user_id": user_id, "status": status, "end_date": end_date, "investment_id": investment_id, "limit": limit})
+    return cursor.fetchall()
+
+def settle_matured_investments(cursor, now, limit):
+    """تسوية دفعة من الاستثمارات المنتهية (بحد أقصى limit)، ويعيد قائمة (رقم الاستثمار، المستخدم، المبلغ المعاد)"""
+    # الحساب بالكامل بنوع NUMERIC داخل قاعدة البيانات، وSKIP LOCKED يسمح لأكثر من منفذ بالعمل دون تعارض.
+    # كل دفعة ذرية: إذا توقفت التسوية في المنتصف تبقى الاستثمارات غير المعالجة نشطة وتُستأنف في الجولة التالية
+    cursor.execute("""
+        WITH batch AS (
+            SELECT investment_id FROM investments
+            WHERE status = 'active' AND end_date <= %(now)s
+            ORDER BY end_date, investment_id
+            LIMIT %(limit)s
+            FOR UPDATE SKIP LOCKED
+        )
+        UPDATE investments SET status = 'completed'
+        FROM batch
+        WHERE investments.investment_id = batch.investment_id
+        RETURNING investments.investment_id, investments.user_id,
+                  ROUND(investments.amount + investments.amount * investments.return_rate, 2) AS total_return
+    """, {"now": now, "limit": limit})
+    settled = cursor.fetchall()
+    if not settled:
+        return []
+    investment_ids = [row[0] for row in settled]
+    # قفل المستخدمين بترتيب user_id كما يفعل bank_transfer ودفع الرواتب، وإلا تتبادل الدفعات المتزامنة الجمود.
+    # الإضافة في عبارة مستقلة تبدأ بلقطة جديدة بعد القفل، فلا تنتظر أي صف
+    cursor.execute("""
+        SELECT 1 FROM users
+        WHERE user_id IN (SELECT user_id FROM investments WHERE investment_id = ANY(%s))
+        ORDER BY user_id
+        FOR NO KEY UPDATE
+    """, (investment_ids,))
+    cursor.execute("""
+        WITH settled AS (
+            SELECT investment_id, user_id, ROUND(amount + amount * return_rate, 2) AS total_return FROM investments
+            WHERE investment_id = ANY(%(investment_ids)s)
+        ), credited AS (
+            UPDATE users SET balance = users.balance + totals.total_return
+            FROM (SELECT user_id, SUM(total_return) AS total_return FROM settled GROUP BY user_id) totals
+            WHERE users.user_id = totals.user_id
+        )
+        INSERT INTO transactions (user_id, type, amount, description)
+        SELECT user_id, 'investment_return', total_return, 'عائد استثمار رقم ' || investment_id || ' (أصل + ربح)'
+        FROM settled
+    """, {"investment_ids": investment_ids})
+    return settled
+
+# ============= الرواتب =============
+def pay_due_salaries(cursor, salary_amount, interval, now, limit=None):
+    """دفع الرواتب المستحقة (أقدمها استحقاقًا أولًا، وحتى limit مستخدم)، ويعيد معرفات من تم الدفع لهم"""
+    # تحديد المستحقين وتحديث الأرصدة وتسجيل المعاملات في عبارتين لكل دفعة بدل ثلاث عبارات لكل مستخدم.
+    # كل مستخدم يحتفظ بموعده: الموعد التالي = السابق + الفترة، إلا إذا تأخر الدفع أكثر من فترة كاملة
+    # فيبدأ العد من الآن (لا تُدفع الفترات الفائتة بأثر رجعي). SKIP LOCKED يترك الصفوف التي تعالجها دفعة أخرى.
+    # العبارة الأولى تحجز الدفعة وتقفل المستخدمين بترتيب user_id كما يفعل bank_transfer وتسوية الاستثمارات،
+    # والثانية تحدث الأرصدة بلقطة جديدة أُخذت بعد القفل، فلا تنتظر أي صف ولا تتبادل الجمود مع غيرها
+    cursor.execute("""
+        WITH batch AS (
+            SELECT user_id, last_paid FROM salaries
+            WHERE last_paid <= %(due_before)s
+            ORDER BY last_paid
+            LIMIT %(limit)s
+            FOR UPDATE SKIP LOCKED
+        ), due AS (
+            UPDATE salaries SET last_paid = CASE
+                WHEN batch.last_paid > %(due_before)s - %(interval)s THEN batch.last_paid + %(interval)s
+                ELSE %(now)s
+            END
+            FROM batch
+            WHERE salaries.user_id = batch.user_id
+            RETURNING salaries.user_id
+        )
+        SELECT users.user_id FROM users
+        JOIN due ON due.user_id = users.user_id
+        ORDER BY users.user_id
+        FOR NO KEY UPDATE OF users
+    """, {"now": now, "due_before": now - interval, "interval": interval, "limit": limit})
+    user_ids = [row[0] for row in cursor.fetchall()]
+    if not user_ids:
+        return []
+    cursor.execute("""
+        WITH paid AS (
+            UPDATE users SET balance = balance + %(amount)s
+            WHERE user_id = ANY(%(user_ids)s)
+            RETURNING user_id
+        )
+        INSERT INTO transactions (user_id, type, amount, description)
+        SELECT user_id, 'salary', %(amount)s, 'راتب دوري' FROM paid
+        RETURNING user_id
+    """, {"amount": salary_amount, "user_ids": user_ids})
+    return [row[0] for row in cursor.fetchall()]
+
+# ============= البطاقات =============
+def list_cards(cursor):
+    cursor.execute("SELECT card_name, price, benefits FROM cards ORDER BY price ASC")
+    return cursor.fetchall()
+
+def buy_card(cursor, user_id, card_name, card_price):
+    """شراء بطاقة بسعرها من كتالوج البطاقات (cache.card_catalog)، ويعيد (النتيجة، الرصيد الجديد)"""
+    # خصم سعر البطاقة وتحديث نوع البطاقة إن كان الرصيد يكفي، في عبارة واحدة
+    cursor.execute("UPDATE users SET balance = balance - %s, card_type = %s WHERE user_id = %s AND balance >= %s RETURNING balance",
+                   (card_price, card_name, user_id, card_price))
+    user_balance = cursor.fetchone()
+    if not user_balance:
+        return (INSUFFICIENT_FUNDS if account_exists(cursor, user_id) else NO_ACCOUNT), None
+    new_balance = user_balance[0]
+    record_transaction(cursor, user_id, "card_purchase", -card_price, f"شراء بطاقة {card_name}")
+    return OK, new_balance
+
+# ============= الوزارات =============
+def list_ministries(cursor):
+    cursor.execute("SELECT name, balance FROM ministries")
+    return cursor.fetchall()
+
+def create_ministry(cursor, ministry_name):
+    """إنشاء وزارة، ويعيد False إذا كانت موجودة مسبقًا"""
+    cursor.execute("INSERT INTO ministries (name, balance) VALUES (%s, %s) ON CONFLICT (name) DO NOTHING RETURNING ministry_id", (ministry_name, 0.00))
+    return cursor.fetchone() is not None
+
+def distribute_ministry_budget(cursor, ministry_name, amount, actor_id):
+    cursor.execute("SELECT ministry_id FROM ministries WHERE name = %s", (ministry_name,))
+    ministry = cursor.fetchone()
+    if not ministry:
+        return NOT_FOUND
+
+    cursor.execute("UPDATE ministries SET balance = balance + %s WHERE name = %s", (amount, ministry_name))
+    record_transaction(cursor, actor_id, "ministry_budget_distribution", amount, f"توزيع ميزانية لوزارة {ministry_name}", ministry_id=ministry[0])
+    return OK
+
+def withdraw_from_ministry(cursor, ministry_name, amount, actor_id):
+    cursor.execute("SELECT ministry_id, balance FROM ministries WHERE name = %s", (ministry_name,))
+    ministry = cursor.fetchone()
+    if not ministry:
+        return NOT_FOUND
+    if ministry[1] < amount:
+        return INSUFFICIENT_FUNDS
+
+    cursor.execute("UPDATE ministries SET balance = balance - %s WHERE name = %s", (amount, ministry_name))
+    record_transaction(cursor, actor_id, "ministry_withdraw", -amount, f"سحب من وزارة {ministry_name}", ministry_id=ministry[0])
+    return OK
@@ -0,0 +1,59 @@
+# تقسيم اتصال البوت ببوابة ديسكورد إلى شظايا (shards)، كل شظية تحمل جزءًا من السيرفرات
+# عملية واحدة يمكن أن تشغل كل الشظايا (AutoShardedBot) أو جزءًا منها، وlauncher.py يوزعها على عدة عمليات
+# حتى لا تمر كل الأحداث والأزرار عبر حلقة أحداث واحدة.
+import discord
+from discord.http import Route
+
+def parse_shard_ids(value):
+    """"0-3,6" -> [0, 1, 2, 3, 6]؛ النص الفارغ يعني كل الشظايا (None)"""
+    ids = []
+    for part in filter(None, (p.strip() for p in value.split(","))):
+        first, _, last = part.partition("-")
+        ids.extend(range(int(first), int(last or first) + 1))
+    return sorted(set(ids)) or None
+
+def format_shard_ids(ids):
+    """[0, 1, 2, 3, 6] -> "0-3,6" """
+    parts = []
+    for shard_id in sorted(ids):
+        if parts and parts[-1][1] == shard_id - 1:
+            parts[-1][1] = shard_id
+        else:
+            parts.append([shard_id, shard_id])
+    return ",".join(str(first) if first == last else f"{first}-{last}" for first, last in parts)
+
+def shard_options(shard_count, shard_ids):
+    """معاملات إنشاء AutoShardedBot من إعدادات SHARD_COUNT وSHARD_IDS، أو None لتشغيل بوت بلا شظايا"""
+    if shard_count in ("", "0"):
+        return None
+    if shard_count == "auto":
+        # ديسكورد يحدد العدد، وتعمل كل الشظايا في هذه العملية
+        return {}
+    options = {"shard_count": int(shard_count)}
+    ids = parse_shard_ids(shard_ids)
+    if ids is not None:
+        if ids[-1] >= options["shard_count"]:
+            raise ValueError(f"SHARD_IDS {shard_ids!r} is outside SHARD_COUNT {shard_count}")
+        options["shard_ids"] = ids
+    return options
+
+def split_shards(shard_count, processes):
+    """توزيع الشظايا على العمليات بنطاقات متصلة متقاربة الحجم"""
+    size, extra = divmod(shard_count, processes)
+    ranges = []
+    start = 0
+    for index in range(processes):
+        end = start + size + (index < extra)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+async def gateway_info(token):
+    """(عدد الشظايا الموصى به، عدد الشظايا التي يمكنها الاتصال معًا كل 5 ثوانٍ) من /gateway/bot"""
+    client = discord.Client(intents=discord.Intents.none())
+    try:
+        await client.login(token)
+        data = await client.http.request(Route("GET", "/gateway/bot"))
+    finally:
+        await client.close()
+    return data["shards"], data["session_start_limit"]["max_concurrency"]
@@ -0,0 +1,125 @@
+# لقطات الأرصدة اليومية للمستخدمين والوزارات، تُبنى تدريجيًا من سجل المعاملات
+# رصيد حساب في أي يوم = آخر لقطة حتى ذلك اليوم + مجموع حركاته بعدها (إن كان اليوم بعد آخر لقطة مكتملة)،
+# بدل جمع سجل المعاملات كاملًا منذ فتح الحساب.
+from datetime import timedelta
+
+USER = "user"
+MINISTRY = "ministry"
+
+# لا تُلتقط أرصدة يوم إلا بعد انتهائه بهذه المدة، حتى تكون معاملاته المتأخرة في الاعتماد قد ظهرت
+GRACE = timedelta(hours=1)
+# أقصى عدد أيام تُلتقط في معاملة واحدة عند اللحاق بتأخر طويل
+MAX_DAYS_PER_RUN = 31
+
+# شرط حركات الحساب في سجل المعاملات: حركات الوزارات مسجلة باسم المنفذ لكنها لا تمس رصيده
+_OWNER = {
+    USER: "user_id = %(account_id)s AND ministry_id IS NULL",
+    MINISTRY: "ministry_id = %(account_id)s",
+}
+
+def snapshot_through(cursor):
+    """آخر يوم اكتملت لقطاته أو None"""
+    cursor.execute("SELECT snapshot_through FROM snapshot_progress")
+    return cursor.fetchone()[0]
+
+def take_snapshots(cursor, now):
+    """التقاط الأيام المكتملة التالية لآخر لقطة (حتى MAX_DAYS_PER_RUN)، ويعيد (آخر يوم مكتمل، عدد اللقطات)"""
+    cursor.execute("SELECT snapshot_through FROM snapshot_progress FOR UPDATE")
+    through = cursor.fetchone()[0]
+    last_closed = (now - GRACE).date() - timedelta(days=1)
+    if through is None:
+        cursor.execute("SELECT MIN(timestamp)::date FROM transactions")
+        first = cursor.fetchone()[0]
+        through = (first or last_closed + timedelta(days=1)) - timedelta(days=1)
+    if through >= last_closed:
+        return through, 0
+
+    start = through + timedelta(days=1)
+    end = min(last_closed, through + timedelta(days=MAX_DAYS_PER_RUN))
+    # رصيد الإغلاق لكل حساب تحرك في اليوم = آخر لقطة قبل النطاق + المجموع التراكمي لحركاته اليومية
+    cursor.execute("""
+        WITH moves AS (
+            SELECT 'user' AS account_kind, user_id AS account_id, timestamp::date AS day, SUM(amount) AS delta
+            FROM transactions
+            WHERE timestamp >= %(start)s AND timestamp < %(end)s AND ministry_id IS NULL AND user_id IS NOT NULL
+            GROUP BY user_id, timestamp::date
+            UNION ALL
+            SELECT 'ministry', ministry_id, timestamp::date, SUM(amount)
+            FROM transactions
+            WHERE timestamp >= %(start)s AND timestamp < %(end)s AND ministry_id IS NOT NULL
+            GROUP BY ministry_id, timestamp::date
+        ), running AS (
+            SELECT account_kind, account_id, day,
+                   SUM(delta) OVER (PARTITION BY account_kind, account_id ORDER BY day) AS moved
+            FROM moves
+        )
+        INSERT INTO balance_snapshots (account_kind, account_id, day, balance)
+        SELECT r.account_kind, r.account_id, r.day, COALESCE(previous.balance, 0) + r.moved
+        FROM running r
+        LEFT JOIN LATERAL (
+            SELECT balance FROM balance_snapshots s
+            WHERE s.account_kind = r.account_kind AND s.account_id = r.account_id AND s.day < %(start)s
+            ORDER BY s.day DESC
+            LIMIT 1
+        ) previous ON TRUE
+    """, {"start": start, "end": end + timedelta(days=1)})
+    written = cursor.rowcount
+    cursor.execute("UPDATE snapshot_progress SET snapshot_through = %s", (end,))
+    return end, written
+
+def balance_on(cursor, account_kind, account_id, day):
+    """رصيد إغلاق الحساب في نهاية يوم day"""
+    params = {"account_kind": account_kind, "account_id": account_id, "day": day}
+    cursor.execute("""
+        SELECT s.balance, p.snapshot_through
+        FROM snapshot_progress p
+        LEFT JOIN LATERAL (
+            SELECT balance FROM balance_snapshots
+            WHERE account_kind = %(account_kind)s AND account_id = %(account_id)s AND day <= %(day)s
+            ORDER BY day DESC
+            LIMIT 1
+        ) s ON TRUE
+    """, params)
+    balance, through = cursor.fetchone()
+    balance = balance or 0
+    if through is not None and day <= through:
+        return balance
+    # اليوم لم تكتمل لقطته بعد: نضيف حركات ما بعد آخر يوم مكتمل فقط
+    since = through + timedelta(days=1) if through is not None else None
+    cursor.execute(f"""
+        SELECT COALESCE(SUM(amount), 0) FROM transactions
+        WHERE {_OWNER[account_kind]}
+          AND (%(since)s::date IS NULL OR timestamp >= %(since)s)
+          AND timestamp < %(until)s
+    """, {**params, "since": since, "until": day + timedelta(days=1)})
+    return balance + cursor.fetchone()[0]
+
+def balance_history(cursor, account_kind, account_id, start, end):
+    """رصيد إغلاق الحساب لكل يوم من start إلى end شاملًا، كقائمة (اليوم، الرصيد)"""
+    balance = balance_on(cursor, account_kind, account_id, start - timedelta(days=1))
+    through = snapshot_through(cursor)
+    changes = {}
+    if through is not None and start <= through:
+        cursor.execute("""
+            SELECT day, balance FROM balance_snapshots
+            WHERE account_kind = %s AND account_id = %s AND day BETWEEN %s AND %s
+        """, (account_kind, account_id, start, min(end, through)))
+        changes.update({day: ("set", value) for day, value in cursor.fetchall()})
+    if through is None or end > through:
+        since = start if through is None else max(start, through + timedelta(days=1))
+        cursor.execute(f"""
+            SELECT timestamp::date, SUM(amount) FROM transactions
+            WHERE {_OWNER[account_kind]} AND timestamp >= %(since)s AND timestamp < %(until)s
+            GROUP BY timestamp::date
+        """, {"account_id": account_id, "since": since, "until": end + timedelta(days=1)})
+        changes.update({day: ("add", delta) for day, delta in cursor.fetchall()})
+
+    history = []
+    day = start
+    while day <= end:
+        change = changes.get(day)
+        if change:
+            balance = change[1] if change[0] == "set" else balance + change[1]
+        history.append((day, balance))
+        day += timedelta(days=1)
+    return history
@@ -0,0 +1,182 @@
+# واجهة التخزين المضمنة: ملف SQLite محلي بدل خادم PostgreSQL (DATABASE_BACKEND=sqlite)
+# الكتابة كلها على خيط واحد: SQLite يسمح بكاتب واحد في كل لحظة، فالخيط الواحد يجعل المعاملات متسلسلة
+# دون انتظار أقفال أو أخطاء SQLITE_BUSY، والقراءات المعروفة (sqlite_queries.READ_ONLY) على خيوط منفصلة
+# لا تحجب الكاتب ولا يحجبها بفضل وضع WAL. دوال الوصول للبيانات نفسها تعمل هنا بعد ترجمة علامات
+# المعاملات، وما يعتمد على ميزات PostgreSQL له بديل في sqlite_queries.OVERRIDES.
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+
+from config import SQLITE_SYNCHRONOUS
+from database import after_commit_scope
+import metrics
+
+CENT = Decimal("0.01")
+
+# عدد العبارات المحضرة المحفوظة لكل اتصال؛ دوال الوصول للبيانات تعيد نفس النصوص فلا تُحلَّل إلا مرة واحدة
+STATEMENT_CACHE_SIZE = 512
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA cache_size = -65536", # 64MB لكل اتصال
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA mmap_size = 268435456",
+)
+
+# التواريخ نصوص ISO تُقارن ترتيبيًا، والمبالغ (DECIMAL) تُقرأ Decimal بالهللة كما في PostgreSQL
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" ", timespec="microseconds"))
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_adapter(Decimal, float)
+sqlite3.register_converter("TIMESTAMP", lambda raw: datetime.fromisoformat(raw.decode()))
+sqlite3.register_converter("DATE", lambda raw: date.fromisoformat(raw.decode()))
+sqlite3.register_converter("DECIMAL", lambda raw: Decimal(raw.decode()).quantize(CENT))
+
+_PLACEHOLDERS = re.compile(r"%\((\w+)\)s|%s|%%")
+
+def _placeholder(match):
+    if match.group(1):
+        return f":{match.group(1)}"
+    return "?" if match.group(0) == "%s" else "%"
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def translate(query):
+    """تحويل علامات psycopg2 (%s و%(name)s و%%) إلى علامات sqlite3 (? و:name و%)"""
+    return _PLACEHOLDERS.sub(_placeholder, query)
+
+class SqliteCursor:
+    """مؤشر بالجزء من واجهة psycopg2 الذي تستخدمه دوال الوصول للبيانات"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._cursor = connection.cursor()
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            self._cursor.execute(translate(query), () if vars is None else vars)
+        finally:
+            metrics.record_db(time.perf_counter() - started)
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            self._cursor.executemany(translate(query), vars_list)
+        finally:
+            metrics.record_db(time.perf_counter() - started)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+class SqliteBackend:
+    """خيط كتابة واحد وعدد من خيوط القراءة، لكل خيط اتصال دائم به"""
+    name = "sqlite"
+
+    def __init__(self, path, readers):
+        # استيراد متأخر لأن sqlite_queries يستورد دوال الوصول للبيانات
+        from sqlite_queries import OVERRIDES, READ_ONLY
+        self.path = path
+        self.readers = readers
+        self._overrides = OVERRIDES
+        self._read_only = READ_ONLY
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-writer",
+                                          initializer=self._connect, initargs=(False,))
+        self._reader_pool = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="sqlite-reader",
+                                               initializer=self._connect, initargs=(True,))
+        self._pending_writes = 0
+        self._counts = {"write": [0, 0.0], "read": [0, 0.0]} # العدد والزمن الكلي
+
+    def _connect(self, reader):
+        conn = sqlite3.connect(self.path, detect_types=sqlite3.PARSE_DECLTYPES, isolation_level=None,
+                               check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        if reader:
+            conn.execute("PRAGMA query_only = ON")
+        self._local.connection = conn
+        with self._lock:
+            self._connections.append(conn)
+
+    def _run(self, fn, args, kwargs, kind):
+        conn = self._local.connection
+        started = time.perf_counter()
+        try:
+            with after_commit_scope():
+                # IMMEDIATE يأخذ قفل الكتابة من البداية؛ القراءة تبدأ لقطة ثابتة عند أول استعلام
+                conn.execute("BEGIN IMMEDIATE" if kind == "write" else "BEGIN")
+                try:
+                    result = fn(SqliteCursor(conn), *args, **kwargs)
+                except BaseException:
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                    raise
+                conn.execute("COMMIT")
+            return result
+        finally:
+            with self._lock:
+                if kind == "write":
+                    self._pending_writes -= 1
+                self._counts[kind][0] += 1
+                self._counts[kind][1] += time.perf_counter() - started
+
+    def submit(self, ctx, fn, args, kwargs):
+        """تنفيذ fn(cursor, *args, **kwargs) (أو بديلها في OVERRIDES) داخل السياق ctx، ويعيد Future"""
+        fn = self._overrides.get(fn, fn)
+        if fn in self._read_only:
+            return self._reader_pool.submit(ctx.run, self._run, fn, args, kwargs, "read")
+        with self._lock:
+            self._pending_writes += 1
+        return self._writer.submit(ctx.run, self._run, fn, args, kwargs, "write")
+
+    def stats(self):
+        with self._lock:
+            (writes, write_time), (reads, read_time) = self._counts["write"], self._counts["read"]
+            pending = self._pending_writes
+        size = sum(os.path.getsize(p) for p in (self.path, self.path + "-wal") if os.path.exists(p))
+        return {
+            "backend": self.name,
+            "path": self.path,
+            "readers": self.readers,
+            "pending_writes": pending,
+            "writes": writes,
+            "avg_write_ms": write_time / writes * 1000 if writes else 0.0,
+            "reads": reads,
+            "avg_read_ms": read_time / reads * 1000 if reads else 0.0,
+            "size_mb": size / (1024 * 1024),
+        }
+
+    def close(self):
+        self._writer.shutdown(wait=True)
+        self._reader_pool.shutdown(wait=True)
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
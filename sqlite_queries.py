@@ -0,0 +1,319 @@
+# بدائل SQLite لدوال الوصول للبيانات التي تعتمد على ميزات PostgreSQL
+# (الدوال المخزنة، SKIP LOCKED، العبارات المعدِّلة داخل WITH، التحويلات ::، المؤشرات على الخادم، الأقسام).
+# كل بديل يحمل توقيع الأصل نفسه ويُختار تلقائيًا عبر OVERRIDES، فلا تعرف main.py أي واجهة تعمل.
+# بقية الدوال في queries.py تعمل كما هي على SQLite بعد ترجمة العلامات (sqlite_backend.translate).
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import database
+import ledger
+import ledger_writer
+import queries
+import snapshots
+import statements
+from queries import OK, NOT_FOUND, INSUFFICIENT_FUNDS, NO_ACCOUNT
+
+CENT = Decimal("0.01")
+
+# ============= المخطط =============
+# نفس جداول main_backup.py (bank_data.db) مع ما أضافته ترحيلات PostgreSQL لاحقًا: البطاقات، وministry_id
+# في السجل، والفهارس. المبالغ REAL كما في النسخة القديمة لكن بنوع DECIMAL المعلن حتى تُقرأ Decimal بالهللة،
+# ومشغلات تقرّب الأرصدة إلى الهللة عند كل تحديث فلا تتراكم أخطاء الفاصلة العائمة.
+SCHEMA_VERSION = 1
+
+_NOW = "(strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'))"
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        user_id INTEGER PRIMARY KEY,
+        balance DECIMAL(15, 2) DEFAULT 1500.00,
+        card_type TEXT DEFAULT 'basic'
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS cards (
+        card_name TEXT PRIMARY KEY,
+        price DECIMAL(15, 2) NOT NULL,
+        benefits TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ministries (
+        ministry_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT UNIQUE NOT NULL,
+        balance DECIMAL(15, 2) DEFAULT 0.00
+    )
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS transactions (
+        transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER REFERENCES users(user_id),
+        type TEXT NOT NULL,
+        amount DECIMAL(15, 2) NOT NULL,
+        timestamp TIMESTAMP NOT NULL DEFAULT {_NOW},
+        description TEXT,
+        ministry_id INTEGER REFERENCES ministries(ministry_id)
+    )
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS investments (
+        investment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER REFERENCES users(user_id),
+        amount DECIMAL(15, 2) NOT NULL,
+        start_date TIMESTAMP DEFAULT {_NOW},
+        end_date TIMESTAMP,
+        return_rate DECIMAL(5, 2),
+        status TEXT DEFAULT 'active'
+    )
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS salaries (
+        user_id INTEGER PRIMARY KEY REFERENCES users(user_id),
+        last_paid TIMESTAMP DEFAULT {_NOW}
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_investments_active_end_date ON investments (end_date, investment_id) WHERE status = 'active'",
+    "CREATE INDEX IF NOT EXISTS idx_investments_user_page ON investments (user_id, status DESC, end_date, investment_id)",
+    "CREATE INDEX IF NOT EXISTS idx_transactions_user_ts_id ON transactions (user_id, timestamp, transaction_id)",
+    "CREATE INDEX IF NOT EXISTS idx_transactions_ministry_ts ON transactions (ministry_id, timestamp) WHERE ministry_id IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS idx_users_balance ON users (balance DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_salaries_last_paid ON salaries (last_paid)",
+    """
+    CREATE TRIGGER IF NOT EXISTS users_balance_cents AFTER UPDATE OF balance ON users
+    WHEN NEW.balance <> ROUND(NEW.balance, 2)
+    BEGIN
+        UPDATE users SET balance = ROUND(NEW.balance, 2) WHERE user_id = NEW.user_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS ministries_balance_cents AFTER UPDATE OF balance ON ministries
+    WHEN NEW.balance <> ROUND(NEW.balance, 2)
+    BEGIN
+        UPDATE ministries SET balance = ROUND(NEW.balance, 2) WHERE ministry_id = NEW.ministry_id;
+    END
+    """,
+]
+
+CARDS = [
+    ('silver', 5000.00, 'خصم 5% على رسوم التحويل، زيادة 1% في عائد الاستثمار'),
+    ('gold', 15000.00, 'خصم 10% على رسوم التحويل، زيادة 2% في عائد الاستثمار، سحب يومي أعلى'),
+    ('platinum', 50000.00, 'خصم 15% على رسوم التحويل، زيادة 3% في عائد الاستثمار، سحب يومي أعلى بكثير، دعم VIP'),
+]
+
+def migrate(cursor):
+    """إنشاء المخطط إذا لم يكن موجودًا، ويعيد الإصدارات المطبقة (الإصدار محفوظ في PRAGMA user_version)"""
+    cursor.execute("PRAGMA user_version")
+    if cursor.fetchone()[0] >= SCHEMA_VERSION:
+        return []
+    for statement in SCHEMA:
+        cursor.execute(statement)
+    cursor.executemany("INSERT INTO cards (card_name, price, benefits) VALUES (%s, %s, %s) ON CONFLICT (card_name) DO NOTHING", CARDS)
+    cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return [SCHEMA_VERSION]
+
+def _money(value):
+    """ناتج العمليات الحسابية في SQLite (float بلا نوع معلن) كـ Decimal بالهللة"""
+    return Decimal(str(value or 0)).quantize(CENT)
+
+# ============= الحسابات =============
+def transfer(cursor, sender_id, recipient_id, amount):
+    """مثل bank_transfer في PostgreSQL؛ لا حاجة لأقفال الصفوف لأن كل الكتابة على خيط واحد"""
+    cursor.execute("SELECT balance FROM users WHERE user_id = %s", (sender_id,))
+    sender = cursor.fetchone()
+    if sender is None or sender[0] < amount:
+        return INSUFFICIENT_FUNDS, None, None
+    cursor.execute("SELECT 1 FROM users WHERE user_id = %s", (recipient_id,))
+    if cursor.fetchone() is None:
+        return NOT_FOUND, None, None
+
+    cursor.execute("UPDATE users SET balance = ROUND(balance - %s, 2) WHERE user_id = %s RETURNING balance", (amount, sender_id))
+    sender_balance = cursor.fetchone()[0]
+    cursor.execute("UPDATE users SET balance = ROUND(balance + %s, 2) WHERE user_id = %s RETURNING balance", (amount, recipient_id))
+    recipient_balance = cursor.fetchone()[0]
+    cursor.execute("INSERT INTO transactions (user_id, type, amount, description) VALUES (%s, %s, %s, %s), (%s, %s, %s, %s)",
+                   (sender_id, "transfer_send", -amount, f"تحويل إلى {recipient_id}",
+                    recipient_id, "transfer_receive", amount, f"استلام من {sender_id}"))
+    return OK, _money(sender_balance), _money(recipient_balance)
+
+def start_investment(cursor, user_id, amount, days, return_rate, now):
+    """مثل queries.start_investment مع تقريب الرصيد إلى الهللة (الطرح في SQLite بأعداد REAL)"""
+    cursor.execute("UPDATE users SET balance = ROUND(balance - %s, 2) WHERE user_id = %s AND balance >= %s RETURNING balance",
+                   (amount, user_id, amount))
+    user_balance = cursor.fetchone()
+    if not user_balance:
+        return INSUFFICIENT_FUNDS, None, None
+    new_balance = user_balance[0]
+    end_date = now + timedelta(days=days)
+    cursor.execute("INSERT INTO investments (user_id, amount, end_date, return_rate, status) VALUES (%s, %s, %s, %s, %s) RETURNING investment_id",
+                   (user_id, amount, end_date, return_rate, "active"))
+    investment_id = cursor.fetchone()[0]
+    queries.record_transaction(cursor, user_id, "investment_start", -amount, f"بدء استثمار لمدة {days} يوم")
+    return OK, _money(new_balance), (end_date, investment_id)
+
+def buy_card(cursor, user_id, card_name, card_price):
+    """مثل queries.buy_card مع تقريب الرصيد إلى الهللة"""
+    cursor.execute("UPDATE users SET balance = ROUND(balance - %s, 2), card_type = %s WHERE user_id = %s AND balance >= %s RETURNING balance",
+                   (card_price, card_name, user_id, card_price))
+    user_balance = cursor.fetchone()
+    if not user_balance:
+        return (INSUFFICIENT_FUNDS if queries.account_exists(cursor, user_id) else NO_ACCOUNT), None
+    new_balance = user_balance[0]
+    queries.record_transaction(cursor, user_id, "card_purchase", -card_price, f"شراء بطاقة {card_name}")
+    return OK, _money(new_balance)
+
+def list_transactions_page(cursor, user_id, start, end, before, limit):
+    conditions = ["user_id = %(user_id)s"]
+    if start is not None:
+        conditions.append("timestamp >= %(start)s")
+    if end is not None:
+        conditions.append("timestamp < %(end)s")
+    if before is not None:
+        conditions.append("(timestamp, transaction_id) < (%(before_ts)s, %(before_id)s)")
+    cursor.execute(f"""
+        SELECT transaction_id, timestamp, type, amount, description FROM transactions
+        WHERE {' AND '.join(conditions)}
+        ORDER BY timestamp DESC, transaction_id DESC
+        LIMIT %(limit)s
+    """, {"user_id": user_id, "start": start, "end": end, "limit": limit,
+          "before_ts": before[0] if before else None, "before_id": before[1] if before else None})
+    return cursor.fetchall()
+
+# ============= الاستثمارات =============
+def list_investments_page(cursor, user_id, after, limit):
+    if after is None:
+        cursor.execute("""
+            SELECT investment_id, amount, start_date, end_date, return_rate, status FROM investments
+            WHERE user_id = %s
+            ORDER BY status DESC, end_date, investment_id
+            LIMIT %s
+        """, (user_id, limit))
+        return cursor.fetchall()
+    status, end_date, investment_id = after
+    cursor.execute("""
+        SELECT investment_id, amount, start_date, end_date, return_rate, status FROM investments
+        WHERE user_id = %(user_id)s
+          AND (status < %(status)s OR (status = %(status)s AND (end_date, investment_id) > (%(end_date)s, %(investment_id)s)))
+        ORDER BY status DESC, end_date, investment_id
+        LIMIT %(limit)s
+    """, {"user_id": user_id, "status": status, "end_date": end_date, "investment_id": investment_id, "limit": limit})
+    return cursor.fetchall()
+
+def settle_matured_investments(cursor, now, limit):
+    cursor.execute("""
+        SELECT investment_id, user_id, ROUND(amount + amount * return_rate, 2) FROM investments
+        WHERE status = 'active' AND end_date <= %s
+        ORDER BY end_date, investment_id
+        LIMIT %s
+    """, (now, limit))
+    settled = [(investment_id, user_id, _money(total)) for investment_id, user_id, total in cursor.fetchall()]
+    if not settled:
+        return []
+    totals = {}
+    for _, user_id, total in settled:
+        totals[user_id] = totals.get(user_id, 0) + total
+    cursor.executemany("UPDATE investments SET status = 'completed' WHERE investment_id = %s", [(row[0],) for row in settled])
+    cursor.executemany("UPDATE users SET balance = ROUND(balance + %s, 2) WHERE user_id = %s", [(total, user_id) for user_id, total in totals.items()])
+    cursor.executemany("INSERT INTO transactions (user_id, type, amount, description) VALUES (%s, 'investment_return', %s, %s)",
+                       [(user_id, total, f"عائد استثمار رقم {investment_id} (أصل + ربح)") for investment_id, user_id, total in settled])
+    return settled
+
+# ============= الرواتب =============
+def pay_due_salaries(cursor, salary_amount, interval, now, limit=None):
+    due_before = now - interval
+    cursor.execute("SELECT user_id, last_paid FROM salaries WHERE last_paid <= %s ORDER BY last_paid LIMIT %s",
+                   (due_before, -1 if limit is None else limit))
+    due = cursor.fetchall()
+    if not due:
+        return []
+    # نفس قاعدة PostgreSQL: الموعد التالي = السابق + الفترة، إلا إذا تأخر الدفع أكثر من فترة كاملة
+    cursor.executemany("UPDATE salaries SET last_paid = %s WHERE user_id = %s",
+                       [(last_paid + interval if last_paid > due_before - interval else now, user_id) for user_id, last_paid in due])
+    cursor.executemany("UPDATE users SET balance = ROUND(balance + %s, 2) WHERE user_id = %s", [(salary_amount, user_id) for user_id, _ in due])
+    cursor.executemany("INSERT INTO transactions (user_id, type, amount, description) VALUES (%s, 'salary', %s, 'راتب دوري')",
+                       [(user_id, salary_amount) for user_id, _ in due])
+    return [user_id for user_id, _ in due]
+
+# ============= كشف الحساب =============
+def export_transactions(cursor, user_id, start, end, fmt, max_bytes):
+    # مؤشر sqlite3 يقرأ الصفوف تدريجيًا أثناء المرور عليها، فلا حاجة لمؤشر على الخادم
+    conditions = ["user_id = %(user_id)s"]
+    if start is not None:
+        conditions.append("timestamp >= %(start)s")
+    if end is not None:
+        conditions.append("timestamp < %(end)s")
+    cursor.execute(f"""
+        SELECT transaction_id, timestamp, type, amount, description FROM transactions
+        WHERE {' AND '.join(conditions)}
+        ORDER BY timestamp, transaction_id
+    """, {"user_id": user_id, "start": start, "end": end})
+    return statements.write_export(cursor, fmt, max_bytes)
+
+# ============= اللقطات والأقسام =============
+# لا لقطات ولا أقسام في SQLite: السجل جدول واحد محلي، والرصيد التاريخي مجموع حركاته عبر الفهرس
+_OWNER = {
+    snapshots.USER: "user_id = %(account_id)s AND ministry_id IS NULL",
+    snapshots.MINISTRY: "ministry_id = %(account_id)s",
+}
+
+def take_snapshots(cursor, now):
+    return (now - snapshots.GRACE).date() - timedelta(days=1), 0
+
+def balance_on(cursor, account_kind, account_id, day):
+    cursor.execute(f"SELECT SUM(amount) FROM transactions WHERE {_OWNER[account_kind]} AND timestamp < %(until)s",
+                   {"account_id": account_id, "until": day + timedelta(days=1)})
+    return _money(cursor.fetchone()[0])
+
+def balance_history(cursor, account_kind, account_id, start, end):
+    balance = balance_on(cursor, account_kind, account_id, start - timedelta(days=1))
+    cursor.execute(f"""
+        SELECT date(timestamp), SUM(amount) FROM transactions
+        WHERE {_OWNER[account_kind]} AND timestamp >= %(since)s AND timestamp < %(until)s
+        GROUP BY date(timestamp)
+    """, {"account_id": account_id, "since": start, "until": end + timedelta(days=1)})
+    changes = {datetime.strptime(day, "%Y-%m-%d").date(): _money(delta) for day, delta in cursor.fetchall()}
+    history = []
+    day = start
+    while day <= end:
+        balance += changes.get(day, 0)
+        history.append((day, balance))
+        day += timedelta(days=1)
+    return history
+
+def no_partitions(cursor, *args):
+    return []
+
+def _insert_batch(cursor, entries):
+    cursor.executemany("INSERT INTO transactions (user_id, ministry_id, type, amount, description, timestamp) VALUES (%s, %s, %s, %s, %s, %s)", entries)
+
+OVERRIDES = {
+    database.migrate: migrate,
+    queries.transfer: transfer,
+    queries.start_investment: start_investment,
+    queries.buy_card: buy_card,
+    queries.list_transactions_page: list_transactions_page,
+    queries.list_investments_page: list_investments_page,
+    queries.settle_matured_investments: settle_matured_investments,
+    queries.pay_due_salaries: pay_due_salaries,
+    statements.export_transactions: export_transactions,
+    snapshots.take_snapshots: take_snapshots,
+    snapshots.balance_on: balance_on,
+    snapshots.balance_history: balance_history,
+    ledger.ensure_partitions: no_partitions,
+    ledger.expired_partitions: no_partitions,
+    ledger_writer._insert_batch: _insert_batch,
+}
+
+# دوال لا تكتب شيئًا، فتُنفَّذ على خيوط القراءة بدل انتظار دورها خلف الكتابة
+READ_ONLY = frozenset({
+    queries.get_account,
+    queries.richest_users,
+    queries.upcoming_maturities,
+    queries.list_cards,
+    queries.list_ministries,
+    list_transactions_page,
+    list_investments_page,
+    export_transactions,
+    balance_on,
+    balance_history,
+})
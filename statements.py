@@ -0,0 +1,66 @@
+# تصدير كشف حساب المستخدم إلى ملف مضغوط دون تحميل السجل كاملًا في الذاكرة
+import csv
+import gzip
+import io
+import json
+import tempfile
+
+from config import STATEMENT_MAX_EXPORT_BYTES, STATEMENT_FETCH_SIZE
+
+EXPORT_FORMATS = ("csv", "jsonl")
+COLUMNS = ("transaction_id", "timestamp", "type", "amount", "description")
+# حد المرفقات في السيرفرات غير المعززة وفي الرسائل الخاصة
+DEFAULT_FILESIZE_LIMIT = 10 * 1024 * 1024
+
+class ExportTooLarge(Exception):
+    """الملف المصدَّر تجاوز حد المرفقات المسموح"""
+
+def export_limit(guild):
+    """أقصى حجم لملف الكشف في هذا السيرفر: حد مرفقاته، أو STATEMENT_MAX_EXPORT_BYTES إن كان أصغر"""
+    limit = guild.filesize_limit if guild else DEFAULT_FILESIZE_LIMIT
+    return min(limit, STATEMENT_MAX_EXPORT_BYTES) if STATEMENT_MAX_EXPORT_BYTES else limit
+
+def export_transactions(cursor, user_id, start, end, fmt, max_bytes):
+    """كتابة معاملات المستخدم ضمن [start, end) إلى ملف gzip مؤقت، ويعيد (الملف، عدد الصفوف)
+
+    تُقرأ الصفوف عبر مؤشر على الخادم على دفعات، ويبقى الملف في الذاكرة حتى 8MB ثم ينتقل إلى القرص.
+    """
+    with cursor.connection.cursor(name=f"statement_export_{user_id}") as stream:
+        stream.itersize = STATEMENT_FETCH_SIZE
+        stream.execute("""
+            SELECT transaction_id, timestamp, type, amount, description FROM transactions
+            WHERE user_id = %(user_id)s
+              AND (%(start)s::timestamp IS NULL OR timestamp >= %(start)s)
+              AND (%(end)s::timestamp IS NULL OR timestamp < %(end)s)
+            ORDER BY timestamp, transaction_id
+        """, {"user_id": user_id, "start": start, "end": end})
+        return write_export(stream, fmt, max_bytes)
+
+def write_export(rows, fmt, max_bytes):
+    """كتابة صفوف (transaction_id, timestamp, type, amount, description) من أي مُكرِّر إلى ملف gzip مؤقت"""
+    out = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    count = 0
+    try:
+        with gzip.GzipFile(fileobj=out, mode="wb") as compressed:
+            text = io.TextIOWrapper(compressed, encoding="utf-8", newline="")
+            writer = csv.writer(text) if fmt == "csv" else None
+            if writer:
+                writer.writerow(COLUMNS)
+            for transaction_id, timestamp, type_, amount, description in rows:
+                values = (transaction_id, timestamp.isoformat() if timestamp else None, type_, str(amount), description)
+                if writer:
+                    writer.writerow(values)
+                else:
+                    text.write(json.dumps(dict(zip(COLUMNS, values)), ensure_ascii=False) + "\n")
+                count += 1
+                if count % STATEMENT_FETCH_SIZE == 0 and out.tell() > max_bytes:
+                    raise ExportTooLarge()
+            text.flush()
+            text.detach()
+        if out.tell() > max_bytes:
+            raise ExportTooLarge()
+    except BaseException:
+        out.close()
+        raise
+    out.seek(0)
+    return out, count